@@ -2,25 +2,63 @@
 # adapted from framework.cpp, Copyright (C) 2010-2012 by Jason L. McKesson
 # This file is licensed under the MIT License.
 #
-# NB: Unlike in the framework.cpp organization, the main loop is contained
-# in the tutorial files, not in this framework file. Additionally, a copy of
+# NB: Unlike in the framework.cpp organization, the tutorial files pass their
+# callbacks to a context provider (see createContextProvider) rather than
+# defining them for a main loop in this file. Additionally, a copy of
 # this module file must exist in the same directory as the tutorial files
 # to be imported properly.
 
 from OpenGL.GLUT import *
+from OpenGL.GLUT.freeglut import *
 from OpenGL.GLU import *
 from OpenGL.GL import *
+from OpenGL.arrays.arraydatatype import ArrayDatatype
+from OpenGL import platform as glPlatform
+from collections import OrderedDict
+from math import cos, sin, sqrt
+from multiprocessing.pool import ThreadPool
+import atexit
+import bisect
+import ctypes
+import hashlib
+import inspect
+import multiprocessing
+import numpy as np
 import os
+import struct
 import sys
+import timeit
+import zipfile
+
+# KHR_parallel_shader_compile lets the driver compile and link on its own
+# threads. Older PyOpenGL releases do not ship the extension module.
+try:
+    from OpenGL.GL.KHR.parallel_shader_compile import *
+except ImportError:
+    glMaxShaderCompilerThreadsKHR = None
+    GL_COMPLETION_STATUS_KHR = None
+
+# Directory used to store linked program binaries between runs, so that
+# createProgram can skip the link step on later launches. Set this to None
+# (or set PYOPENGL_TUTORIAL_CACHE to an empty string) to always link from source.
+PROGRAM_CACHE_DIR = os.environ.get(
+    'PYOPENGL_TUTORIAL_CACHE',
+    os.path.join(os.path.expanduser('~'), '.cache', 'pyopengl-tutorial')
+) or None
 
 # Function that creates and compiles shaders according to the given type (a GL enum value) and 
-# shader program (a file containing a GLSL program).
-def loadShader(shaderType, shaderFile):
-    # check if file exists, get full path name
-    strFilename = findFileOrThrow(shaderFile)
-    shaderData = None
-    with open(strFilename, 'r') as f:
-        shaderData = f.read()
+# shader program (a file containing a GLSL program). The optional defines dict is
+# passed to preprocessShader.
+def loadShader(shaderType, shaderFile, defines=None):
+    shader = submitShader(shaderType, shaderFile, defines)
+    checkShaderStatus(shader)
+    return shader
+
+# Creates a shader and starts compiling it, without waiting for the result.
+# With KHR_parallel_shader_compile enabled the compile runs on driver threads;
+# the first status query (see checkShaderStatus) is what blocks.
+def submitShader(shaderType, shaderFile, defines=None):
+    shaderData = preprocessShader(shaderFile, defines)
     
     shader = glCreateShader(shaderType)
     glShaderSource(shader, shaderData) # note that this is a simpler function call than in C
@@ -31,45 +69,2276 @@ def loadShader(shaderType, shaderFile):
     # utilities and wrappers, which docs caution may change in future versions.
     glCompileShader(shader)
     
+    return shader
+
+# Reads a shader file and returns its source with #include "file" lines replaced by
+# the contents of the named file (searched for like any other data file).
+# Each entry of the defines dict becomes a "#define NAME value" line right after the
+# #version line, or at the top of a shader that has none; a value of None or True
+# gives a bare "#define NAME". A #version line in an included file is dropped, since
+# only the first line of the whole source may hold one.
+# #line directives are emitted so that compiler errors refer to the original line numbers.
+def preprocessShader(shaderFile, defines=None, includeStack=()):
+    if shaderFile in includeStack:
+        raise RuntimeError('Recursive #include of ' + shaderFile)
+    
+    # check if file exists, get full path name
+    strFilename = findFileOrThrow(shaderFile)
+    shaderData = None
+    with open(strFilename, 'r') as f:
+        shaderData = f.read()
+    
+    outputLines = []
+    definesInserted = False
+    for lineNumber, line in enumerate(shaderData.splitlines(), 1):
+        directive = line.strip()
+        if directive.startswith('#include'):
+            strInclude = directive[len('#include'):].strip().strip('"<>')
+            outputLines.append('#line 1')
+            outputLines.append(preprocessShader(strInclude, None, includeStack + (shaderFile,)).rstrip('\n'))
+            outputLines.append('#line %d' % (lineNumber + 1))
+        elif directive.startswith('#version') and includeStack:
+            # keep the line count, so the #line directives stay right
+            outputLines.append('')
+        elif directive.startswith('#version') and defines and not definesInserted:
+            outputLines.append(line)
+            outputLines.extend(formatDefines(defines))
+            outputLines.append('#line %d' % (lineNumber + 1))
+            definesInserted = True
+        else:
+            outputLines.append(line)
+    
+    # without a #version line (GLSL 1.10), the defines go first
+    if defines and not definesInserted:
+        outputLines = formatDefines(defines) + ['#line 1'] + outputLines
+    
+    return '\n'.join(outputLines) + '\n'
+
+# Returns the "#define" lines for the defines dict of preprocessShader, sorted by name
+def formatDefines(defines):
+    defineLines = []
+    for name in sorted(defines):
+        value = defines[name]
+        if value is None or value is True:
+            defineLines.append('#define ' + name)
+        else:
+            defineLines.append('#define %s %s' % (name, value))
+    return defineLines
+
+# Maximum number of compiled shader variants kept by loadShaderVariant
+SHADER_VARIANT_CACHE_SIZE = 64
+
+# Compiled shader variants, keyed by (shaderType, shaderFile, defines), least recently used first
+shaderVariantCache = OrderedDict()
+
+# Like loadShader, but each (type, file, defines) combination is only compiled once.
+# The returned shader is owned by the cache: do not call glDeleteShader on it.
+# When more than SHADER_VARIANT_CACHE_SIZE variants exist, the least recently used
+# one is deleted (programs already linked against it are unaffected).
+def loadShaderVariant(shaderType, shaderFile, defines=None):
+    key = (shaderType, shaderFile, tuple(sorted((defines or {}).items())))
+    shader = shaderVariantCache.pop(key, None)
+    if shader is None:
+        shader = loadShader(shaderType, shaderFile, defines)
+    shaderVariantCache[key] = shader
+    
+    while len(shaderVariantCache) > SHADER_VARIANT_CACHE_SIZE:
+        evictedKey, evictedShader = shaderVariantCache.popitem(last=False)
+        glDeleteShader(evictedShader)
+    
+    return shader
+
+# Waits for a submitted shader to finish compiling and prints the info log on failure.
+# Returns True if the shader compiled successfully.
+def checkShaderStatus(shader):
     status = glGetShaderiv(shader, GL_COMPILE_STATUS)
     if status == GL_FALSE:
         # Note that getting the error log is much simpler in Python than in C/C++
         # and does not require explicit handling of the string buffer
-        strInfoLog = glGetShaderInforLog(shader)
+        strInfoLog = glGetShaderInfoLog(shader)
+        shaderType = glGetShaderiv(shader, GL_SHADER_TYPE)
         strShaderType = ""
-        if shaderType is GL_VERTEX_SHADER:
+        if shaderType == GL_VERTEX_SHADER:
             strShaderType = "vertex"
-        elif shaderType is GL_GEOMETRY_SHADER:
+        elif shaderType == GL_GEOMETRY_SHADER:
             strShaderType = "geometry"
-        elif shaderType is GL_FRAGMENT_SHADER:
+        elif shaderType == GL_FRAGMENT_SHADER:
             strShaderType = "fragment"
         
-        print "Compilation failure for " + strShaderType + " shader:\n" + strInfoLog
-    
-    return shader
+        print("Compilation failure for " + strShaderType + " shader:\n" + strInfoLog)
+        return False
+    return True
 
-# Function that accepts a list of shaders, compiles them, and returns a handle to the compiled program
+# Function that accepts a list of shaders, compiles them, and returns a handle to the compiled program.
+# The handle is a Program, which can be passed anywhere GL expects a program name.
 def createProgram(shaderList):
-    program = glCreateProgram()
+    return PendingProgram(shaderList).wait()
+
+# A program whose link has been started but not necessarily finished.
+# Creating one attaches the shaders and either restores a cached binary or
+# starts the link; wait() blocks until the link is done and returns the handle.
+class PendingProgram(object):
+    def __init__(self, shaderList, ownsShaders=False):
+        self.shaderList = shaderList
+        self.ownsShaders = ownsShaders
+        self.program = glCreateProgram()
+        
+        for shader in shaderList:
+            glAttachShader(self.program, shader)
+        
+        # If a binary for this exact set of shaders was saved by an earlier run
+        # on the same driver, restore it instead of linking from source.
+        self.cacheFile = findProgramCacheFile(shaderList)
+        self.restored = False
+        if self.cacheFile is not None:
+            self.restored = loadProgramBinary(self.program, self.cacheFile)
+        
+        if not self.restored:
+            if self.cacheFile is not None:
+                glProgramParameteri(self.program, GL_PROGRAM_BINARY_RETRIEVABLE_HINT, GL_TRUE)
+            glLinkProgram(self.program)
+        
+        self.result = None
     
-    for shader in shaderList:
-        glAttachShader(program, shader)
+    # Returns True once wait() can return without blocking. Without
+    # KHR_parallel_shader_compile there is no way to ask, so this is always True.
+    def isReady(self):
+        if self.result is not None or self.restored or not parallelShaderCompileEnabled:
+            return True
+        # PyOpenGL does not know the output size for this enum, so pass the
+        # output variable explicitly, as one would in C
+        status = GLint(0)
+        glGetProgramiv(self.program, GL_COMPLETION_STATUS_KHR, status)
+        return status.value == GL_TRUE
+    
+    # Blocks until the link has finished, reports any errors and returns the program handle.
+    def wait(self):
+        if self.result is not None:
+            return self.result
+        
+        if not self.restored:
+            status = glGetProgramiv(self.program, GL_LINK_STATUS)
+            if status == GL_FALSE:
+                # shaders submitted by createProgramsAsync were never checked
+                # individually, and the link log rarely says which one failed
+                if self.ownsShaders:
+                    for shader in self.shaderList:
+                        checkShaderStatus(shader)
+                # Note that getting the error log is much simpler in Python than in C/C++
+                # and does not require explicit handling of the string buffer
+                strInfoLog = glGetProgramInfoLog(self.program)
+                print("Linker failure: \n" + strInfoLog)
+            elif self.cacheFile is not None:
+                saveProgramBinary(self.program, self.cacheFile)
         
-    glLinkProgram(program)
+        for shader in self.shaderList:
+            glDetachShader(self.program, shader)
+            if self.ownsShaders:
+                glDeleteShader(shader)
+        
+        self.result = Program(self.program)
+        return self.result
+
+# Functions used to upload each type of uniform, keyed by the type reported by glGetActiveUniform
+UNIFORM_SETTERS = {
+    GL_FLOAT: glUniform1f,
+    GL_FLOAT_VEC2: glUniform2f,
+    GL_FLOAT_VEC3: glUniform3f,
+    GL_FLOAT_VEC4: glUniform4f,
+    GL_INT: glUniform1i,
+    GL_INT_VEC2: glUniform2i,
+    GL_INT_VEC3: glUniform3i,
+    GL_INT_VEC4: glUniform4i,
+    GL_UNSIGNED_INT: glUniform1ui,
+    GL_BOOL: glUniform1i,
+    GL_SAMPLER_1D: glUniform1i,
+    GL_SAMPLER_2D: glUniform1i,
+    GL_SAMPLER_3D: glUniform1i,
+    GL_SAMPLER_CUBE: glUniform1i,
+}
+UNIFORM_MATRIX_SETTERS = {
+    GL_FLOAT_MAT2: glUniformMatrix2fv,
+    GL_FLOAT_MAT3: glUniformMatrix3fv,
+    GL_FLOAT_MAT4: glUniformMatrix4fv,
+}
+
+# Binding point of the uniform block that holds the camera matrices (see CameraBuffer)
+CAMERA_BLOCK_BINDING = 0
+
+# Uniform blocks that every Program binds to a fixed binding point, by block name
+UNIFORM_BLOCK_BINDINGS = {
+    "Camera": CAMERA_BLOCK_BINDING,
+}
+
+# A linked program. This is a subclass of int, so it can be used exactly like the
+# handle returned by glCreateProgram, but it also reflects the program's active
+# uniforms once and keeps a shadow copy of the values uploaded through setUniform
+# and setUniformMatrix. Uploading a value equal to the shadow copy is skipped.
+# Note that the setters (like glUniform*) affect the program currently in use, and
+# that values set with glUniform* directly bypass the shadow copy.
+class Program(int):
+    def __new__(cls, handle):
+        self = int.__new__(cls, handle)
+        self.uniforms = {}
+        self.uploads = 0
+        self.skippedUploads = 0
+        
+        for index in range(glGetProgramiv(self, GL_ACTIVE_UNIFORMS)):
+            strName, size, glType = glGetActiveUniform(self, index)
+            if not isinstance(strName, str):
+                strName = strName.decode('ascii')
+            # arrays are reported as "name[0]"
+            if strName.endswith('[0]'):
+                strName = strName[:-3]
+            location = glGetUniformLocation(self, strName)
+            # uniforms in uniform blocks have no location and cannot be set with glUniform*
+            if location != -1:
+                self.uniforms[strName] = Uniform(self, strName, location, glType, size)
+        
+        # uniform blocks need GL 3.1; the binding is part of the program, so it is set once
+        if bool(glUniformBlockBinding):
+            for strBlockName, binding in UNIFORM_BLOCK_BINDINGS.items():
+                blockIndex = glGetUniformBlockIndex(self, strBlockName)
+                if blockIndex != GL_INVALID_INDEX:
+                    glUniformBlockBinding(self, blockIndex, binding)
+        
+        return self
     
-    status = glGetProgramiv(program, GL_LINK_STATUS)
-    if status == GL_FALSE:
-        # Note that getting the error log is much simpler in Python than in C/C++
-        # and does not require explicit handling of the string buffer
-        strInfoLog = glGetProgramInfoLog(program)
-        print "Linker failure: \n" + strInfoLog
+    # Sets a scalar or vector uniform, e.g. setUniform("offset", 0.0, 0.0, -1.0)
+    def setUniform(self, strName, *values):
+        self.uniforms[strName].set(*values)
+    
+    # Sets a matrix uniform from a numpy array
+    def setUniformMatrix(self, strName, matrix, transpose=GL_FALSE):
+        self.uniforms[strName].setMatrix(matrix, transpose)
+    
+    # Returns (uploads, skippedUploads) since the last call, for per-frame reporting
+    def endFrame(self):
+        counts = (self.uploads, self.skippedUploads)
+        self.uploads = 0
+        self.skippedUploads = 0
+        return counts
+
+# One active uniform of a Program, along with the last value uploaded to it.
+class Uniform(object):
+    def __init__(self, program, strName, location, glType, size):
+        self.program = program
+        self.name = strName
+        self.location = location
+        self.type = glType
+        self.size = size
+        self.value = None
+        self.transpose = None
+    
+    def set(self, *values):
+        if values == self.value:
+            self.program.skippedUploads += 1
+            return
         
+        UNIFORM_SETTERS[self.type](self.location, *values)
+        self.value = values
+        self.program.uploads += 1
+    
+    def setMatrix(self, matrix, transpose=GL_FALSE):
+        if transpose == self.transpose and np.array_equal(self.value, matrix):
+            self.program.skippedUploads += 1
+            return
+        
+        UNIFORM_MATRIX_SETTERS[self.type](self.location, 1, transpose, matrix)
+        # keep our own copy, since the caller is free to modify its array in place
+        if self.value is not None and self.value.shape == np.shape(matrix):
+            np.copyto(self.value, matrix)
+        else:
+            self.value = np.array(matrix, dtype='float32')
+        self.transpose = transpose
+        self.program.uploads += 1
+
+# Set to True by enableParallelShaderCompile when the driver compiles in the background
+parallelShaderCompileEnabled = False
+
+# Asks the driver to compile and link on background threads, if it supports
+# KHR_parallel_shader_compile. Returns True if the extension is in use.
+def enableParallelShaderCompile():
+    global parallelShaderCompileEnabled
+    if not parallelShaderCompileEnabled and bool(glMaxShaderCompilerThreadsKHR):
+        # 0xFFFFFFFF lets the implementation pick the number of threads
+        glMaxShaderCompilerThreadsKHR(0xFFFFFFFF)
+        parallelShaderCompileEnabled = True
+    return parallelShaderCompileEnabled
+
+# Function that accepts a list of programs, each given as a list of (shaderType, shaderFile)
+# or (shaderType, shaderFile, defines) tuples, and returns a list of PendingProgram
+# objects in the same order.
+# Every shader of every program is submitted before any status is queried, so that
+# the driver can compile them concurrently. Call wait() on each result to get its handle.
+def createProgramsAsync(programList):
+    enableParallelShaderCompile()
+    
+    shaderLists = []
+    for shaderFiles in programList:
+        shaderLists.append([submitShader(*shaderSpec) for shaderSpec in shaderFiles])
+    
+    return [PendingProgram(shaderList, ownsShaders=True) for shaderList in shaderLists]
+
+# Returns the path of the program binary cache entry for the given (compiled)
+# shaders, or None if caching is disabled or unsupported by the driver.
+# The key covers the shader sources, the shader types and the driver strings,
+# since a binary is only valid for the driver that produced it.
+def findProgramCacheFile(shaderList):
+    if PROGRAM_CACHE_DIR is None or not bool(glProgramBinary):
+        return None
+    if glGetIntegerv(GL_NUM_PROGRAM_BINARY_FORMATS) == 0:
+        return None
+    
+    hasher = hashlib.sha1()
+    for strName in (GL_VENDOR, GL_RENDERER, GL_VERSION):
+        hasher.update(glGetString(strName))
     for shader in shaderList:
-        glDetachShader(program, shader)
+        shaderType = glGetShaderiv(shader, GL_SHADER_TYPE)
+        hasher.update(('%d:' % shaderType).encode('ascii'))
+        hasher.update(glGetShaderSource(shader))
+    
+    return os.path.join(PROGRAM_CACHE_DIR, hasher.hexdigest() + '.bin')
+
+# Attempts to restore a program from a cached binary.
+# Returns True if the program was restored and is linked.
+def loadProgramBinary(program, cacheFile):
+    if not os.path.isfile(cacheFile):
+        return False
+    with open(cacheFile, 'rb') as f:
+        data = f.read()
+    if len(data) <= 4:
+        return False
+    
+    # the first 4 bytes store the driver-specific binary format enum
+    binaryFormat = struct.unpack('<I', data[:4])[0]
+    binary = data[4:]
+    # A format the driver no longer supports is an error (GL_INVALID_ENUM) rather
+    # than a failed link, so it is checked first and the stale entry is removed.
+    if binaryFormat not in getProgramBinaryFormats():
+        removeProgramBinary(cacheFile)
+        return False
+    try:
+        glProgramBinary(program, binaryFormat, binary, len(binary))
+    except GLError:
+        removeProgramBinary(cacheFile)
+        return False
+    
+    # A driver update can invalidate stored binaries, in which case the
+    # program is left unlinked and the caller falls back to linking from source.
+    return glGetProgramiv(program, GL_LINK_STATUS) == GL_TRUE
+
+# Returns the program binary formats the driver accepts
+def getProgramBinaryFormats():
+    count = glGetIntegerv(GL_NUM_PROGRAM_BINARY_FORMATS)
+    if count == 0:
+        return []
+    # PyOpenGL does not know the output size for this enum, so pass the
+    # output array explicitly, as one would in C
+    formats = (GLint * count)()
+    glGetIntegerv(GL_PROGRAM_BINARY_FORMATS, formats)
+    return [binaryFormat & 0xffffffff for binaryFormat in formats]
+
+# Deletes a cache entry that can no longer be restored, so that the next link saves a new one
+def removeProgramBinary(cacheFile):
+    try:
+        os.remove(cacheFile)
+    except OSError:
+        pass
+
+# Retrieves the binary of a linked program and writes it to the cache.
+# Failures are not fatal, since the cache is only an optimization.
+def saveProgramBinary(program, cacheFile):
+    length = glGetProgramiv(program, GL_PROGRAM_BINARY_LENGTH)
+    if length == 0:
+        return
+    
+    binary = (GLubyte * length)()
+    binaryFormat = GLenum(0)
+    written = GLsizei(0)
+    glGetProgramBinary(program, length, written, binaryFormat, binary)
+    
+    try:
+        if not os.path.isdir(PROGRAM_CACHE_DIR):
+            os.makedirs(PROGRAM_CACHE_DIR)
+        # write to a temporary file first so that a concurrently starting
+        # process never reads a partially written binary
+        strTempName = cacheFile + '.%d.tmp' % os.getpid()
+        with open(strTempName, 'wb') as f:
+            f.write(struct.pack('<I', binaryFormat.value))
+            f.write(bytearray(binary)[:written.value])
+        os.rename(strTempName, cacheFile)
+    except (IOError, OSError) as e:
+        print("Could not write program cache " + cacheFile + ": " + str(e))
+    
+    
+# Shadows the GL binding and fixed-function state used by the tutorials, and drops calls
+# that would not change anything. This is why the tutorials leave their program, vertex
+# array and buffers bound at the end of a frame: rebinding them in the next frame costs
+# no GL call.
+# Every change of this state must go through the cache (or be followed by invalidate()),
+# otherwise the shadow copy goes stale. This includes binding vertex arrays: the enabled
+# attributes are shadowed per vertex array, keyed by the one the cache believes is
+# bound, so after a raw glBindVertexArray they would be recorded against the wrong one.
+# A tutorial that binds directly (like tut1.py) must not use glState at all.
+# issuedCalls and skippedCalls count the calls forwarded to GL and the calls dropped.
+class GLStateCache(object):
+    def __init__(self):
+        self.issuedCalls = 0
+        self.skippedCalls = 0
+        self.invalidate()
+    
+    # Forgets all shadowed state, so that the next call of each kind is issued
+    def invalidate(self):
+        self.program = None
+        self.vertexArray = None
+        self.buffers = {}
+        self.bufferBases = {}
+        self.caps = {}
+        self.vertexAttribs = {}
+        self.settings = {}
+    
+    # Issues func(*args) unless the shadow copy in table[key] already holds value
+    def changeState(self, table, key, value, func, *args):
+        if key in table and table[key] == value:
+            self.skippedCalls += 1
+            return False
+        func(*args)
+        table[key] = value
+        self.issuedCalls += 1
+        return True
+    
+    def useProgram(self, program):
+        if program == self.program:
+            self.skippedCalls += 1
+            return
+        glUseProgram(program)
+        self.program = program
+        self.issuedCalls += 1
+    
+    def bindVertexArray(self, vertexArray):
+        if vertexArray == self.vertexArray:
+            self.skippedCalls += 1
+            return
+        glBindVertexArray(vertexArray)
+        self.vertexArray = vertexArray
+        self.issuedCalls += 1
+        # the element array binding is part of the VAO state
+        self.buffers.pop(GL_ELEMENT_ARRAY_BUFFER, None)
+    
+    def bindBuffer(self, target, buffer):
+        self.changeState(self.buffers, target, buffer, glBindBuffer, target, buffer)
+    
+    # Deletes buffer, which GL also unbinds from the binding points it is bound to
+    def deleteBuffer(self, buffer):
+        glDeleteBuffers(1, [buffer])
+        for table in (self.buffers, self.bufferBases):
+            for key, value in list(table.items()):
+                if value == buffer:
+                    table[key] = 0
+    
+    # Binds buffer to an indexed binding point of target, e.g. a uniform block binding
+    def bindBufferBase(self, target, index, buffer):
+        if self.changeState(self.bufferBases, (target, index), buffer, glBindBufferBase, target, index, buffer):
+            # glBindBufferBase binds the generic target as well
+            self.buffers[target] = buffer
+    
+    def enable(self, cap):
+        self.changeState(self.caps, cap, True, glEnable, cap)
+    
+    def disable(self, cap):
+        self.changeState(self.caps, cap, False, glDisable, cap)
+    
+    # Vertex attribute arrays are tracked per VAO, like GL does
+    def enableVertexAttribArray(self, index):
+        self.changeState(self.vertexAttribs, (self.vertexArray, index), True, glEnableVertexAttribArray, index)
+    
+    def disableVertexAttribArray(self, index):
+        self.changeState(self.vertexAttribs, (self.vertexArray, index), False, glDisableVertexAttribArray, index)
+    
+    def cullFace(self, mode):
+        self.changeState(self.settings, 'cullFace', mode, glCullFace, mode)
+    
+    def frontFace(self, mode):
+        self.changeState(self.settings, 'frontFace', mode, glFrontFace, mode)
+    
+    def depthMask(self, flag):
+        self.changeState(self.settings, 'depthMask', flag, glDepthMask, flag)
+    
+    def depthFunc(self, func):
+        self.changeState(self.settings, 'depthFunc', func, glDepthFunc, func)
+    
+    def depthRange(self, zNear, zFar):
+        self.changeState(self.settings, 'depthRange', (zNear, zFar), glDepthRange, zNear, zFar)
+    
+    # Returns (issuedCalls, skippedCalls) since the last call, for per-frame reporting
+    def endFrame(self):
+        counts = (self.issuedCalls, self.skippedCalls)
+        self.issuedCalls = 0
+        self.skippedCalls = 0
+        return counts
+
+# The state cache shared by the tutorials, which all render with a single context
+glState = GLStateCache()
+
+# The buffer behind the Camera uniform block, which the shaders declare as
+#     layout(std140) uniform Camera
+#     {
+#         mat4 cameraToClipMatrix;
+#     };
+# (with the matrix named as the tutorial names it). Every Program binds its Camera
+# block to CAMERA_BLOCK_BINDING, where this buffer is bound, so setting the matrix is
+# one glBufferSubData however many programs use it, and needs no glUseProgram.
+# Like a Uniform, it keeps a shadow copy of the matrix and skips uploading an equal one
+# (e.g. when reshape() sets the same perspective matrix again); uploads and
+# skippedUploads count both cases.
+class CameraBuffer(object):
+    # std140 lays out a mat4 as four vec4 columns
+    SIZE = 64
+    
+    def __init__(self, binding=CAMERA_BLOCK_BINDING):
+        self.buffer = glGenBuffers(1)
+        # the matrix as laid out in the buffer: one column per row, or None before the
+        # first upload, since the buffer's initial contents are undefined
+        self.columns = None
+        self.uploads = 0
+        self.skippedUploads = 0
+        glState.bindBuffer(GL_UNIFORM_BUFFER, self.buffer)
+        glBufferData(GL_UNIFORM_BUFFER, self.SIZE, None, GL_DYNAMIC_DRAW)
+        glState.bindBufferBase(GL_UNIFORM_BUFFER, binding, self.buffer)
+    
+    # Uploads matrix, 16 floats in column-major order as glUniformMatrix4fv takes them,
+    # or in row-major order with transpose=GL_TRUE
+    def setMatrix(self, matrix, transpose=GL_FALSE):
+        matrix = np.reshape(matrix, (4, 4))
+        if transpose:
+            matrix = matrix.transpose()
+        if self.columns is not None and np.array_equal(matrix, self.columns):
+            self.skippedUploads += 1
+            return
+        
+        if self.columns is None:
+            self.columns = np.empty((4, 4), dtype='float32')
+        np.copyto(self.columns, matrix)
+        glState.bindBuffer(GL_UNIFORM_BUFFER, self.buffer)
+        glBufferSubData(GL_UNIFORM_BUFFER, 0, self.SIZE, self.columns)
+        self.uploads += 1
+    
+    # Returns (uploads, skippedUploads) since the last call, for per-frame reporting
+    def endFrame(self):
+        counts = (self.uploads, self.skippedUploads)
+        self.uploads = 0
+        self.skippedUploads = 0
+        return counts
+
+# Thread pools shared by every VertexAnimation, by thread count
+vertexThreadPools = {}
+
+# Returns a thread pool with threadCount threads, creating it on first use
+def getVertexThreadPool(threadCount):
+    if threadCount not in vertexThreadPools:
+        vertexThreadPools[threadCount] = ThreadPool(threadCount)
+    return vertexThreadPools[threadCount]
+
+# CPU-side vertex animation that allocates nothing per frame. positions is a flat (or
+# (N, vertexDim)) float32 array of rest positions. data is a scratch copy of it that
+# offset() overwrites in place through strided views of the X and Y coordinates, so
+# a frame costs two vectorized passes over the vertices, whatever their count.
+#
+# With threadCount above 1 (None means one thread per core), meshes of more than
+# chunkSize vertices are split into chunks of about chunkSize vertices that are moved
+# on a thread pool. NumPy releases the GIL inside its loops, so the chunks run in
+# parallel. Small meshes always run on the calling thread.
+class VertexAnimation(object):
+    def __init__(self, positions, vertexDim, threadCount=1, chunkSize=65536):
+        self.vertexDim = vertexDim
+        self.positions = np.ascontiguousarray(positions, dtype='float32').reshape(-1, vertexDim)
+        # Z and W are copied once here, and never change afterwards
+        self.data = np.array(self.positions, copy=True)
+        # one column at a time with a scalar is faster than broadcasting an (X, Y) pair
+        self.positionsX = self.positions[:, 0]
+        self.positionsY = self.positions[:, 1]
+        self.dataX = self.data[:, 0]
+        self.dataY = self.data[:, 1]
+        
+        if threadCount is None:
+            threadCount = multiprocessing.cpu_count()
+        self.threadCount = threadCount
+        self.chunks = []
+        if threadCount > 1 and len(self.positions) > chunkSize:
+            chunkCount = max(threadCount, (len(self.positions) + chunkSize - 1) // chunkSize)
+            bounds = np.linspace(0, len(self.positions), chunkCount + 1).astype(int)
+            self.chunks = list(zip(bounds[:-1], bounds[1:]))
+    
+    def vertexCount(self):
+        return len(self.positions)
+    
+    # Writes the rest positions moved by (fXOffset, fYOffset) into data, and returns data.
+    # If out is given (e.g. a PersistentBuffer region, shaped like data) the X and Y
+    # coordinates are written there instead; its Z and W must have been filled already.
+    def offset(self, fXOffset, fYOffset, out=None):
+        if out is None:
+            outX, outY = self.dataX, self.dataY
+        else:
+            outX, outY = out[:, 0], out[:, 1]
+        
+        if not self.chunks:
+            np.add(self.positionsX, fXOffset, out=outX)
+            np.add(self.positionsY, fYOffset, out=outY)
+        else:
+            def offsetChunk(chunk):
+                begin, end = chunk
+                np.add(self.positionsX[begin:end], fXOffset, out=outX[begin:end])
+                np.add(self.positionsY[begin:end], fYOffset, out=outY[begin:end])
+            getVertexThreadPool(self.threadCount).map(offsetChunk, self.chunks)
+        
+        return self.data if out is None else out
+
+# A buffer for data that is rewritten every frame, split into regionCount regions of
+# regionSize bytes that are used in turn. write() maps the next region with
+# GL_MAP_UNSYNCHRONIZED_BIT, so GL never waits for draws still reading the buffer;
+# instead, fence() is called after the draws that read a region, and a region is only
+# reused once its fence has signaled. With enough regions that wait does not happen
+# at all (stalls counts the writes that had to wait).
+class StreamingBuffer(object):
+    def __init__(self, target, regionSize, regionCount=3, usage=GL_STREAM_DRAW):
+        # keep region offsets aligned for mapping and for any vertex format
+        alignment = 256
+        self.target = target
+        self.regionSize = (regionSize + alignment - 1) // alignment * alignment
+        self.regionCount = regionCount
+        self.fences = [None] * regionCount
+        self.region = regionCount - 1
+        self.stalls = 0
+        
+        self.buffer = glGenBuffers(1)
+        glState.bindBuffer(target, self.buffer)
+        self.allocate(usage)
+    
+    def allocate(self, usage):
+        glBufferData(self.target, self.regionSize * self.regionCount, None, usage)
+    
+    # Returns the byte offset of the region written last
+    def offset(self):
+        return self.region * self.regionSize
+    
+    # Copies the numpy array data into the next region, and returns the byte offset of
+    # that region. Leaves the buffer bound to the target.
+    def write(self, data):
+        if data.nbytes > self.regionSize:
+            raise ValueError('%d bytes do not fit in a region of %d bytes' % (data.nbytes, self.regionSize))
+        self.region = (self.region + 1) % self.regionCount
+        self.waitForRegion(self.region)
+        
+        data = np.ascontiguousarray(data)
+        glState.bindBuffer(self.target, self.buffer)
+        pointer = glMapBufferRange(self.target, self.offset(), data.nbytes,
+                                   GL_MAP_WRITE_BIT | GL_MAP_INVALIDATE_RANGE_BIT | GL_MAP_UNSYNCHRONIZED_BIT)
+        ctypes.memmove(pointer, data.__array_interface__['data'][0], data.nbytes)
+        glUnmapBuffer(self.target)
+        return self.offset()
+    
+    # Marks the end of the GL commands that read the region written last
+    def fence(self):
+        self.fences[self.region] = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+    
+    def waitForRegion(self, region):
+        fence = self.fences[region]
+        if fence is None:
+            return
+        status = glClientWaitSync(fence, GL_SYNC_FLUSH_COMMANDS_BIT, 0)
+        if status == GL_TIMEOUT_EXPIRED:
+            self.stalls += 1
+            while status == GL_TIMEOUT_EXPIRED:
+                # wait in steps of 100 ms
+                status = glClientWaitSync(fence, GL_SYNC_FLUSH_COMMANDS_BIT, 100000000)
+        if status == GL_WAIT_FAILED:
+            raise RuntimeError('Waiting for a streaming buffer fence failed')
+        glDeleteSync(fence)
+        self.fences[region] = None
+
+# Returns True if the context supports PersistentBuffer (GL 4.4 or ARB_buffer_storage)
+def persistentMappingAvailable():
+    return bool(glBufferStorage)
+
+# A StreamingBuffer whose storage is created with glBufferStorage and mapped once, for
+# good, with GL_MAP_PERSISTENT_BIT | GL_MAP_COHERENT_BIT. Each region is exposed as a
+# numpy array of the given shape and dtype that lives directly in the mapped memory:
+# whatever is written to nextArray() is seen by GL without any copy or GL call. The
+# fences still apply: call fence() after the draws that read the region.
+class PersistentBuffer(StreamingBuffer):
+    MAP_FLAGS = GL_MAP_WRITE_BIT | GL_MAP_PERSISTENT_BIT | GL_MAP_COHERENT_BIT
+    
+    def __init__(self, target, shape, dtype='float32', regionCount=3):
+        self.shape = shape
+        self.dtype = np.dtype(dtype)
+        StreamingBuffer.__init__(self, target, int(np.prod(shape)) * self.dtype.itemsize, regionCount)
+    
+    def allocate(self, usage):
+        # usage hints do not apply to immutable storage
+        size = self.regionSize * self.regionCount
+        glBufferStorage(self.target, size, None, self.MAP_FLAGS)
+        pointer = glMapBufferRange(self.target, 0, size, self.MAP_FLAGS)
+        if not pointer:
+            raise RuntimeError('Could not map a persistent buffer')
+        # the arrays refer to the mapping, which stays valid as long as the buffer exists
+        self.memory = (ctypes.c_char * size).from_address(pointer)
+        self.arrays = []
+        for region in range(self.regionCount):
+            array = np.frombuffer(self.memory, self.dtype, int(np.prod(self.shape)), region * self.regionSize)
+            self.arrays.append(array.reshape(self.shape))
+    
+    # Moves on to the next region, once GL is done with it, and returns its array
+    def nextArray(self):
+        self.region = (self.region + 1) % self.regionCount
+        self.waitForRegion(self.region)
+        return self.arrays[self.region]
+    
+    # Copies data into the next region, like StreamingBuffer.write
+    def write(self, data):
+        self.nextArray()[...] = np.reshape(data, self.shape)
+        return self.offset()
+
+# Per-instance 4x4 matrices for instanced drawing, read by a mat4 vertex attribute that
+# occupies the four locations starting at location (one vec4 column each) and advances
+# once per instance. The matrices are streamed through a StreamingBuffer, so each
+# frame's upload goes to a region the GPU is not reading.
+class InstanceMatrixBuffer(object):
+    def __init__(self, maxInstances, location):
+        self.maxInstances = maxInstances
+        self.location = location
+        self.stream = StreamingBuffer(GL_ARRAY_BUFFER, maxInstances * 64)
+        # column-major copy of the matrices, as GL reads them
+        self.staging = np.empty((maxInstances, 4, 4), dtype='float32')
+    
+    # Enables the attribute in the vertex array object currently bound
+    def enableAttributes(self):
+        for column in range(4):
+            glState.enableVertexAttribArray(self.location + column)
+            glVertexAttribDivisor(self.location + column, 1)
+    
+    # Uploads an (N, 4, 4) stack of row-major matrices (like the ones the tutorials
+    # build with numpy) and points the attribute of the bound vertex array object at
+    # them. Returns N, the instance count to draw.
+    def upload(self, matrices):
+        instanceCount = len(matrices)
+        staging = self.staging[:instanceCount]
+        np.copyto(staging, matrices.transpose(0, 2, 1))
+        offset = self.stream.write(staging)
+        for column in range(4):
+            glVertexAttribPointer(self.location + column, 4, GL_FLOAT, GL_FALSE, 64,
+                                  ctypes.c_void_p(offset + 16 * column))
+        return instanceCount
+    
+    # Call after the draws that use the uploaded matrices
+    def fence(self):
+        self.stream.fence()
+
+# Returns (instanceCount, 3) float32 translations that tile a scene of patternSize
+# objects over a square grid: instance i belongs to copy i // patternSize, and copy 0
+# (the original scene) stays in place. spacing is the distance between copies.
+def tileInstanceOffsets(instanceCount, patternSize, spacing):
+    copies = (instanceCount + patternSize - 1) // patternSize
+    side = int(np.ceil(np.sqrt(copies)))
+    copy = np.arange(instanceCount) // patternSize
+    # shift the cell numbers so that copy 0 lands in the middle cell of the grid, and
+    # measure columns and rows from that cell, so that copy 0 stays where it is
+    center = side * side // 2
+    cell = copy + center
+    column = cell % side - center % side
+    row = cell // side - center // side
+    offsets = np.zeros((instanceCount, 3), dtype='float32')
+    offsets[:, 0] = column * spacing
+    offsets[:, 1] = row * spacing
+    return offsets
+
+# The layout of the commands glMultiDrawElementsIndirect reads from a
+# GL_DRAW_INDIRECT_BUFFER (DrawElementsIndirectCommand in the GL spec)
+DRAW_ELEMENTS_INDIRECT_COMMAND = np.dtype([
+    ('count', 'uint32'),
+    ('instanceCount', 'uint32'),
+    ('firstIndex', 'uint32'),
+    ('baseVertex', 'int32'),
+    ('baseInstance', 'uint32'),
+])
+
+# Returns True if the context supports DrawList (GL 4.3, or ARB_multi_draw_indirect
+# with ARB_base_instance)
+def multiDrawIndirectAvailable():
+    return bool(glMultiDrawElementsIndirect) and bool(glDrawElementsInstancedBaseInstance)
+
+# A list of indexed draws, submitted with one glMultiDrawElementsIndirect. The commands
+# are kept in a numpy structured array (see DRAW_ELEMENTS_INDIRECT_COMMAND) and copied
+# to the indirect buffer by upload(), which is only needed after they change. Unless
+# given, a draw's baseInstance is its position in the list, so per-draw data can be
+# read from vertex attributes with a divisor of 1 (gl_DrawID would need GL 4.6).
+class DrawList(object):
+    def __init__(self, maxDraws):
+        self.commands = np.zeros(maxDraws, dtype=DRAW_ELEMENTS_INDIRECT_COMMAND)
+        self.drawCount = 0
+        self.buffer = glGenBuffers(1)
+        glState.bindBuffer(GL_DRAW_INDIRECT_BUFFER, self.buffer)
+        glBufferData(GL_DRAW_INDIRECT_BUFFER, self.commands.nbytes, None, GL_DYNAMIC_DRAW)
+    
+    def clear(self):
+        self.drawCount = 0
+    
+    # Adds a draw of count indices from firstIndex (an index, not a byte offset), added
+    # to baseVertex, and returns its position in the list
+    def addDraw(self, count, firstIndex=0, baseVertex=0, instanceCount=1, baseInstance=None):
+        if self.drawCount == len(self.commands):
+            raise ValueError('DrawList is full (%d draws)' % len(self.commands))
+        index = self.drawCount
+        if baseInstance is None:
+            baseInstance = index
+        self.commands[index] = (count, instanceCount, firstIndex, baseVertex, baseInstance)
+        self.drawCount += 1
+        return index
+    
+    def upload(self):
+        if self.drawCount:
+            commands = self.commands[:self.drawCount]
+            glState.bindBuffer(GL_DRAW_INDIRECT_BUFFER, self.buffer)
+            # PyOpenGL does not take structured arrays, but the bytes are all that matter
+            glBufferSubData(GL_DRAW_INDIRECT_BUFFER, 0, commands.nbytes, commands.view('uint32'))
+    
+    # Draws the uploaded commands with the bound vertex array object
+    def draw(self, mode, indexType):
+        if self.drawCount:
+            glState.bindBuffer(GL_DRAW_INDIRECT_BUFFER, self.buffer)
+            glMultiDrawElementsIndirect(mode, indexType, None, self.drawCount, 0)
+
+# Hands out ranges of [0, capacity) first-fit, like a heap allocator. freeRanges holds
+# the (start, size) of the free ranges, sorted by start, with neighbours merged.
+class RangeAllocator(object):
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.freeRanges = [(0, capacity)]
+    
+    # Returns the start of a new range of size, or None if no free range is large enough
+    def allocate(self, size):
+        for index, (start, freeSize) in enumerate(self.freeRanges):
+            if freeSize >= size:
+                if freeSize == size:
+                    del self.freeRanges[index]
+                else:
+                    self.freeRanges[index] = (start + size, freeSize - size)
+                return start
+        return None
+    
+    def free(self, start, size):
+        if size == 0:
+            return
+        index = bisect.bisect(self.freeRanges, (start, size))
+        # merge with the free ranges just before and just after, if they touch
+        if index < len(self.freeRanges) and self.freeRanges[index][0] == start + size:
+            size += self.freeRanges.pop(index)[1]
+        if index > 0 and sum(self.freeRanges[index - 1]) == start:
+            index -= 1
+            start, size = self.freeRanges[index][0], self.freeRanges[index][1] + size
+            del self.freeRanges[index]
+        self.freeRanges.insert(index, (start, size))
+    
+    # Extends the range to [0, capacity)
+    def grow(self, capacity):
+        oldCapacity = self.capacity
+        self.capacity = capacity
+        self.free(oldCapacity, capacity - oldCapacity)
+    
+    # Marks [0, usedSize) as allocated and the rest as free, after the ranges in use
+    # have been moved there
+    def reset(self, usedSize):
+        self.freeRanges = [(usedSize, self.capacity - usedSize)] if usedSize < self.capacity else []
+    
+    def freeSize(self):
+        return sum(size for start, size in self.freeRanges)
+    
+    def largestFreeSize(self):
+        return max([size for start, size in self.freeRanges] or [0])
+
+# A mesh in a GeometryPool: its vertices start at baseVertex, its indices (which count
+# from the mesh's own first vertex) at firstIndex. compact() moves meshes, so read these
+# again after it, e.g. to rebuild a DrawList.
+class PoolMesh(object):
+    def __init__(self, baseVertex, vertexCount, firstIndex, indexCount):
+        self.baseVertex = baseVertex
+        self.vertexCount = vertexCount
+        self.firstIndex = firstIndex
+        self.indexCount = indexCount
+
+# Many meshes in one vertex buffer and one index buffer, drawn with a single vertex array
+# object (vao), so that switching meshes only changes the draw call's arguments.
+# vertexFormat lists the (location, componentCount) of the float attributes of a vertex,
+# interleaved in that order. Each mesh gets a range of each buffer (see RangeAllocator).
+# When a mesh does not fit, the buffer is replaced by one at least twice as large and
+# the old contents are copied over on the GPU with glCopyBufferSubData; compact() moves
+# the meshes together, closing the holes that removeMesh() leaves. copiedBytes counts
+# the bytes these copies moved. The calls that change the buffers leave vao bound.
+class GeometryPool(object):
+    def __init__(self, vertexFormat, vertexCapacity=4096, indexCapacity=16384, indexType=GL_UNSIGNED_SHORT):
+        self.vertexFormat = vertexFormat
+        self.vertexSize = 4 * sum(componentCount for location, componentCount in vertexFormat)
+        self.indexType = indexType
+        self.indexDtype = np.dtype('uint16' if indexType == GL_UNSIGNED_SHORT else 'uint32')
+        self.vertexRanges = RangeAllocator(vertexCapacity)
+        self.indexRanges = RangeAllocator(indexCapacity)
+        self.meshes = []
+        self.copiedBytes = 0
+        
+        self.vertexBuffer = self.createBuffer(vertexCapacity * self.vertexSize)
+        self.indexBuffer = self.createBuffer(indexCapacity * self.indexDtype.itemsize)
+        self.vao = glGenVertexArrays(1)
+        self.bindBuffers()
+    
+    # Returns a new buffer of size bytes, bound to GL_COPY_WRITE_BUFFER, which no vertex
+    # array object reads from
+    def createBuffer(self, size):
+        buffer = glGenBuffers(1)
+        glState.bindBuffer(GL_COPY_WRITE_BUFFER, buffer)
+        glBufferData(GL_COPY_WRITE_BUFFER, size, None, GL_STATIC_DRAW)
+        return buffer
+    
+    # Points vao at the current buffers
+    def bindBuffers(self):
+        glState.bindVertexArray(self.vao)
+        glState.bindBuffer(GL_ARRAY_BUFFER, self.vertexBuffer)
+        offset = 0
+        for location, componentCount in self.vertexFormat:
+            glState.enableVertexAttribArray(location)
+            glVertexAttribPointer(location, componentCount, GL_FLOAT, GL_FALSE, self.vertexSize,
+                                  ctypes.c_void_p(offset))
+            offset += 4 * componentCount
+        glState.bindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.indexBuffer)
+    
+    # Copies vertices (vertexCount rows of the attributes of vertexFormat) and indices
+    # into the pool, and returns the PoolMesh that locates them
+    def addMesh(self, vertices, indices):
+        vertices = np.ascontiguousarray(vertices, dtype='float32')
+        indices = np.ascontiguousarray(indices, dtype=self.indexDtype)
+        if vertices.nbytes % self.vertexSize:
+            raise ValueError('%d bytes of vertices are not whole vertices of %d bytes' % (vertices.nbytes, self.vertexSize))
+        vertexCount = vertices.nbytes // self.vertexSize
+        
+        baseVertex = self.vertexRanges.allocate(vertexCount)
+        if baseVertex is None:
+            self.growVertices(vertexCount)
+            baseVertex = self.vertexRanges.allocate(vertexCount)
+        firstIndex = self.indexRanges.allocate(len(indices))
+        if firstIndex is None:
+            self.growIndices(len(indices))
+            firstIndex = self.indexRanges.allocate(len(indices))
+        
+        glState.bindBuffer(GL_COPY_WRITE_BUFFER, self.vertexBuffer)
+        glBufferSubData(GL_COPY_WRITE_BUFFER, baseVertex * self.vertexSize, vertices.nbytes, vertices)
+        glState.bindBuffer(GL_COPY_WRITE_BUFFER, self.indexBuffer)
+        glBufferSubData(GL_COPY_WRITE_BUFFER, firstIndex * self.indexDtype.itemsize, indices.nbytes, indices)
+        
+        mesh = PoolMesh(baseVertex, vertexCount, firstIndex, len(indices))
+        self.meshes.append(mesh)
+        return mesh
+    
+    # Frees the ranges of mesh, which must not be drawn any more
+    def removeMesh(self, mesh):
+        self.meshes.remove(mesh)
+        self.vertexRanges.free(mesh.baseVertex, mesh.vertexCount)
+        self.indexRanges.free(mesh.firstIndex, mesh.indexCount)
+    
+    # Returns a copy of buffer with newSize bytes, the first size of them copied from it
+    def copyBuffer(self, buffer, size, newSize):
+        newBuffer = self.createBuffer(newSize)
+        glState.bindBuffer(GL_COPY_READ_BUFFER, buffer)
+        glCopyBufferSubData(GL_COPY_READ_BUFFER, GL_COPY_WRITE_BUFFER, 0, 0, size)
+        glState.deleteBuffer(buffer)
+        self.copiedBytes += size
+        return newBuffer
+    
+    # Grows the vertex buffer so that vertexCount more vertices fit after its end
+    def growVertices(self, vertexCount):
+        capacity = max(2 * self.vertexRanges.capacity, self.vertexRanges.capacity + vertexCount)
+        self.vertexBuffer = self.copyBuffer(self.vertexBuffer, self.vertexRanges.capacity * self.vertexSize,
+                                            capacity * self.vertexSize)
+        self.vertexRanges.grow(capacity)
+        self.bindBuffers()
+    
+    def growIndices(self, indexCount):
+        capacity = max(2 * self.indexRanges.capacity, self.indexRanges.capacity + indexCount)
+        self.indexBuffer = self.copyBuffer(self.indexBuffer, self.indexRanges.capacity * self.indexDtype.itemsize,
+                                           capacity * self.indexDtype.itemsize)
+        self.indexRanges.grow(capacity)
+        self.bindBuffers()
+    
+    # Moves every mesh to the start of new buffers of the same sizes, in order, so that
+    # all the free space is in one range at the end of each. GL does not allow copies
+    # between overlapping ranges of one buffer, hence the new buffers.
+    def compact(self):
+        vertexSize = self.vertexSize
+        indexSize = self.indexDtype.itemsize
+        newVertexBuffer = self.createBuffer(self.vertexRanges.capacity * vertexSize)
+        glState.bindBuffer(GL_COPY_READ_BUFFER, self.vertexBuffer)
+        vertexCount = 0
+        for mesh in sorted(self.meshes, key=lambda mesh: mesh.baseVertex):
+            glCopyBufferSubData(GL_COPY_READ_BUFFER, GL_COPY_WRITE_BUFFER, mesh.baseVertex * vertexSize,
+                                vertexCount * vertexSize, mesh.vertexCount * vertexSize)
+            mesh.baseVertex = vertexCount
+            vertexCount += mesh.vertexCount
+        
+        newIndexBuffer = self.createBuffer(self.indexRanges.capacity * indexSize)
+        glState.bindBuffer(GL_COPY_READ_BUFFER, self.indexBuffer)
+        indexCount = 0
+        for mesh in sorted(self.meshes, key=lambda mesh: mesh.firstIndex):
+            glCopyBufferSubData(GL_COPY_READ_BUFFER, GL_COPY_WRITE_BUFFER, mesh.firstIndex * indexSize,
+                                indexCount * indexSize, mesh.indexCount * indexSize)
+            mesh.firstIndex = indexCount
+            indexCount += mesh.indexCount
+        
+        glState.deleteBuffer(self.vertexBuffer)
+        glState.deleteBuffer(self.indexBuffer)
+        self.vertexBuffer = newVertexBuffer
+        self.indexBuffer = newIndexBuffer
+        self.vertexRanges.reset(vertexCount)
+        self.indexRanges.reset(indexCount)
+        self.copiedBytes += vertexCount * vertexSize + indexCount * indexSize
+        self.bindBuffers()
+    
+    # Returns the fraction of the free vertex and index space that is outside the
+    # largest free range of each buffer, i.e. that only smaller meshes can use;
+    # compact() brings both to 0
+    def fragmentation(self):
+        fractions = []
+        for ranges in (self.vertexRanges, self.indexRanges):
+            freeSize = ranges.freeSize()
+            fractions.append(1.0 - ranges.largestFreeSize() / float(freeSize) if freeSize else 0.0)
+        return max(fractions)
+    
+    # Draws mesh with vao, which must be bound
+    def draw(self, mode, mesh):
+        glDrawElementsBaseVertex(mode, mesh.indexCount, self.indexType,
+                                 ctypes.c_void_p(mesh.firstIndex * self.indexDtype.itemsize), mesh.baseVertex)
+
+# Batched transform builders. Each takes arrays with one entry per matrix and returns an
+# (N, 4, 4) float32 stack of row-major matrices, laid out like the single matrices the
+# Tut 06 functions build (so transpose them for glUniformMatrix4fv, or upload them with
+# InstanceMatrixBuffer). If out is given (any (N, 4, 4) float32 array or view, such as
+# every fifth matrix of a larger stack) the matrices are written there and out is
+# returned; nothing else of size N is kept.
+
+# Returns out (allocated if None) filled with count identity matrices
+def identityMatrices(count, out=None):
+    if out is None:
+        out = np.empty((count, 4, 4), dtype='float32')
+    out[...] = np.identity(4, dtype='float32')
+    return out
+
+# Rotations about the X axis by angles (radians), as built by Rotations.py's rotateX
+def rotationXMatrices(angles, out=None):
+    angles = np.asarray(angles, dtype='float64')
+    out = identityMatrices(len(angles), out)
+    fCos = np.cos(angles)
+    fSin = np.sin(angles)
+    out[:, 1, 1] = fCos
+    out[:, 2, 1] = -fSin
+    out[:, 1, 2] = fSin
+    out[:, 2, 2] = fCos
+    return out
+
+# Rotations about the Y axis, as built by rotateY
+def rotationYMatrices(angles, out=None):
+    angles = np.asarray(angles, dtype='float64')
+    out = identityMatrices(len(angles), out)
+    fCos = np.cos(angles)
+    fSin = np.sin(angles)
+    out[:, 0, 0] = fCos
+    out[:, 2, 0] = fSin
+    out[:, 0, 2] = -fSin
+    out[:, 2, 2] = fCos
+    return out
+
+# Rotations about the Z axis, as built by rotateZ
+def rotationZMatrices(angles, out=None):
+    angles = np.asarray(angles, dtype='float64')
+    out = identityMatrices(len(angles), out)
+    fCos = np.cos(angles)
+    fSin = np.sin(angles)
+    out[:, 0, 0] = fCos
+    out[:, 1, 0] = -fSin
+    out[:, 0, 1] = fSin
+    out[:, 1, 1] = fCos
+    return out
+
+# Rotations about axes (an (N, 3) array, or one axis for all) by angles, as built by
+# rotateAxis. The axes are normalized here.
+def rotationAxisMatrices(angles, axes, out=None):
+    angles = np.asarray(angles, dtype='float64')
+    axes = np.asarray(axes, dtype='float64')
+    axes = axes / np.sqrt((axes * axes).sum(axis=-1))[..., np.newaxis]
+    axes = np.broadcast_to(axes, (len(angles), 3))
+    x = axes[:, 0]
+    y = axes[:, 1]
+    z = axes[:, 2]
+    
+    out = identityMatrices(len(angles), out)
+    fCos = np.cos(angles)
+    fInvCos = 1.0 - fCos
+    fSin = np.sin(angles)
+    out[:, 0, 0] = (x * x) + ((1 - x * x) * fCos)
+    out[:, 1, 0] = x * y * fInvCos - (z * fSin)
+    out[:, 2, 0] = x * z * fInvCos + (y * fSin)
+    
+    out[:, 0, 1] = x * y * fInvCos + (z * fSin)
+    out[:, 1, 1] = (y * y) + ((1 - y * y) * fCos)
+    out[:, 2, 1] = y * z * fInvCos - (x * fSin)
+    
+    out[:, 0, 2] = x * z * fInvCos - (y * fSin)
+    out[:, 1, 2] = y * z * fInvCos + (x * fSin)
+    out[:, 2, 2] = (z * z) + ((1 - z * z) * fCos)
+    return out
+
+# Scales along X, Y and Z, from an (N, 3) array of factors, as built by Scale.py
+def scaleMatrices(scales, out=None):
+    scales = np.asarray(scales, dtype='float64')
+    out = identityMatrices(len(scales), out)
+    out[:, 0, 0] = scales[:, 0]
+    out[:, 1, 1] = scales[:, 1]
+    out[:, 2, 2] = scales[:, 2]
+    return out
+
+# Translations by an (N, 3) array of offsets, as built by Translation.py
+def translationMatrices(offsets, out=None):
+    offsets = np.asarray(offsets, dtype='float64')
+    out = identityMatrices(len(offsets), out)
+    out[:, :3, 3] = offsets
+    return out
+
+# Single-matrix builders, for code that rebuilds a few matrices every frame. Each writes
+# a row-major (4, 4) float32 matrix into out, which the caller allocates once and keeps,
+# and returns it; no array (or other Python object) is created per call. Upload the
+# result with transpose=GL_TRUE, e.g. glUniformMatrix4fv(location, 1, GL_TRUE, matrix):
+# passing matrix.transpose() makes PyOpenGL copy the non-contiguous view every time.
+# out is allocated only if None.
+IDENTITY_MATRIX = np.identity(4, dtype='float32')
+
+# Returns out (allocated if None) set to the identity
+def identityMatrix(out=None):
+    if out is None:
+        out = np.empty((4, 4), dtype='float32')
+    np.copyto(out, IDENTITY_MATRIX)
+    return out
+
+# Rotation about the X axis by fAngRad, as built by Rotations.py's rotateX
+def rotationXMatrix(fAngRad, out=None):
+    out = identityMatrix(out)
+    fCos = cos(fAngRad)
+    fSin = sin(fAngRad)
+    out[1, 1] = fCos
+    out[2, 1] = -fSin
+    out[1, 2] = fSin
+    out[2, 2] = fCos
+    return out
+
+# Rotation about the Y axis, as built by rotateY
+def rotationYMatrix(fAngRad, out=None):
+    out = identityMatrix(out)
+    fCos = cos(fAngRad)
+    fSin = sin(fAngRad)
+    out[0, 0] = fCos
+    out[2, 0] = fSin
+    out[0, 2] = -fSin
+    out[2, 2] = fCos
+    return out
+
+# Rotation about the Z axis, as built by rotateZ
+def rotationZMatrix(fAngRad, out=None):
+    out = identityMatrix(out)
+    fCos = cos(fAngRad)
+    fSin = sin(fAngRad)
+    out[0, 0] = fCos
+    out[1, 0] = -fSin
+    out[0, 1] = fSin
+    out[1, 1] = fCos
+    return out
+
+# Rotation about axis (x, y, z), which is normalized here, as built by rotateAxis
+def rotationAxisMatrix(fAngRad, axis, out=None):
+    x, y, z = axis
+    magnitude = sqrt(x * x + y * y + z * z)
+    x /= magnitude
+    y /= magnitude
+    z /= magnitude
+    
+    out = identityMatrix(out)
+    fCos = cos(fAngRad)
+    fInvCos = 1.0 - fCos
+    fSin = sin(fAngRad)
+    out[0, 0] = (x * x) + ((1 - x * x) * fCos)
+    out[1, 0] = x * y * fInvCos - (z * fSin)
+    out[2, 0] = x * z * fInvCos + (y * fSin)
+    
+    out[0, 1] = x * y * fInvCos + (z * fSin)
+    out[1, 1] = (y * y) + ((1 - y * y) * fCos)
+    out[2, 1] = y * z * fInvCos - (x * fSin)
+    
+    out[0, 2] = x * z * fInvCos - (y * fSin)
+    out[1, 2] = y * z * fInvCos + (x * fSin)
+    out[2, 2] = (z * z) + ((1 - z * z) * fCos)
+    return out
+
+# Scale by the factors (x, y, z), as built by Scale.py
+def scaleMatrix(scale, out=None):
+    out = identityMatrix(out)
+    out[0, 0] = scale[0]
+    out[1, 1] = scale[1]
+    out[2, 2] = scale[2]
+    return out
+
+# Translation by offset (x, y, z), as built by Translation.py
+def translationMatrix(offset, out=None):
+    return setMatrixOffset(identityMatrix(out), offset)
+
+# Sets the translation column of matrix to offset (x, y, z), leaving the rest as it is
+def setMatrixOffset(matrix, offset):
+    matrix[0, 3] = offset[0]
+    matrix[1, 3] = offset[1]
+    matrix[2, 3] = offset[2]
+    return matrix
+
+# Returns out (allocated if None) set to the product a * b. out must not be a or b.
+def multiplyMatrices(a, b, out=None):
+    if out is None:
+        out = np.empty((4, 4), dtype='float32')
+    return np.dot(a, b, out)
+
+# Quaternions, for interpolating and composing many rotations at once. A rotation is a
+# unit quaternion stored as (x, y, z, w), so an (N, 4) float32 array holds N of them.
+# The functions take whole arrays (a single quaternion, axis or factor is broadcast
+# against them) and write into out if given, which may be one of the inputs.
+# quaternionMatrices turns quaternions into rotation matrices that rotate a vector v
+# to matrix . v, laid out (row-major) for glUniformMatrix4fv(..., GL_TRUE) and
+# InstanceMatrixBuffer. Note that for the same angle the Tut 06 rotations above turn the
+# other way, as the tutorial code always has: rotationAxisMatrices(angles, axes) is
+# quaternionMatrices(axisAngleQuaternions(axes, -angles)).
+
+# Returns the float32 array of shape shape + (4,) in out, or a new one if out is None
+def quaternionArray(shape, out=None):
+    if out is None:
+        out = np.empty(tuple(shape) + (4,), dtype='float32')
+    return out
+
+# Rotations by angles (radians) about axes (an (N, 3) array, or one axis for all),
+# which are normalized here
+def axisAngleQuaternions(axes, angles, out=None):
+    angles = np.asarray(angles, dtype='float64')
+    axes = np.asarray(axes, dtype='float64')
+    axes = axes / np.sqrt((axes * axes).sum(axis=-1))[..., np.newaxis]
+    fHalfAngles = angles[..., np.newaxis] * 0.5
+    
+    xyz = axes * np.sin(fHalfAngles)
+    out = quaternionArray(xyz.shape[:-1], out)
+    out[..., :3] = xyz
+    out[..., 3] = np.cos(fHalfAngles[..., 0])
+    return out
+
+# Returns the products a * b: the rotations that apply b, then a
+def multiplyQuaternions(a, b, out=None):
+    a = np.asarray(a)
+    b = np.asarray(b)
+    ax, ay, az, aw = a[..., 0], a[..., 1], a[..., 2], a[..., 3]
+    bx, by, bz, bw = b[..., 0], b[..., 1], b[..., 2], b[..., 3]
+    
+    # computed in full before writing, since out may be a or b
+    x = aw * bx + ax * bw + ay * bz - az * by
+    y = aw * by - ax * bz + ay * bw + az * bx
+    z = aw * bz + ax * by - ay * bx + az * bw
+    w = aw * bw - ax * bx - ay * by - az * bz
+    out = quaternionArray(np.broadcast(x, w).shape, out)
+    out[..., 0] = x
+    out[..., 1] = y
+    out[..., 2] = z
+    out[..., 3] = w
+    return out
+
+# Returns q scaled to unit length
+def normalizeQuaternions(q, out=None):
+    q = np.asarray(q)
+    out = quaternionArray(q.shape[:-1], out)
+    np.divide(q, np.sqrt((q * q).sum(axis=-1))[..., np.newaxis], out)
+    return out
+
+# Returns b, negated where that brings it closer to a, since q and -q are the same
+# rotation and interpolating towards the nearer one takes the short way round.
+# Also returns the dot products of a with the result.
+def alignQuaternions(a, b):
+    fDots = (a * b).sum(axis=-1)
+    fSigns = np.where(fDots < 0.0, -1.0, 1.0)
+    return b * fSigns[..., np.newaxis], fDots * fSigns
+
+# Normalized linear interpolation from a to b by factors t (0 gives a, 1 gives b).
+# Cheaper than slerpQuaternions, but the speed of the rotation is not constant in t.
+def nlerpQuaternions(a, b, t, out=None):
+    a = np.asarray(a, dtype='float64')
+    b, fDots = alignQuaternions(a, np.asarray(b, dtype='float64'))
+    t = np.asarray(t, dtype='float64')[..., np.newaxis]
+    return normalizeQuaternions(a * (1.0 - t) + b * t, out)
+
+# Spherical linear interpolation from a to b by factors t: rotates at constant speed
+def slerpQuaternions(a, b, t, out=None):
+    a = np.asarray(a, dtype='float64')
+    b, fDots = alignQuaternions(a, np.asarray(b, dtype='float64'))
+    t = np.asarray(t, dtype='float64')
+    
+    fTheta = np.arccos(np.minimum(fDots, 1.0))
+    fSinTheta = np.sin(fTheta)
+    # nearly equal rotations would divide by almost zero; interpolate those linearly
+    linear = fSinTheta < 1e-4
+    fSinTheta = np.where(linear, 1.0, fSinTheta)
+    fWeightsA = np.where(linear, 1.0 - t, np.sin((1.0 - t) * fTheta) / fSinTheta)
+    fWeightsB = np.where(linear, t, np.sin(t * fTheta) / fSinTheta)
+    return normalizeQuaternions(a * fWeightsA[..., np.newaxis] + b * fWeightsB[..., np.newaxis], out)
+
+# Returns the (N, 4, 4) rotation matrices of the (N, 4) unit quaternions q, or the
+# (4, 4) matrix of a single (4,) quaternion
+def quaternionMatrices(q, out=None):
+    q = np.asarray(q, dtype='float64')
+    x, y, z, w = q[..., 0], q[..., 1], q[..., 2], q[..., 3]
+    
+    if out is None:
+        out = np.empty(q.shape[:-1] + (4, 4), dtype='float32')
+    out[...] = np.identity(4, dtype='float32')
+    out[..., 0, 0] = 1.0 - 2.0 * (y * y + z * z)
+    out[..., 0, 1] = 2.0 * (x * y - z * w)
+    out[..., 0, 2] = 2.0 * (x * z + y * w)
+    
+    out[..., 1, 0] = 2.0 * (x * y + z * w)
+    out[..., 1, 1] = 1.0 - 2.0 * (x * x + z * z)
+    out[..., 1, 2] = 2.0 * (y * z - x * w)
+    
+    out[..., 2, 0] = 2.0 * (x * z - y * w)
+    out[..., 2, 1] = 2.0 * (y * z + x * w)
+    out[..., 2, 2] = 1.0 - 2.0 * (x * x + y * y)
+    return out
+
+# A hierarchy of transforms. Each node has a parent (or -1) and a local transform made
+# of a translation, a rotation (a quaternion, see above) and a scale, stored as one
+# array per component: translations[node], rotations[node] and scales[node]. The world
+# matrix of a node, worldMatrices[node], is its parent's world matrix times its local
+# matrix T * R * S, laid out like the builders above (upload it with GL_TRUE).
+# The set* methods mark a node dirty; update() then rebuilds the local matrices of the
+# dirty nodes and the world matrices of the dirty subtrees only, one tree level at a
+# time with batched NumPy operations. A parent is always added before its children, so
+# node numbers are in topological order. The arrays are replaced when the graph grows,
+# so views of them are only valid until the next addNode.
+class SceneGraph(object):
+    def __init__(self, capacity=16):
+        self.nodeCount = 0
+        self.levels = None
+        self.allocate(capacity)
+    
+    # (Re)allocates the per-node arrays for capacity nodes, keeping the existing nodes
+    def allocate(self, capacity):
+        arrays = {
+            'parents': np.full(capacity, -1, dtype='int32'),
+            'depths': np.zeros(capacity, dtype='int32'),
+            'translations': np.zeros((capacity, 3), dtype='float32'),
+            'rotations': np.zeros((capacity, 4), dtype='float32'),
+            'scales': np.ones((capacity, 3), dtype='float32'),
+            'localMatrices': identityMatrices(capacity),
+            'worldMatrices': identityMatrices(capacity),
+            'dirty': np.zeros(capacity, dtype='bool'),
+        }
+        arrays['rotations'][:, 3] = 1.0
+        for strName, array in arrays.items():
+            if self.nodeCount:
+                array[:self.nodeCount] = getattr(self, strName)[:self.nodeCount]
+            setattr(self, strName, array)
+        self.capacity = capacity
+    
+    # Adds a node under parent (-1 for a root) and returns its number
+    def addNode(self, parent=-1, translation=(0.0, 0.0, 0.0), rotation=(0.0, 0.0, 0.0, 1.0), scale=(1.0, 1.0, 1.0)):
+        if parent >= self.nodeCount:
+            raise ValueError('Parent node %d does not exist' % parent)
+        if self.nodeCount == self.capacity:
+            self.allocate(self.capacity * 2)
+        
+        node = self.nodeCount
+        self.nodeCount += 1
+        self.parents[node] = parent
+        self.depths[node] = 0 if parent < 0 else self.depths[parent] + 1
+        self.translations[node] = translation
+        self.rotations[node] = rotation
+        self.scales[node] = scale
+        self.dirty[node] = True
+        self.levels = None
+        return node
+    
+    def setTranslation(self, node, translation):
+        self.translations[node] = translation
+        self.dirty[node] = True
+    
+    def setRotation(self, node, rotation):
+        self.rotations[node] = rotation
+        self.dirty[node] = True
+    
+    def setScale(self, node, scale):
+        self.scales[node] = scale
+        self.dirty[node] = True
+    
+    # Returns a list with the array of node numbers at each depth, roots first
+    def getLevels(self):
+        if self.levels is None:
+            depths = self.depths[:self.nodeCount]
+            order = np.argsort(depths, kind='mergesort')
+            counts = np.bincount(depths)
+            self.levels = np.split(order, np.cumsum(counts)[:-1])
+        return self.levels
+    
+    # Recomputes the matrices of the dirty nodes and their descendants, and returns
+    # the number of world matrices recomputed
+    def update(self):
+        dirty = self.dirty[:self.nodeCount]
+        changed = np.flatnonzero(dirty)
+        if len(changed) == 0:
+            return 0
+        
+        # T * R * S: scaling the columns of R, then setting the translation column
+        localMatrices = quaternionMatrices(self.rotations[changed])
+        localMatrices[:, :3, :3] *= self.scales[changed][:, np.newaxis, :]
+        localMatrices[:, :3, 3] = self.translations[changed]
+        self.localMatrices[changed] = localMatrices
+        
+        for depth, level in enumerate(self.getLevels()):
+            if depth == 0:
+                stale = level[dirty[level]]
+                self.worldMatrices[stale] = self.localMatrices[stale]
+                continue
+            # a node is stale if it changed or its parent's world matrix did
+            parents = self.parents[level]
+            dirty[level] |= dirty[parents]
+            stale = level[dirty[level]]
+            self.worldMatrices[stale] = np.matmul(self.worldMatrices[self.parents[stale]], self.localMatrices[stale])
+        
+        staleCount = int(np.count_nonzero(dirty))
+        dirty[:] = False
+        return staleCount
+
+# Returns the six planes (a, b, c, d) bounding the volume that matrix (a camera-to-clip
+# matrix, or one times a view matrix, laid out as uploaded with GL_TRUE) maps into the
+# clip volume: left, right, bottom, top, near and far, as a (6, 4) array. The planes
+# are normalized, so a * x + b * y + c * z + d is the distance of point (x, y, z) from
+# the plane, positive on the inside.
+def frustumPlanes(matrix):
+    rows = np.asarray(matrix, dtype='float64')
+    planes = np.empty((6, 4))
+    for axis in range(3):
+        # -w <= x <= w, and the same for y and z
+        planes[2 * axis] = rows[3] + rows[axis]
+        planes[2 * axis + 1] = rows[3] - rows[axis]
+    planes /= np.sqrt((planes[:, :3] * planes[:, :3]).sum(axis=1))[:, np.newaxis]
+    return planes
+
+# Returns, for each sphere (centers an (N, 3) array, radii an (N,) array or one radius
+# for all), whether it is at least partly inside all of the planes
+def spheresInFrustum(planes, centers, radii):
+    distances = np.dot(centers, planes[:, :3].T)
+    distances += planes[:, 3]
+    return (distances >= -np.reshape(radii, (-1, 1))).all(axis=1)
+
+# Skips the instances whose bounding spheres are outside the view frustum. Each instance
+# is an object whose bounding sphere, of radius fRadius about its origin, is moved by
+# its model-to-camera matrix; the matrices are tested all at once in cull(), which
+# returns the indices of the instances to draw. drawn and culled count the instances
+# since the last endFrame().
+class FrustumCuller(object):
+    def __init__(self, fRadius):
+        self.radius = fRadius
+        self.planes = None
+        self.drawn = 0
+        self.culled = 0
+    
+    # Sets the frustum from the camera-to-clip matrix (times the view matrix, if any)
+    def setMatrix(self, matrix):
+        self.planes = frustumPlanes(matrix)
+    
+    # Returns the indices of the (N, 4, 4) row-major model-to-camera matrices whose
+    # objects may be visible
+    def cull(self, matrices):
+        centers = matrices[:, :3, 3]
+        # the sphere grows with the largest scale along the object's axes (the columns)
+        axes = matrices[:, :3, :3]
+        radii = np.sqrt(np.einsum('nij,nij->nj', axes, axes).max(axis=1)) * self.radius
+        visible = np.flatnonzero(spheresInFrustum(self.planes, centers, radii))
+        self.drawn += len(visible)
+        self.culled += len(matrices) - len(visible)
+        return visible
+    
+    # Returns (drawn, culled) since the last call, for per-frame reporting
+    def endFrame(self):
+        counts = (self.drawn, self.culled)
+        self.drawn = 0
+        self.culled = 0
+        return counts
+
+# Runs an animation at a fixed number of steps per second, however often frames are
+# drawn, and blends the two steps around the time of each frame for drawing.
+# simulate(fTime, out) writes the state at time fTime (in seconds) into out, an array
+# of the given shape; step k is the state at k * fStepTime. update(fTime) runs the
+# steps up to the first one after fTime (several, or none, depending on how far the
+# frame is from the last one) and returns the linear blend of that step and the one
+# before it. A frame more than maxSteps steps behind skips the steps it would never
+# draw. stepCount counts the calls of simulate.
+class FixedTimestep(object):
+    def __init__(self, simulate, shape, fStepTime, maxSteps=5):
+        self.simulate = simulate
+        self.stepTime = fStepTime
+        self.maxSteps = maxSteps
+        self.previous = np.zeros(shape, dtype='float32')
+        self.current = np.zeros(shape, dtype='float32')
+        self.state = np.zeros(shape, dtype='float32')
+        self.step = None
+        self.stepCount = 0
+    
+    def advance(self):
+        self.previous, self.current = self.current, self.previous
+        self.step += 1
+        self.simulate(self.step * self.stepTime, self.current)
+        self.stepCount += 1
+    
+    # Returns the state to draw at time fTime
+    def update(self, fTime):
+        targetStep = int(fTime // self.stepTime) + 1
+        if self.step is None or not 0 <= targetStep - self.step <= self.maxSteps:
+            # start over from the step before the frame
+            self.step = targetStep - 2
+            self.advance()
+        while self.step < targetStep:
+            self.advance()
         
-    return program
+        fAlpha = fTime / self.stepTime - (self.step - 1)
+        np.subtract(self.current, self.previous, out=self.state)
+        self.state *= fAlpha
+        self.state += self.previous
+        return self.state
+
+# Set PYOPENGL_TUTORIAL_SIMULATION_RATE to a number of steps per second to run the
+# animations of the tutorials that support it with a FixedTimestep at that rate
+simulationRate = float(os.environ.get('PYOPENGL_TUTORIAL_SIMULATION_RATE') or 0)
+
+# Returns a FixedTimestep running simulate at simulationRate, or None if no rate is set
+def createFixedTimestep(simulate, shape):
+    if simulationRate <= 0:
+        return None
+    return FixedTimestep(simulate, shape, 1.0 / simulationRate)
+
+# A transform function that repeats every fLoopDuration seconds, baked into a table of
+# sampleCount matrices, one every fLoopDuration / sampleCount seconds from time 0.
+# func(fElapsedTime, out) writes the (4, 4) matrix at fElapsedTime into out, like the
+# Tut 06 functions. lookup() and matrix() blend the two samples around each time, at
+# the same cost whatever func computes. The table is baked by bake(), or on the first
+# lookup; maxError is then the largest difference of any element from func, measured
+# halfway between the samples (where the blend of a smooth function is furthest from
+# it; a function with corners between samples can be further off near them).
+# With cache set, the table and maxError are stored in PROGRAM_CACHE_DIR, keyed by the
+# function's name, the source of its module and of this one, the loop duration and the
+# sample count, so that later runs load them instead of sampling func again.
+class AnimationTable(object):
+    def __init__(self, func, fLoopDuration, sampleCount=256, cache=True):
+        self.func = func
+        self.loopDuration = fLoopDuration
+        self.sampleCount = sampleCount
+        self.cacheFile = findAnimationCacheFile(func, fLoopDuration, sampleCount) if cache else None
+        self.table = None
+        self.differences = None
+        self.varyingElements = None
+        self.maxError = None
+    
+    def bake(self):
+        if self.table is not None:
+            return
+        if self.cacheFile is None or not self.loadCache():
+            self.sample()
+            if self.cacheFile is not None:
+                self.saveCache()
+        # the change to the next sample; the last sample is followed by the first
+        self.differences = np.roll(self.table, -1, axis=0) - self.table
+        # lookup() only blends the elements that change, one contiguous column at a time
+        flatTable = self.table.reshape(self.sampleCount, 16)
+        flatDifferences = self.differences.reshape(self.sampleCount, 16)
+        self.varyingElements = [(element // 4, element % 4, np.ascontiguousarray(flatTable[:, element]),
+                                 np.ascontiguousarray(flatDifferences[:, element]))
+                                for element in np.flatnonzero(np.abs(flatDifferences).max(axis=0))]
+    
+    def sample(self):
+        fStepTime = self.loopDuration / self.sampleCount
+        self.table = np.empty((self.sampleCount, 4, 4), dtype='float32')
+        for index in range(self.sampleCount):
+            self.func(index * fStepTime, self.table[index])
+        
+        blended = 0.5 * (self.table + np.roll(self.table, -1, axis=0))
+        exact = np.empty((4, 4), dtype='float32')
+        self.maxError = 0.0
+        for index in range(self.sampleCount):
+            self.func((index + 0.5) * fStepTime, exact)
+            self.maxError = max(self.maxError, float(np.abs(blended[index] - exact).max()))
+    
+    def loadCache(self):
+        try:
+            with open(self.cacheFile, 'rb') as f:
+                data = np.load(f)
+                table = data['table']
+                self.maxError = float(data['maxError'])
+        except (IOError, OSError, KeyError, ValueError, zipfile.BadZipfile):
+            return False
+        if table.shape != (self.sampleCount, 4, 4):
+            return False
+        self.table = table.astype('float32')
+        return True
     
+    # Failures are not fatal, since the cache is only an optimization
+    def saveCache(self):
+        try:
+            if not os.path.isdir(PROGRAM_CACHE_DIR):
+                os.makedirs(PROGRAM_CACHE_DIR)
+            # see saveProgramBinary
+            strTempName = self.cacheFile + '.%d.tmp' % os.getpid()
+            with open(strTempName, 'wb') as f:
+                np.savez(f, table=self.table, maxError=self.maxError)
+            os.rename(strTempName, self.cacheFile)
+        except (IOError, OSError) as e:
+            print("Could not write animation cache " + self.cacheFile + ": " + str(e))
+    
+    # Returns the (N, 4, 4) stack of the matrices at the N fElapsedTimes, written into
+    # out if given, like the batched Tut 06 functions
+    def lookup(self, fElapsedTimes, out=None):
+        self.bake()
+        fPositions = np.asarray(fElapsedTimes) * (self.sampleCount / self.loopDuration)
+        fSamples = np.floor(fPositions)
+        fractions = (fPositions - fSamples).astype('float32')
+        indices = fSamples.astype('intp')
+        indices %= self.sampleCount
+        
+        if out is None:
+            out = np.empty((len(indices), 4, 4), dtype='float32')
+        # out may be any view (e.g. every n-th matrix of a stack), so it is written
+        # through its own indices rather than a reshaped copy
+        out[...] = self.table[0]
+        value = np.empty(len(indices), dtype='float32')
+        sample = np.empty(len(indices), dtype='float32')
+        for row, column, values, differences in self.varyingElements:
+            np.take(differences, indices, out=value)
+            value *= fractions
+            np.take(values, indices, out=sample)
+            value += sample
+            out[:, row, column] = value
+        return out
+    
+    # Returns the matrix at fElapsedTime, written into out if given
+    def matrix(self, fElapsedTime, out=None):
+        self.bake()
+        fPosition = (fElapsedTime % self.loopDuration) * (self.sampleCount / self.loopDuration)
+        # rounding can put a time just below a whole loop at position sampleCount
+        index = min(int(fPosition), self.sampleCount - 1)
+        if out is None:
+            out = np.empty((4, 4), dtype='float32')
+        np.multiply(self.differences[index], fPosition - index, out)
+        out += self.table[index]
+        return out
+
+# Returns the path of the cache entry of an AnimationTable, or None if caching is
+# disabled or the function's source cannot be found
+def findAnimationCacheFile(func, fLoopDuration, sampleCount):
+    if PROGRAM_CACHE_DIR is None:
+        return None
+    try:
+        strSourceFiles = [inspect.getsourcefile(func), inspect.getsourcefile(findAnimationCacheFile)]
+    except TypeError:
+        return None
     
+    hasher = hashlib.sha1()
+    hasher.update(('%s:%r:%d:' % (func.__name__, float(fLoopDuration), sampleCount)).encode('utf-8'))
+    for strSourceFile in strSourceFiles:
+        if strSourceFile is None or not os.path.isfile(strSourceFile):
+            return None
+        with open(strSourceFile, 'rb') as f:
+            hasher.update(f.read())
+    
+    return os.path.join(PROGRAM_CACHE_DIR, hasher.hexdigest() + '.npz')
+
+# Set PYOPENGL_TUTORIAL_ANIMATION_TABLES to a number of samples per loop to draw the
+# animations of the tutorials that support it from AnimationTables
+animationTableSamples = int(os.environ.get('PYOPENGL_TUTORIAL_ANIMATION_TABLES') or 0)
+
+# Returns an AnimationTable for each function of funcs, which repeat every
+# fLoopDurations seconds, baked with animationTableSamples samples and with their errors
+# printed, or None if no sample count is set
+def createAnimationTables(funcs, fLoopDurations):
+    if animationTableSamples <= 0:
+        return None
+    tables = []
+    for func, fLoopDuration in zip(funcs, fLoopDurations):
+        table = AnimationTable(func, fLoopDuration, animationTableSamples)
+        table.bake()
+        print("Animation table for %s: %d samples, max error %.3g" % (func.__name__, table.sampleCount, table.maxError))
+        tables.append(table)
+    return tables
+
+# Returns the number of bytes a GL call sends to the driver, for the calls that upload data
+def uploadedBytes(strName, args):
+    if strName in ('glBufferData', 'glBufferSubData'):
+        for arg in args[1:]:
+            if hasattr(arg, 'nbytes'):
+                return arg.nbytes
+        # size given explicitly, with no data
+        return args[1] if strName == 'glBufferData' else args[2]
+    if strName == 'glMapBufferRange':
+        # glMapBufferRange(target, offset, length, access); assumes the range gets written
+        return args[2]
+    if strName.startswith('glUniformMatrix'):
+        # glUniformMatrix4fv(location, count, transpose, value)
+        return args[3].nbytes if hasattr(args[3], 'nbytes') else 0
+    if strName.startswith('glUniform'):
+        # glUniform3f(location, x, y, z) and friends; every component is 4 bytes
+        return 4 * (len(args) - 1)
+    return 0
+
+# Records the GL calls issued while drawing frames: the number of calls and the Python
+# time spent in each gl* function, and the bytes uploaded. attach() replaces the gl*
+# functions in the tutorial's module and in this one by tracing wrappers, so nothing
+# is wrapped (and nothing costs extra) unless a tracer is attached.
+class GLCallTracer(object):
+    def __init__(self):
+        self.tracing = False
+        self.wrappers = {}
+        self.namesByFunction = {}
+        self.reset()
+    
+    def reset(self):
+        self.frames = 0
+        self.calls = {}
+        self.times = {}
+        self.bytesUploaded = 0
+    
+    # Wraps the gl* functions used by display's module and by this module, and returns
+    # display wrapped so that only the calls made while drawing a frame are counted
+    def attach(self, display):
+        self.install(display.__globals__)
+        self.install(globals())
+        # Uniform looks its setters up in these tables rather than in the module
+        self.installTable(UNIFORM_SETTERS)
+        self.installTable(UNIFORM_MATRIX_SETTERS)
+        
+        def tracedDisplay():
+            self.tracing = True
+            try:
+                display()
+            finally:
+                self.tracing = False
+                self.frames += 1
+        return tracedDisplay
+    
+    def install(self, namespace):
+        for strName, func in list(namespace.items()):
+            # gl* entry points only: glu* and glut* names have a lower case third letter
+            if strName.startswith('gl') and strName[2:3].isupper() and callable(func):
+                if strName not in self.wrappers:
+                    self.wrappers[strName] = self.wrap(strName, func)
+                    # by id, since ctypes function pointers cannot be hashed
+                    self.namesByFunction[id(func)] = strName
+                namespace[strName] = self.wrappers[strName]
+    
+    def installTable(self, table):
+        for key, func in list(table.items()):
+            if id(func) in self.namesByFunction:
+                table[key] = self.wrappers[self.namesByFunction[id(func)]]
+    
+    def wrap(self, strName, func):
+        def tracedCall(*args, **kwargs):
+            if not self.tracing:
+                return func(*args, **kwargs)
+            start = timeit.default_timer()
+            result = func(*args, **kwargs)
+            self.times[strName] = self.times.get(strName, 0.0) + timeit.default_timer() - start
+            self.calls[strName] = self.calls.get(strName, 0) + 1
+            self.bytesUploaded += uploadedBytes(strName, args)
+            return result
+        tracedCall.__name__ = strName
+        return tracedCall
+    
+    def totalCalls(self):
+        return sum(self.calls.values())
+    
+    # Returns the histogram as text: one line per function, most expensive first, with
+    # the calls and the microseconds spent per frame
+    def histogram(self):
+        frames = max(self.frames, 1)
+        totalTime = sum(self.times.values()) or 1.0
+        lines = ['GL calls over %d frames: %.1f calls, %.1f us and %.0f bytes uploaded per frame' %
+                 (self.frames, self.totalCalls() / float(frames),
+                  sum(self.times.values()) * 1e6 / frames, self.bytesUploaded / float(frames))]
+        for strName in sorted(self.times, key=self.times.get, reverse=True):
+            share = self.times[strName] / totalTime
+            lines.append('%-32s %8.1f calls %10.1f us  %s' %
+                         (strName, self.calls[strName] / float(frames),
+                          self.times[strName] * 1e6 / frames, '#' * int(round(share * 40))))
+        return '\n'.join(lines)
+    
+    def dump(self):
+        print(self.histogram())
+
+# Tracer enabled by setting PYOPENGL_TUTORIAL_TRACE; the context providers attach it to
+# the tutorial's display callback. The histogram is printed at exit and, in a GLUT
+# window, whenever F12 is pressed (which also starts a new count).
+glTracer = GLCallTracer() if os.environ.get('PYOPENGL_TUTORIAL_TRACE') else None
+if glTracer is not None:
+    atexit.register(glTracer.dump)
+
+# One named region timed by a GPUTimer. Each sample brackets the region with a
+# GL_TIME_ELAPSED query taken from a small ring of query objects; results are read
+# back only once GL reports them available, so timing never stalls the pipeline.
+# If every query in the ring is still in flight, the region's GPU time is not sampled
+# that frame (counted in dropped). The CPU time of the region is measured as well.
+# Regions cannot be nested, since GL allows only one GL_TIME_ELAPSED query at a time.
+class GPUTimerRegion(object):
+    def __init__(self, strName, ringSize):
+        self.name = strName
+        self.ringSize = ringSize
+        self.queries = None
+        self.pending = []
+        self.nextQuery = 0
+        self.activeQuery = None
+        self.start = 0.0
+        self.cpuTime = 0.0
+        self.cpuSamples = 0
+        self.gpuTime = 0.0
+        self.gpuSamples = 0
+        self.dropped = 0
+    
+    def __enter__(self):
+        if self.queries is None:
+            self.queries = list(glGenQueries(self.ringSize))
+        self.collect()
+        
+        query = self.queries[self.nextQuery]
+        if query in self.pending:
+            self.activeQuery = None
+            self.dropped += 1
+        else:
+            glBeginQuery(GL_TIME_ELAPSED, query)
+            self.activeQuery = query
+        self.start = timeit.default_timer()
+        return self
+    
+    def __exit__(self, excType, excValue, traceback):
+        self.cpuTime += timeit.default_timer() - self.start
+        self.cpuSamples += 1
+        if self.activeQuery is not None:
+            glEndQuery(GL_TIME_ELAPSED)
+            self.pending.append(self.activeQuery)
+            self.nextQuery = (self.nextQuery + 1) % self.ringSize
+            self.activeQuery = None
+        return False
+    
+    # Reads back the results that are available without waiting. Queries complete in
+    # the order they were issued, so this stops at the first one still in flight.
+    def collect(self):
+        available = GLuint(0)
+        elapsed = GLuint64(0)
+        while self.pending:
+            query = self.pending[0]
+            glGetQueryObjectuiv(query, GL_QUERY_RESULT_AVAILABLE, ctypes.byref(available))
+            if not available.value:
+                break
+            glGetQueryObjectui64v(query, GL_QUERY_RESULT, ctypes.byref(elapsed))
+            # the result is in nanoseconds
+            self.gpuTime += elapsed.value * 1e-9
+            self.gpuSamples += 1
+            self.pending.pop(0)
+    
+    # Returns the mean CPU and GPU milliseconds per sample, and the sample counts
+    def result(self):
+        return {
+            'cpuMs': self.cpuTime * 1000.0 / max(self.cpuSamples, 1),
+            'gpuMs': self.gpuTime * 1000.0 / max(self.gpuSamples, 1),
+            'cpuSamples': self.cpuSamples,
+            'gpuSamples': self.gpuSamples,
+            'dropped': self.dropped,
+        }
+
+# Stand-in for a GPUTimerRegion while GPU timing is disabled
+class NullTimerRegion(object):
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, excType, excValue, traceback):
+        return False
+
+# Times named regions of a frame on the GPU and the CPU, e.g.
+#   with gpuTimer.region("instances"):
+#       ...draw calls...
+# Timing is off unless enabled is True, in which case region() returns a no-op region.
+class GPUTimer(object):
+    def __init__(self, enabled=False, ringSize=4):
+        self.enabled = enabled
+        self.ringSize = ringSize
+        self.regions = OrderedDict()
+        self.nullRegion = NullTimerRegion()
+    
+    def region(self, strName):
+        if not self.enabled:
+            return self.nullRegion
+        if strName not in self.regions:
+            self.regions[strName] = GPUTimerRegion(strName, self.ringSize)
+        return self.regions[strName]
+    
+    # Reads back all available results; needs the GL context to be current
+    def collect(self):
+        for region in self.regions.values():
+            region.collect()
+    
+    # Returns {region name: region result} for the results read back so far
+    def results(self):
+        return dict((strName, region.result()) for strName, region in self.regions.items())
+    
+    def report(self):
+        lines = []
+        for strName, region in self.regions.items():
+            result = region.result()
+            lines.append('%-24s cpu %9.4f ms  gpu %9.4f ms  (%d samples, %d dropped)' %
+                         (strName, result['cpuMs'], result['gpuMs'], result['gpuSamples'], result['dropped']))
+        return '\n'.join(lines)
+    
+    def dump(self):
+        if self.regions:
+            print(self.report())
+
+# GPU timer used by the tutorials, enabled by setting PYOPENGL_TUTORIAL_GPU_TIMERS.
+# The per-region times are printed at exit. The context may be gone by then, so
+# results still in flight at that point are not included.
+gpuTimer = GPUTimer(bool(os.environ.get('PYOPENGL_TUTORIAL_GPU_TIMERS')))
+if gpuTimer.enabled:
+    atexit.register(gpuTimer.dump)
+
+# The GL functions the tutorials call every frame. In fast mode these are replaced by
+# their raw entry points (see installFastEntryPoints).
+FAST_GL_FUNCTIONS = (
+    'glBindBuffer',
+    'glBindVertexArray',
+    'glBufferSubData',
+    'glClear',
+    'glClearColor',
+    'glClearDepth',
+    'glDrawArrays',
+    'glDrawElements',
+    'glDrawElementsBaseVertex',
+    'glDrawElementsInstanced',
+    'glUniform1f',
+    'glUniform2f',
+    'glUniform3f',
+    'glUniform4f',
+    'glUniformMatrix4fv',
+    'glUseProgram',
+    'glVertexAttribPointer',
+)
+
+# Fast mode, enabled by setting PYOPENGL_TUTORIAL_FAST_GL. PyOpenGL's wrappers convert
+# every argument, look up array handlers and call glGetError after each call; in fast
+# mode the functions above call the driver directly through ctypes instead, and GL
+# errors are checked once per frame. The raw functions take exactly the C arguments,
+# e.g. glBufferSubData(target, offset, size, data) needs its size argument.
+fastEntryPointsEnabled = bool(os.environ.get('PYOPENGL_TUTORIAL_FAST_GL'))
+
+# Fast entry points by name, resolved once for the current context
+fastEntryPoints = {}
+
+# Returns a callable that calls strName's driver entry point through ctypes, with the
+# argument types of PyOpenGL's raw binding, or None if it cannot be resolved. Array
+# arguments become plain pointers; numpy arrays passed for them are made contiguous
+# (and converted to the element type GL expects) on the way.
+def resolveFastEntryPoint(strName):
+    func = globals().get(strName)
+    raw = getattr(func, 'wrappedOperation', func)
+    argTypes = getattr(raw, 'argtypes', None)
+    if argTypes is None:
+        return None
+    address = glPlatform.PLATFORM.getExtensionProcedure(strName.encode('ascii'))
+    if not address:
+        return None
+    
+    arrayArgs = []
+    cArgTypes = []
+    for index, argType in enumerate(argTypes):
+        if argType is ctypes.c_void_p:
+            arrayArgs.append((index, None))
+            cArgTypes.append(ctypes.c_void_p)
+        elif isinstance(argType, type) and issubclass(argType, ArrayDatatype):
+            arrayArgs.append((index, np.dtype(argType.baseType)))
+            cArgTypes.append(ctypes.c_void_p)
+        else:
+            cArgTypes.append(argType)
+    entryPoint = ctypes.CFUNCTYPE(raw.restype, *cArgTypes)(address)
+    if not arrayArgs:
+        return entryPoint
+    
+    def fastCall(*args):
+        args = list(args)
+        # the converted arrays must stay alive until the call returns
+        arrays = []
+        for index, dtype in arrayArgs:
+            array = args[index]
+            if isinstance(array, np.ndarray):
+                if not array.flags.c_contiguous or (dtype is not None and array.dtype != dtype):
+                    array = np.ascontiguousarray(array, dtype)
+                    arrays.append(array)
+                # cheaper than array.ctypes.data
+                args[index] = array.__array_interface__['data'][0]
+        return entryPoint(*args)
+    fastCall.__name__ = strName
+    return fastCall
+
+# Replaces the FAST_GL_FUNCTIONS in the given module namespace, in this module and in
+# the uniform setter tables by their fast entry points. Needs a current context.
+def installFastEntryPoints(namespace):
+    if not fastEntryPoints:
+        for strName in FAST_GL_FUNCTIONS:
+            entryPoint = resolveFastEntryPoint(strName)
+            if entryPoint is not None:
+                fastEntryPoints[strName] = entryPoint
+    
+    for targetNamespace in (namespace, globals()):
+        for strName, entryPoint in fastEntryPoints.items():
+            if strName in targetNamespace:
+                targetNamespace[strName] = entryPoint
+    for table in (UNIFORM_SETTERS, UNIFORM_MATRIX_SETTERS):
+        for key, func in list(table.items()):
+            strName = getattr(func, '__name__', None)
+            if strName in fastEntryPoints:
+                table[key] = fastEntryPoints[strName]
+
+# Returns display wrapped to raise an error if GL reported one while drawing the frame,
+# for use with the fast entry points, which do not check errors themselves
+def checkErrorsPerFrame(display):
+    def checkedDisplay():
+        display()
+        error = glGetError()
+        if error != GL_NO_ERROR:
+            raise RuntimeError('GL error 0x%04x while drawing a frame' % error)
+    return checkedDisplay
+
+# Applies fast mode and the GL call tracer, when enabled, to the tutorial's display
+# callback and returns the callback to use. Called by the context providers once the
+# context exists.
+def instrumentDisplay(display):
+    if fastEntryPointsEnabled:
+        installFastEntryPoints(display.__globals__)
+    # the tracer wraps whatever functions are installed, fast or not
+    if glTracer is not None:
+        display = glTracer.attach(display)
+    if fastEntryPointsEnabled:
+        display = checkErrorsPerFrame(display)
+    return display
+
+# Returns the context provider that tutorials use to create their GL context and run
+# their callbacks. Normally this is a GlutContext with an on-screen window; if the
+# PYOPENGL_TUTORIAL_HEADLESS environment variable is set to a number of frames, it is
+# a HeadlessContext that renders that many frames offscreen instead.
+def createContextProvider(width, height, contextVersion=None, coreProfile=False):
+    strFrameCount = os.environ.get('PYOPENGL_TUTORIAL_HEADLESS')
+    if strFrameCount:
+        return HeadlessContext(width, height, contextVersion, coreProfile, int(strFrameCount))
+    return GlutContext(width, height, contextVersion, coreProfile)
+
+# Context provider that opens a GLUT window and runs the GLUT main loop.
+# contextVersion is an optional (major, minor) tuple.
+class GlutContext(object):
+    def __init__(self, width, height, contextVersion=None, coreProfile=False):
+        self.width = width
+        self.height = height
+        self.contextVersion = contextVersion
+        self.coreProfile = coreProfile
+        self.window = None
+    
+    def run(self, strTitle, init, display, reshape, keyboard=None, mouse=None):
+        glutInit()
+        displayMode = GLUT_DOUBLE | GLUT_ALPHA | GLUT_DEPTH | GLUT_STENCIL
+        glutInitDisplayMode(displayMode)
+        
+        if self.contextVersion is not None:
+            glutInitContextVersion(*self.contextVersion)
+        if self.coreProfile:
+            glutInitContextProfile(GLUT_CORE_PROFILE)
+        
+        glutInitWindowSize(self.width, self.height)
+        
+        glutInitWindowPosition(300, 200)
+        
+        self.window = glutCreateWindow(strTitle)
+        
+        display = instrumentDisplay(display)
+        if glTracer is not None:
+            glutSpecialFunc(self.special)
+        
+        init()
+        glutDisplayFunc(display)
+        glutReshapeFunc(reshape)
+        if keyboard is not None:
+            glutKeyboardFunc(keyboard)
+        if mouse is not None:
+            glutMouseFunc(mouse)
+        
+        glutMainLoop()
+    
+    def special(self, key, x, y):
+        if key == GLUT_KEY_F12:
+            glTracer.dump()
+            glTracer.reset()
+
+# Context provider that needs no display or GPU: it creates a surfaceless EGL context
+# (e.g. Mesa llvmpipe), renders into a framebuffer object, and calls display() a fixed
+# number of times instead of running a main loop.
+# PyOpenGL must be using its EGL platform, which has to be chosen before OpenGL is
+# first imported, i.e. by running with PYOPENGL_PLATFORM=egl in the environment.
+#
+# The tutorials call GLUT from their callbacks, so run() replaces those functions in
+# the callbacks' module with stand-ins: glutSwapBuffers and glutPostRedisplay do
+# nothing, glutLeaveMainLoop stops the loop, and glutGet(GLUT_ELAPSED_TIME) advances
+# by frameInterval milliseconds per frame, so that animations are reproducible.
+class HeadlessContext(object):
+    def __init__(self, width, height, contextVersion=None, coreProfile=False,
+                 frameCount=100, frameInterval=1000.0 / 60.0):
+        self.width = width
+        self.height = height
+        self.contextVersion = contextVersion
+        self.coreProfile = coreProfile
+        self.frameCount = frameCount
+        self.frameInterval = frameInterval
+        self.frame = 0
+        self.running = False
+        self.framebuffer = None
+    
+    def run(self, strTitle, init, display, reshape, keyboard=None, mouse=None):
+        self.createContext()
+        self.createFramebuffer()
+        display = self.prepareDisplay(display)
+        
+        init()
+        reshape(self.width, self.height)
+        
+        self.running = True
+        self.frame = 0
+        while self.running and self.frame < self.frameCount:
+            display()
+            self.frame += 1
+        glFinish()
+        
+        # PYOPENGL_TUTORIAL_OUTPUT names an image file to receive the last frame
+        strOutput = os.environ.get('PYOPENGL_TUTORIAL_OUTPUT')
+        if strOutput:
+            self.saveImage(strOutput)
+    
+    def createContext(self):
+        try:
+            from OpenGL import EGL
+        except (ImportError, AttributeError):
+            raise RuntimeError('Headless rendering requires PyOpenGL 3.1.6 or later, run with PYOPENGL_PLATFORM=egl')
+        
+        # Mesa picks its EGL platform from this variable; surfaceless needs no X server or DRM device
+        os.environ.setdefault('EGL_PLATFORM', 'surfaceless')
+        eglDisplay = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+        major, minor = EGL.EGLint(), EGL.EGLint()
+        if not EGL.eglInitialize(eglDisplay, ctypes.pointer(major), ctypes.pointer(minor)):
+            raise RuntimeError('Could not initialize EGL')
+        
+        # the default EGL_SURFACE_TYPE asks for window support, which surfaceless displays lack
+        configAttribs = (EGL.EGLint * 5)(EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+                                         EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT, EGL.EGL_NONE)
+        config = EGL.EGLConfig()
+        numConfigs = EGL.EGLint()
+        EGL.eglChooseConfig(eglDisplay, configAttribs, ctypes.pointer(config), 1, ctypes.pointer(numConfigs))
+        if numConfigs.value == 0:
+            raise RuntimeError('No EGL config supports desktop OpenGL')
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        
+        contextAttribs = []
+        if self.contextVersion is not None:
+            contextAttribs += [EGL.EGL_CONTEXT_MAJOR_VERSION, self.contextVersion[0],
+                               EGL.EGL_CONTEXT_MINOR_VERSION, self.contextVersion[1]]
+        if self.coreProfile:
+            contextAttribs += [EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK, EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT]
+        contextAttribs.append(EGL.EGL_NONE)
+        
+        eglContext = EGL.eglCreateContext(eglDisplay, config, EGL.EGL_NO_CONTEXT,
+                                          (EGL.EGLint * len(contextAttribs))(*contextAttribs))
+        if not eglContext:
+            raise RuntimeError('Could not create an EGL context')
+        # there is no surface at all; everything is drawn into our framebuffer object
+        if not EGL.eglMakeCurrent(eglDisplay, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, eglContext):
+            raise RuntimeError('Could not make the EGL context current')
+    
+    # Creates the framebuffer object that stands in for the window: an RGBA color
+    # buffer plus the depth and stencil buffers the tutorials ask GLUT for.
+    def createFramebuffer(self):
+        self.framebuffer = glGenFramebuffers(1)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.framebuffer)
+        
+        colorBuffer, depthStencilBuffer = glGenRenderbuffers(2)
+        glBindRenderbuffer(GL_RENDERBUFFER, colorBuffer)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, self.width, self.height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, colorBuffer)
+        
+        glBindRenderbuffer(GL_RENDERBUFFER, depthStencilBuffer)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH24_STENCIL8, self.width, self.height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_STENCIL_ATTACHMENT, GL_RENDERBUFFER, depthStencilBuffer)
+        glBindRenderbuffer(GL_RENDERBUFFER, 0)
+        
+        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError('Headless framebuffer is incomplete')
+    
+    # Returns the display callback to call every frame, after installing the GLUT
+    # stand-ins into the tutorial's module
+    def prepareDisplay(self, display):
+        self.installGlutStandIns(display.__globals__)
+        return instrumentDisplay(display)
+    
+    def installGlutStandIns(self, namespace):
+        standIns = {
+            'glutSwapBuffers': self.swapBuffers,
+            'glutPostRedisplay': self.postRedisplay,
+            'glutLeaveMainLoop': self.leaveMainLoop,
+            'glutGet': self.get,
+        }
+        for strName in standIns:
+            if strName in namespace:
+                namespace[strName] = standIns[strName]
+    
+    def swapBuffers(self):
+        pass
+    
+    def postRedisplay(self):
+        pass
+    
+    def leaveMainLoop(self):
+        self.running = False
+    
+    def get(self, state):
+        if state == GLUT_ELAPSED_TIME:
+            return int(self.frame * self.frameInterval)
+        elif state == GLUT_WINDOW_WIDTH:
+            return self.width
+        elif state == GLUT_WINDOW_HEIGHT:
+            return self.height
+        return 0
+    
+    # Returns the rendered image as a (height, width, 4) numpy array, top row first
+    def readPixels(self):
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, self.framebuffer)
+        data = glReadPixels(0, 0, self.width, self.height, GL_RGBA, GL_UNSIGNED_BYTE)
+        # GL returns the rows bottom to top
+        return np.frombuffer(data, dtype='uint8').reshape(self.height, self.width, 4)[::-1]
+    
+    # Writes the rendered image as a binary PPM file, which needs no imaging library
+    def saveImage(self, strFilename):
+        pixels = self.readPixels()
+        with open(strFilename, 'wb') as f:
+            f.write(('P6\n%d %d\n255\n' % (self.width, self.height)).encode('ascii'))
+            f.write(np.ascontiguousarray(pixels[:, :, :3]).tobytes())
+
 # Helper function to locate and open the target file (passed in as a string).
 # Returns the full path to the file as a string.
 def findFileOrThrow(strBasename):
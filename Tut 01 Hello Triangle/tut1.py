@@ -142,24 +142,13 @@ def reshape(w, h):
 
 # The main function
 def main():
-    glutInit()
-    displayMode = GLUT_DOUBLE | GLUT_ALPHA | GLUT_DEPTH | GLUT_STENCIL;
-    glutInitDisplayMode (displayMode)
-    
     width = 500;
     height = 500;
-    glutInitWindowSize (width, height)
-    
-    glutInitWindowPosition (300, 200)
-    
-    window = glutCreateWindow("Triangle Window: Tut1")
-    
-    init()
-    glutDisplayFunc(display) 
-    glutReshapeFunc(reshape)
-    glutKeyboardFunc(keyboard)
     
-    glutMainLoop();    
+    # The context provider opens a GLUT window, or renders offscreen when
+    # PYOPENGL_TUTORIAL_HEADLESS is set (see framework.py)
+    context = createContextProvider(width, height)
+    context.run("Triangle Window: Tut1", init, display, reshape, keyboard)
 
 if __name__ == '__main__':
     main()
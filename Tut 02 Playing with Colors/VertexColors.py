@@ -52,19 +52,19 @@ def initializeVertexBuffer():
     global vertexBufferObject
     vertexBufferObject = glGenBuffers(1)
     
-    glBindBuffer(GL_ARRAY_BUFFER, vertexBufferObject)
+    glState.bindBuffer(GL_ARRAY_BUFFER, vertexBufferObject)
     glBufferData( # PyOpenGL allows for the omission of the size parameter
         GL_ARRAY_BUFFER,
         vertexPositions,
         GL_STATIC_DRAW
     )
-    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    glState.bindBuffer(GL_ARRAY_BUFFER, 0)
 
 # Initialize the OpenGL environment
 def init():
     initializeProgram()
     initializeVertexBuffer()
-    glBindVertexArray(glGenVertexArrays(1))
+    glState.bindVertexArray(glGenVertexArrays(1))
 
 # Called to update the display. 
 # Because we are using double-buffering, glutSwapBuffers is called at the end
@@ -73,11 +73,11 @@ def display():
     glClearColor(0.0, 0.0, 0.0, 0.0)
     glClear(GL_COLOR_BUFFER_BIT)
     
-    glUseProgram(theProgram)
+    glState.useProgram(theProgram)
     
-    glBindBuffer(GL_ARRAY_BUFFER, vertexBufferObject)
-    glEnableVertexAttribArray(0)
-    glEnableVertexAttribArray(1)
+    glState.bindBuffer(GL_ARRAY_BUFFER, vertexBufferObject)
+    glState.enableVertexAttribArray(0)
+    glState.enableVertexAttribArray(1)
     glVertexAttribPointer(0, vertexDim, GL_FLOAT, GL_FALSE, 0, None)
      # a ctype void pointer must be used to pass in the offset into the bound GL_ARRAY_BUFFER
      # also note that python's underlying float type is usally 64-bit, but
@@ -87,10 +87,6 @@ def display():
     
     glDrawArrays(GL_TRIANGLES, 0, nVertices)
     
-    glDisableVertexAttribArray(0)
-    glDisableVertexAttribArray(1)
-    glUseProgram(0)
-    
     glutSwapBuffers()
     glutPostRedisplay()
 
@@ -106,24 +102,13 @@ def reshape(w, h):
     
 # The main function
 def main():
-    glutInit()
-    displayMode = GLUT_DOUBLE | GLUT_ALPHA | GLUT_DEPTH | GLUT_STENCIL;
-    glutInitDisplayMode (displayMode)
-    
     width = 500;
     height = 500;
-    glutInitWindowSize (width, height)
-    
-    glutInitWindowPosition (300, 200)
-    
-    window = glutCreateWindow("Tutorial Window")
-    
-    init()
-    glutDisplayFunc(display) 
-    glutReshapeFunc(reshape)
-    glutKeyboardFunc(keyboard)
     
-    glutMainLoop();
+    # The context provider opens a GLUT window, or renders offscreen when
+    # PYOPENGL_TUTORIAL_HEADLESS is set (see framework.py)
+    context = createContextProvider(width, height)
+    context.run("Tutorial Window", init, display, reshape, keyboard)
 
 if __name__ == '__main__':
     main()
@@ -6,6 +6,7 @@ from OpenGL.GLUT import *
 from OpenGL.GLU import *
 from OpenGL.GL import *
 from array import array
+import ctypes
 import os
 import sys
 import numpy as np
@@ -25,11 +26,22 @@ vertexPositions = np.array(
 vertexDim = 4
 nVertices = 3
 
+# Moves a preallocated copy of vertexPositions every frame (see framework.py)
+vertexAnimation = VertexAnimation(vertexPositions, vertexDim)
+
 # Global variable to represent the compiled shader program, written in GLSL
 theProgram = None
 
-# Global variable to represent the buffer that will hold the position vectors
-positionBufferObject = None
+# Global variable to represent the streaming buffer that will hold the position vectors.
+# Every frame writes to the next of its regions, so the upload never waits for the GPU
+# to finish drawing an earlier frame. Where GL supports it, this is a PersistentBuffer,
+# and the new positions are computed straight into the mapped buffer.
+positionStream = None
+
+# Set PYOPENGL_TUTORIAL_SIMULATION_RATE to compute the offsets at that many steps per
+# second, whatever the frame rate, and blend them for each frame (see FixedTimestep in
+# framework.py)
+simulation = None
 
 # Set up the list of shaders, and call functions to compile them
 def initializeProgram():
@@ -46,71 +58,76 @@ def initializeProgram():
 
 # Set up the vertex buffer that will store our vertex coordinates for OpenGL's access
 def initializeVertexBuffer():
-    global positionBufferObject
-    positionBufferObject = glGenBuffers(1)
-    
-    glBindBuffer(GL_ARRAY_BUFFER, positionBufferObject)
-    glBufferData( # PyOpenGL allows for the omission of the size parameter
-        GL_ARRAY_BUFFER,
-        vertexPositions,
-        GL_STREAM_DRAW
-    )
-    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    global positionStream
+    if persistentMappingAvailable():
+        positionStream = PersistentBuffer(GL_ARRAY_BUFFER, vertexAnimation.data.shape)
+        # Z and W never change, so they are written once, to every region
+        for regionData in positionStream.arrays:
+            regionData[...] = vertexAnimation.data
+    else:
+        positionStream = StreamingBuffer(GL_ARRAY_BUFFER, vertexPositions.nbytes)
+    glState.bindBuffer(GL_ARRAY_BUFFER, 0)
 
 # Initialize the OpenGL environment
 def init():
     initializeProgram()
     initializeVertexBuffer()
-    glBindVertexArray(glGenVertexArrays(1))
+    glState.bindVertexArray(glGenVertexArrays(1))
+    
+    global simulation
+    simulation = createFixedTimestep(simulateOffsets, (2,))
     
 # compute the offsets required to rotate the image
-def computePositionOffsets():
+def computePositionOffsets(fElapsedTime):
     fLoopDuration = 5.0
     fScale = 3.14159 * 2.0 / fLoopDuration
     
-    fElapsedTime = glutGet(GLUT_ELAPSED_TIME) / 1000.0
-    
     fCurrTimeThroughLoop = fElapsedTime % fLoopDuration
     
     fXOffset = cos(fCurrTimeThroughLoop * fScale) * 0.5
     fYOffset = sin(fCurrTimeThroughLoop * fScale) * 0.5
     return (fXOffset, fYOffset)
+
+# Writes the offsets at fElapsedTime into out, for the FixedTimestep
+def simulateOffsets(fElapsedTime, out):
+    out[:] = computePositionOffsets(fElapsedTime)
     
 # Directly rearrange the vertex position data to move the image
 def adjustVertexData(fXOffset, fYOffset):
-    fNewData = np.array(vertexPositions, copy=True)
-    
-    for i in range(0, len(vertexPositions), vertexDim):
-        fNewData[i] += fXOffset
-        fNewData[i + 1] += fYOffset
-        
-    glBindBuffer(GL_ARRAY_BUFFER, positionBufferObject)
-    size = len(fNewData) * 4 # sizeof(float32)
-    glBufferSubData(GL_ARRAY_BUFFER, 0, size, fNewData)
-    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    if isinstance(positionStream, PersistentBuffer):
+        vertexAnimation.offset(fXOffset, fYOffset, positionStream.nextArray())
+        return positionStream.offset()
+    
+    fNewData = vertexAnimation.offset(fXOffset, fYOffset)
+    
+    # returns the byte offset of the region that now holds the data
+    return positionStream.write(fNewData)
 
 # Called to update the display. 
 # Because we are using double-buffering, glutSwapBuffers is called at the end
 # to write the rendered buffer to the display.
 def display():
-    offsets = computePositionOffsets()
+    fElapsedTime = glutGet(GLUT_ELAPSED_TIME) / 1000.0
+    if simulation is not None:
+        offsets = simulation.update(fElapsedTime)
+    else:
+        offsets = computePositionOffsets(fElapsedTime)
     fXOffset = offsets[0]
     fYOffset = offsets[1]
-    adjustVertexData(fXOffset, fYOffset)
+    positionOffset = adjustVertexData(fXOffset, fYOffset)
 
     glClearColor(0.0, 0.0, 0.0, 0.0)
     glClear(GL_COLOR_BUFFER_BIT)
     
-    glUseProgram(theProgram)
+    glState.useProgram(theProgram)
     
-    glBindBuffer(GL_ARRAY_BUFFER, positionBufferObject)
-    glEnableVertexAttribArray(0)
-    glVertexAttribPointer(0, vertexDim, GL_FLOAT, GL_FALSE, 0, None)
+    glState.bindBuffer(GL_ARRAY_BUFFER, positionStream.buffer)
+    glState.enableVertexAttribArray(0)
+    glVertexAttribPointer(0, vertexDim, GL_FLOAT, GL_FALSE, 0, ctypes.c_void_p(positionOffset))
     
     glDrawArrays(GL_TRIANGLES, 0, nVertices)
-    
-    glDisableVertexAttribArray(0)
-    glUseProgram(0)
+    # the region may be rewritten once this draw is done with it
+    positionStream.fence()
     
     glutSwapBuffers()
     glutPostRedisplay()
@@ -127,24 +144,13 @@ def reshape(w, h):
     
 # The main function
 def main():
-    glutInit()
-    displayMode = GLUT_DOUBLE | GLUT_ALPHA | GLUT_DEPTH | GLUT_STENCIL;
-    glutInitDisplayMode (displayMode)
-    
     width = 500;
     height = 500;
-    glutInitWindowSize (width, height)
-    
-    glutInitWindowPosition (300, 200)
-    
-    window = glutCreateWindow("Tutorial Window")
-    
-    init()
-    glutDisplayFunc(display) 
-    glutReshapeFunc(reshape)
-    glutKeyboardFunc(keyboard)
     
-    glutMainLoop();
+    # The context provider opens a GLUT window, or renders offscreen when
+    # PYOPENGL_TUTORIAL_HEADLESS is set (see framework.py)
+    context = createContextProvider(width, height)
+    context.run("Tutorial Window", init, display, reshape, keyboard)
 
 if __name__ == '__main__':
     main()
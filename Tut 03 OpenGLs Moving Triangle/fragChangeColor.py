@@ -31,9 +31,6 @@ theProgram = None
 # Global variable to represent the buffer that will hold the position vectors
 positionBufferObject = None
 
-# Global variable to store the location of the shader's uniform variable "time"
-elapsedTimeUniform = None
-
 # Set up the list of shaders, and call functions to compile them
 def initializeProgram():
     shaderList = []
@@ -47,35 +44,32 @@ def initializeProgram():
     for shader in shaderList:
         glDeleteShader(shader)
     
-    global elapsedTimeUniform
-    elapsedTimeUniform = glGetUniformLocation(theProgram, "time")
-    
     loopDurationUnf = glGetUniformLocation(theProgram, "loopDuration")
     fragLoopDurUnf = glGetUniformLocation(theProgram, "fragLoopDuration")
     
-    glUseProgram(theProgram)
+    glState.useProgram(theProgram)
     glUniform1f(loopDurationUnf, 5.0)
     glUniform1f(fragLoopDurUnf, 10.0)
-    glUseProgram(0)
+    glState.useProgram(0)
 
 # Set up the vertex buffer that will store our vertex coordinates for OpenGL's access
 def initializeVertexBuffer():
     global positionBufferObject
     positionBufferObject = glGenBuffers(1)
     
-    glBindBuffer(GL_ARRAY_BUFFER, positionBufferObject)
+    glState.bindBuffer(GL_ARRAY_BUFFER, positionBufferObject)
     glBufferData( # PyOpenGL allows for the omission of the size parameter
         GL_ARRAY_BUFFER,
         vertexPositions,
         GL_STREAM_DRAW
     )
-    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    glState.bindBuffer(GL_ARRAY_BUFFER, 0)
 
 # Initialize the OpenGL environment
 def init():
     initializeProgram()
     initializeVertexBuffer()
-    glBindVertexArray(glGenVertexArrays(1))
+    glState.bindVertexArray(glGenVertexArrays(1))
    
 # Called to update the display. 
 # Because we are using double-buffering, glutSwapBuffers is called at the end
@@ -84,19 +78,16 @@ def display():
     glClearColor(0.0, 0.0, 0.0, 0.0)
     glClear(GL_COLOR_BUFFER_BIT)
     
-    glUseProgram(theProgram)
+    glState.useProgram(theProgram)
     
-    glUniform1f(elapsedTimeUniform, glutGet(GLUT_ELAPSED_TIME) / 1000.0)
+    theProgram.setUniform("time", glutGet(GLUT_ELAPSED_TIME) / 1000.0)
     
-    glBindBuffer(GL_ARRAY_BUFFER, positionBufferObject)
-    glEnableVertexAttribArray(0)
+    glState.bindBuffer(GL_ARRAY_BUFFER, positionBufferObject)
+    glState.enableVertexAttribArray(0)
     glVertexAttribPointer(0, vertexDim, GL_FLOAT, GL_FALSE, 0, None)
     
     glDrawArrays(GL_TRIANGLES, 0, nVertices)
     
-    glDisableVertexAttribArray(0)
-    glUseProgram(0)
-    
     glutSwapBuffers()
     glutPostRedisplay()
 
@@ -112,24 +103,13 @@ def reshape(w, h):
     
 # The main function
 def main():
-    glutInit()
-    displayMode = GLUT_DOUBLE | GLUT_ALPHA | GLUT_DEPTH | GLUT_STENCIL;
-    glutInitDisplayMode (displayMode)
-    
     width = 500;
     height = 500;
-    glutInitWindowSize (width, height)
-    
-    glutInitWindowPosition (300, 200)
-    
-    window = glutCreateWindow("Tutorial Window")
-    
-    init()
-    glutDisplayFunc(display) 
-    glutReshapeFunc(reshape)
-    glutKeyboardFunc(keyboard)
     
-    glutMainLoop();
+    # The context provider opens a GLUT window, or renders offscreen when
+    # PYOPENGL_TUTORIAL_HEADLESS is set (see framework.py)
+    context = createContextProvider(width, height)
+    context.run("Tutorial Window", init, display, reshape, keyboard)
 
 if __name__ == '__main__':
     main()
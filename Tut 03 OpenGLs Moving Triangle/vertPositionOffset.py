@@ -31,8 +31,10 @@ theProgram = None
 # Global variable to represent the buffer that will hold the position vectors
 positionBufferObject = None
 
-# Global variable to store the location of the shader's uniform variable "offset"
-offsetLocation = None
+# Set PYOPENGL_TUTORIAL_SIMULATION_RATE to compute the offsets at that many steps per
+# second, whatever the frame rate, and blend them for each frame (see FixedTimestep in
+# framework.py)
+simulation = None
 
 # Set up the list of shaders, and call functions to compile them
 def initializeProgram():
@@ -46,66 +48,69 @@ def initializeProgram():
     
     for shader in shaderList:
         glDeleteShader(shader)
-    
-    global offsetLocation
-    offsetLocation = glGetUniformLocation(theProgram, "offset")
 
 # Set up the vertex buffer that will store our vertex coordinates for OpenGL's access
 def initializeVertexBuffer():
     global positionBufferObject
     positionBufferObject = glGenBuffers(1)
     
-    glBindBuffer(GL_ARRAY_BUFFER, positionBufferObject)
+    glState.bindBuffer(GL_ARRAY_BUFFER, positionBufferObject)
     glBufferData( # PyOpenGL allows for the omission of the size parameter
         GL_ARRAY_BUFFER,
         vertexPositions,
         GL_STREAM_DRAW
     )
-    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    glState.bindBuffer(GL_ARRAY_BUFFER, 0)
 
 # Initialize the OpenGL environment
 def init():
     initializeProgram()
     initializeVertexBuffer()
-    glBindVertexArray(glGenVertexArrays(1))
+    glState.bindVertexArray(glGenVertexArrays(1))
+    
+    global simulation
+    simulation = createFixedTimestep(simulateOffsets, (2,))
     
 # compute the offsets required to rotate the image
-def computePositionOffsets():
+def computePositionOffsets(fElapsedTime):
     fLoopDuration = 5.0
     fScale = 3.14159 * 2.0 / fLoopDuration
     
-    fElapsedTime = glutGet(GLUT_ELAPSED_TIME) / 1000.0
-    
     fCurrTimeThroughLoop = fElapsedTime % fLoopDuration
     
     fXOffset = cos(fCurrTimeThroughLoop * fScale) * 0.5
     fYOffset = sin(fCurrTimeThroughLoop * fScale) * 0.5
     return (fXOffset, fYOffset)
 
+# Writes the offsets at fElapsedTime into out, for the FixedTimestep
+def simulateOffsets(fElapsedTime, out):
+    out[:] = computePositionOffsets(fElapsedTime)
+
 # Called to update the display. 
 # Because we are using double-buffering, glutSwapBuffers is called at the end
 # to write the rendered buffer to the display.
 def display():
-    offsets = computePositionOffsets()
+    fElapsedTime = glutGet(GLUT_ELAPSED_TIME) / 1000.0
+    if simulation is not None:
+        offsets = simulation.update(fElapsedTime)
+    else:
+        offsets = computePositionOffsets(fElapsedTime)
     fXOffset = offsets[0]
     fYOffset = offsets[1]
 
     glClearColor(0.0, 0.0, 0.0, 0.0)
     glClear(GL_COLOR_BUFFER_BIT)
     
-    glUseProgram(theProgram)
+    glState.useProgram(theProgram)
     
-    glUniform2f(offsetLocation, fXOffset, fYOffset)
+    theProgram.setUniform("offset", fXOffset, fYOffset)
     
-    glBindBuffer(GL_ARRAY_BUFFER, positionBufferObject)
-    glEnableVertexAttribArray(0)
+    glState.bindBuffer(GL_ARRAY_BUFFER, positionBufferObject)
+    glState.enableVertexAttribArray(0)
     glVertexAttribPointer(0, vertexDim, GL_FLOAT, GL_FALSE, 0, None)
     
     glDrawArrays(GL_TRIANGLES, 0, nVertices)
     
-    glDisableVertexAttribArray(0)
-    glUseProgram(0)
-    
     glutSwapBuffers()
     glutPostRedisplay()
 
@@ -121,24 +126,13 @@ def reshape(w, h):
     
 # The main function
 def main():
-    glutInit()
-    displayMode = GLUT_DOUBLE | GLUT_ALPHA | GLUT_DEPTH | GLUT_STENCIL;
-    glutInitDisplayMode (displayMode)
-    
     width = 500;
     height = 500;
-    glutInitWindowSize (width, height)
-    
-    glutInitWindowPosition (300, 200)
-    
-    window = glutCreateWindow("Tutorial Window")
-    
-    init()
-    glutDisplayFunc(display) 
-    glutReshapeFunc(reshape)
-    glutKeyboardFunc(keyboard)
     
-    glutMainLoop();
+    # The context provider opens a GLUT window, or renders offscreen when
+    # PYOPENGL_TUTORIAL_HEADLESS is set (see framework.py)
+    context = createContextProvider(width, height)
+    context.run("Tutorial Window", init, display, reshape, keyboard)
 
 if __name__ == '__main__':
     main()
@@ -120,13 +120,11 @@ theProgram = None
 # Global variable to represent the buffer that will hold the position vectors
 vertexBufferObject = None
 
-# Global variables to store the location of the shader's uniform variables
-offsetUniform = None
-perspectiveMatrixUnif = None
-
 # Global display variables
 perspectiveMatrix = None
 fFrustumScale = 1.0
+# the uniform buffer the shaders read perspectiveMatrix from
+cameraBuffer = None
 
 # Set up the list of shaders, and call functions to compile them
 def initializeProgram():
@@ -141,12 +139,6 @@ def initializeProgram():
     for shader in shaderList:
         glDeleteShader(shader)
     
-    global offsetUniform
-    offsetUniform = glGetUniformLocation(theProgram, "offset")
-    
-    global perspectiveMatrixUnif
-    perspectiveMatrixUnif = glGetUniformLocation(theProgram, "perspectiveMatrix")
-    
     fzNear = 0.5
     fzFar = 3.0
     
@@ -158,32 +150,32 @@ def initializeProgram():
     perspectiveMatrix[14] = (2 * fzFar * fzNear) / (fzNear - fzFar)
     perspectiveMatrix[11] = -1.0
     
-    glUseProgram(theProgram)
-    glUniformMatrix4fv(perspectiveMatrixUnif, 1, GL_FALSE, perspectiveMatrix)
-    glUseProgram(0)
+    global cameraBuffer
+    cameraBuffer = CameraBuffer()
+    cameraBuffer.setMatrix(perspectiveMatrix)
 
 # Set up the vertex buffer that will store our vertex coordinates for OpenGL's access
 def initializeVertexBuffer():
     global vertexBufferObject
     vertexBufferObject = glGenBuffers(1)
     
-    glBindBuffer(GL_ARRAY_BUFFER, vertexBufferObject)
+    glState.bindBuffer(GL_ARRAY_BUFFER, vertexBufferObject)
     glBufferData( # PyOpenGL allows for the omission of the size parameter
         GL_ARRAY_BUFFER,
         vertexData,
         GL_STREAM_DRAW
     )
-    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    glState.bindBuffer(GL_ARRAY_BUFFER, 0)
 
 # Initialize the OpenGL environment
 def init():
     initializeProgram()
     initializeVertexBuffer()
-    glBindVertexArray(glGenVertexArrays(1))
+    glState.bindVertexArray(glGenVertexArrays(1))
     
-    glEnable(GL_CULL_FACE)
-    glCullFace(GL_BACK)
-    glFrontFace(GL_CW)
+    glState.enable(GL_CULL_FACE)
+    glState.cullFace(GL_BACK)
+    glState.frontFace(GL_CW)
    
 # Called to update the display. 
 # Because we are using double-buffering, glutSwapBuffers is called at the end
@@ -192,13 +184,13 @@ def display():
     glClearColor(0.0, 0.0, 0.0, 0.0)
     glClear(GL_COLOR_BUFFER_BIT)
     
-    glUseProgram(theProgram)
+    glState.useProgram(theProgram)
     
-    glUniform2f(offsetUniform, 1.5, 0.5)
+    theProgram.setUniform("offset", 1.5, 0.5)
     
-    glBindBuffer(GL_ARRAY_BUFFER, vertexBufferObject)
-    glEnableVertexAttribArray(0)
-    glEnableVertexAttribArray(1)
+    glState.bindBuffer(GL_ARRAY_BUFFER, vertexBufferObject)
+    glState.enableVertexAttribArray(0)
+    glState.enableVertexAttribArray(1)
     glVertexAttribPointer(0, vertexDim, GL_FLOAT, GL_FALSE, 0, None)
     # a ctype void pointer must be used to pass in the offset into the bound GL_ARRAY_BUFFER
      # also note that python's underlying float type is usally 64-bit, but
@@ -208,10 +200,6 @@ def display():
     
     glDrawArrays(GL_TRIANGLES, 0, nVertices)
     
-    glDisableVertexAttribArray(0)
-    glDisableVertexAttribArray(1)
-    glUseProgram(0)
-    
     glutSwapBuffers()
     glutPostRedisplay()
 
@@ -227,32 +215,19 @@ def reshape(w, h):
     perspectiveMatrix[0] = fFrustumScale / (w / float(h))
     perspectiveMatrix[5] = fFrustumScale
     
-    glUseProgram(theProgram)
-    glUniformMatrix4fv(perspectiveMatrixUnif, 1, GL_FALSE, perspectiveMatrix)
-    glUseProgram(0)
+    cameraBuffer.setMatrix(perspectiveMatrix)
     
     glViewport(0, 0, w, h)
     
 # The main function
 def main():
-    glutInit()
-    displayMode = GLUT_DOUBLE | GLUT_ALPHA | GLUT_DEPTH | GLUT_STENCIL;
-    glutInitDisplayMode (displayMode)
-    
     width = 500;
     height = 500;
-    glutInitWindowSize (width, height)
-    
-    glutInitWindowPosition (300, 200)
-    
-    window = glutCreateWindow("Tutorial Window")
-    
-    init()
-    glutDisplayFunc(display) 
-    glutReshapeFunc(reshape)
-    glutKeyboardFunc(keyboard)
     
-    glutMainLoop();
+    # The context provider opens a GLUT window, or renders offscreen when
+    # PYOPENGL_TUTORIAL_HEADLESS is set (see framework.py)
+    context = createContextProvider(width, height)
+    context.run("Tutorial Window", init, display, reshape, keyboard)
 
 if __name__ == '__main__':
     main()
@@ -120,9 +120,8 @@ theProgram = None
 # Global variable to represent the buffer that will hold the position vectors
 vertexBufferObject = None
 
-# Global variables to store the location of the shader's uniform variables
-offsetUniform = None
-
+# Global variable to hold the uniform buffer the shaders read perspectiveMatrix from
+cameraBuffer = None
 
 # Set up the list of shaders, and call functions to compile them
 def initializeProgram():
@@ -137,11 +136,6 @@ def initializeProgram():
     for shader in shaderList:
         glDeleteShader(shader)
     
-    global offsetUniform
-    offsetUniform = glGetUniformLocation(theProgram, "offset")
-    
-    perspectiveMatrixUnif = glGetUniformLocation(theProgram, "perspectiveMatrix")
-    
     fFrustumScale = 1.0
     fzNear = 0.5
     fzFar = 3.0
@@ -153,32 +147,33 @@ def initializeProgram():
     theMatrix[14] = (2 * fzFar * fzNear) / (fzNear - fzFar)
     theMatrix[11] = -1.0
     
-    glUseProgram(theProgram)
-    glUniformMatrix4fv(perspectiveMatrixUnif, 1, GL_FALSE, theMatrix)
-    glUseProgram(0)
+    # the shader reads perspectiveMatrix from the camera uniform buffer
+    global cameraBuffer
+    cameraBuffer = CameraBuffer()
+    cameraBuffer.setMatrix(theMatrix)
 
 # Set up the vertex buffer that will store our vertex coordinates for OpenGL's access
 def initializeVertexBuffer():
     global vertexBufferObject
     vertexBufferObject = glGenBuffers(1)
     
-    glBindBuffer(GL_ARRAY_BUFFER, vertexBufferObject)
+    glState.bindBuffer(GL_ARRAY_BUFFER, vertexBufferObject)
     glBufferData( # PyOpenGL allows for the omission of the size parameter
         GL_ARRAY_BUFFER,
         vertexData,
         GL_STREAM_DRAW
     )
-    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    glState.bindBuffer(GL_ARRAY_BUFFER, 0)
 
 # Initialize the OpenGL environment
 def init():
     initializeProgram()
     initializeVertexBuffer()
-    glBindVertexArray(glGenVertexArrays(1))
+    glState.bindVertexArray(glGenVertexArrays(1))
     
-    glEnable(GL_CULL_FACE)
-    glCullFace(GL_BACK)
-    glFrontFace(GL_CW)
+    glState.enable(GL_CULL_FACE)
+    glState.cullFace(GL_BACK)
+    glState.frontFace(GL_CW)
    
 # Called to update the display. 
 # Because we are using double-buffering, glutSwapBuffers is called at the end
@@ -187,13 +182,13 @@ def display():
     glClearColor(0.0, 0.0, 0.0, 0.0)
     glClear(GL_COLOR_BUFFER_BIT)
     
-    glUseProgram(theProgram)
+    glState.useProgram(theProgram)
     
-    glUniform2f(offsetUniform, 0.5, 0.5)
+    theProgram.setUniform("offset", 0.5, 0.5)
     
-    glBindBuffer(GL_ARRAY_BUFFER, vertexBufferObject)
-    glEnableVertexAttribArray(0)
-    glEnableVertexAttribArray(1)
+    glState.bindBuffer(GL_ARRAY_BUFFER, vertexBufferObject)
+    glState.enableVertexAttribArray(0)
+    glState.enableVertexAttribArray(1)
     glVertexAttribPointer(0, vertexDim, GL_FLOAT, GL_FALSE, 0, None)
     # a ctype void pointer must be used to pass in the offset into the bound GL_ARRAY_BUFFER
      # also note that python's underlying float type is usally 64-bit, but
@@ -203,10 +198,6 @@ def display():
     
     glDrawArrays(GL_TRIANGLES, 0, nVertices)
     
-    glDisableVertexAttribArray(0)
-    glDisableVertexAttribArray(1)
-    glUseProgram(0)
-    
     glutSwapBuffers()
     glutPostRedisplay()
 
@@ -222,24 +213,13 @@ def reshape(w, h):
     
 # The main function
 def main():
-    glutInit()
-    displayMode = GLUT_DOUBLE | GLUT_ALPHA | GLUT_DEPTH | GLUT_STENCIL;
-    glutInitDisplayMode (displayMode)
-    
     width = 500;
     height = 500;
-    glutInitWindowSize (width, height)
-    
-    glutInitWindowPosition (300, 200)
-    
-    window = glutCreateWindow("Tutorial Window")
-    
-    init()
-    glutDisplayFunc(display) 
-    glutReshapeFunc(reshape)
-    glutKeyboardFunc(keyboard)
     
-    glutMainLoop();
+    # The context provider opens a GLUT window, or renders offscreen when
+    # PYOPENGL_TUTORIAL_HEADLESS is set (see framework.py)
+    context = createContextProvider(width, height)
+    context.run("Tutorial Window", init, display, reshape, keyboard)
 
 if __name__ == '__main__':
     main()
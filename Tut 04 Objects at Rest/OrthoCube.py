@@ -62,7 +62,6 @@ vertexPositions = np.array(
 
 
 
-
 	0.0, 0.0, 1.0, 1.0,
 	0.0, 0.0, 1.0, 1.0,
 	0.0, 0.0, 1.0, 1.0,
@@ -122,9 +121,6 @@ theProgram = None
 # Global variable to represent the buffer that will hold the position vectors
 positionBufferObject = None
 
-# Global variable to store the location of the shader's uniform variable "offset"
-offsetUniform = None
-
 # Set up the list of shaders, and call functions to compile them
 def initializeProgram():
     shaderList = []
@@ -137,32 +133,29 @@ def initializeProgram():
     
     for shader in shaderList:
         glDeleteShader(shader)
-    
-    global offsetUniform
-    offsetUniform = glGetUniformLocation(theProgram, "offset")
 
 # Set up the vertex buffer that will store our vertex coordinates for OpenGL's access
 def initializeVertexBuffer():
     global positionBufferObject
     positionBufferObject = glGenBuffers(1)
     
-    glBindBuffer(GL_ARRAY_BUFFER, positionBufferObject)
+    glState.bindBuffer(GL_ARRAY_BUFFER, positionBufferObject)
     glBufferData( # PyOpenGL allows for the omission of the size parameter
         GL_ARRAY_BUFFER,
         vertexPositions,
         GL_STREAM_DRAW
     )
-    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    glState.bindBuffer(GL_ARRAY_BUFFER, 0)
 
 # Initialize the OpenGL environment
 def init():
     initializeProgram()
     initializeVertexBuffer()
-    glBindVertexArray(glGenVertexArrays(1))
+    glState.bindVertexArray(glGenVertexArrays(1))
     
-    glEnable(GL_CULL_FACE)
-    glCullFace(GL_BACK)
-    glFrontFace(GL_CW)
+    glState.enable(GL_CULL_FACE)
+    glState.cullFace(GL_BACK)
+    glState.frontFace(GL_CW)
    
 # Called to update the display. 
 # Because we are using double-buffering, glutSwapBuffers is called at the end
@@ -171,13 +164,13 @@ def display():
     glClearColor(0.0, 0.0, 0.0, 0.0)
     glClear(GL_COLOR_BUFFER_BIT)
     
-    glUseProgram(theProgram)
+    glState.useProgram(theProgram)
     
-    glUniform2f(offsetUniform, 0.5, 0.25)
+    theProgram.setUniform("offset", 0.5, 0.25)
     
-    glBindBuffer(GL_ARRAY_BUFFER, positionBufferObject)
-    glEnableVertexAttribArray(0)
-    glEnableVertexAttribArray(1)
+    glState.bindBuffer(GL_ARRAY_BUFFER, positionBufferObject)
+    glState.enableVertexAttribArray(0)
+    glState.enableVertexAttribArray(1)
     glVertexAttribPointer(0, vertexDim, GL_FLOAT, GL_FALSE, 0, None)
     # a ctype void pointer must be used to pass in the offset into the bound GL_ARRAY_BUFFER
      # also note that python's underlying float type is usally 64-bit, but
@@ -187,10 +180,6 @@ def display():
     
     glDrawArrays(GL_TRIANGLES, 0, nVertices)
     
-    glDisableVertexAttribArray(0)
-    glDisableVertexAttribArray(1)
-    glUseProgram(0)
-    
     glutSwapBuffers()
     glutPostRedisplay()
 
@@ -206,24 +195,13 @@ def reshape(w, h):
     
 # The main function
 def main():
-    glutInit()
-    displayMode = GLUT_DOUBLE | GLUT_ALPHA | GLUT_DEPTH | GLUT_STENCIL;
-    glutInitDisplayMode (displayMode)
-    
     width = 500;
     height = 500;
-    glutInitWindowSize (width, height)
-    
-    glutInitWindowPosition (300, 200)
-    
-    window = glutCreateWindow("Tutorial Window")
-    
-    init()
-    glutDisplayFunc(display) 
-    glutReshapeFunc(reshape)
-    glutKeyboardFunc(keyboard)
     
-    glutMainLoop();
+    # The context provider opens a GLUT window, or renders offscreen when
+    # PYOPENGL_TUTORIAL_HEADLESS is set (see framework.py)
+    context = createContextProvider(width, height)
+    context.run("Tutorial Window", init, display, reshape, keyboard)
 
 if __name__ == '__main__':
     main()
@@ -6,7 +6,11 @@ layout(location = 1) in vec4 color;
 smooth out vec4 theColor;
 
 uniform vec2 offset;
-uniform mat4 perspectiveMatrix;
+// shared by all programs; see CameraBuffer in framework.py
+layout(std140) uniform Camera
+{
+	mat4 perspectiveMatrix;
+};
 
 void main()
 {
@@ -6,6 +6,7 @@ from OpenGL.GLUT import *
 from OpenGL.GLU import *
 from OpenGL.GL import *
 import numpy as np
+import os
 from framework import *
 from itertools import chain
 
@@ -160,13 +161,25 @@ vao = None
 # Global variable to hold the position index buffer object
 indexBufferObject = None
 
-# Global variables to store the location of the shader's uniform variables
-offsetUniform = None
-perspectiveMatrixUnif = None
+# Set PYOPENGL_TUTORIAL_MULTI_DRAW to submit both objects with a single
+# glMultiDrawElementsIndirect (GL 4.3), which reads each object's offset from a
+# per-draw attribute rather than the offset uniform. Without GL 4.3 the objects are
+# drawn one by one as usual.
+multiDraw = bool(os.environ.get('PYOPENGL_TUTORIAL_MULTI_DRAW'))
+drawList = None
+
+# Set PYOPENGL_TUTORIAL_GEOMETRY_POOL to store the two objects as two meshes of a
+# GeometryPool (see framework.py), each with its own interleaved vertices and indices,
+# drawn with the pool's vertex array object instead of the buffers above
+useGeometryPool = bool(os.environ.get('PYOPENGL_TUTORIAL_GEOMETRY_POOL'))
+geometryPool = None
+objectMeshes = None
 
 # Global display variables
 perspectiveMatrix = None
 fFrustumScale = 1.0
+# the uniform buffer the shaders read perspectiveMatrix from
+cameraBuffer = None
 
 # Global depth clamping switch
 bDepthClampingActive = False
@@ -175,7 +188,9 @@ bDepthClampingActive = False
 def initializeProgram():
     shaderList = []
     
-    shaderList.append(loadShader(GL_VERTEX_SHADER, "Standard.vert"))
+    # the MULTI_DRAW variant reads offset from an attribute
+    vertexDefines = {"MULTI_DRAW": 1} if multiDraw else None
+    shaderList.append(loadShader(GL_VERTEX_SHADER, "Standard.vert", vertexDefines))
     shaderList.append(loadShader(GL_FRAGMENT_SHADER, "Standard.frag"))
     
     global theProgram 
@@ -184,12 +199,6 @@ def initializeProgram():
     for shader in shaderList:
         glDeleteShader(shader)
     
-    global offsetUniform
-    offsetUniform = glGetUniformLocation(theProgram, "offset")
-    
-    global perspectiveMatrixUnif
-    perspectiveMatrixUnif = glGetUniformLocation(theProgram, "perspectiveMatrix")
-    
     fzNear = 1.0
     fzFar = 3.0
     
@@ -201,61 +210,109 @@ def initializeProgram():
     perspectiveMatrix[14] = (2 * fzFar * fzNear) / (fzNear - fzFar)
     perspectiveMatrix[11] = -1.0
     
-    glUseProgram(theProgram)
-    glUniformMatrix4fv(perspectiveMatrixUnif, 1, GL_FALSE, perspectiveMatrix)
-    glUseProgram(0)
+    global cameraBuffer
+    cameraBuffer = CameraBuffer()
+    cameraBuffer.setMatrix(perspectiveMatrix)
 
 # Set up the vertex buffer that will store our vertex coordinates for OpenGL's access
 def initializeVertexBuffer():
     global vertexBufferObject, indexBufferObject
     vertexBufferObject = glGenBuffers(1)
     
-    glBindBuffer(GL_ARRAY_BUFFER, vertexBufferObject)
+    glState.bindBuffer(GL_ARRAY_BUFFER, vertexBufferObject)
     glBufferData( # PyOpenGL allows for the omission of the size parameter
         GL_ARRAY_BUFFER,
         vertexData,
         GL_STATIC_DRAW
     )
-    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    glState.bindBuffer(GL_ARRAY_BUFFER, 0)
     
     indexBufferObject = glGenBuffers(1)
     
-    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, indexBufferObject)
+    glState.bindBuffer(GL_ELEMENT_ARRAY_BUFFER, indexBufferObject)
     glBufferData(
         GL_ELEMENT_ARRAY_BUFFER,
         indexData,
         GL_STATIC_DRAW
     )
-    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+    glState.bindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
 
-# Initialize the OpenGL environment
-def init():
-    initializeProgram()
-    initializeVertexBuffer()
-    
+# Set up the vertex array object that reads the buffers, and leave it bound
+def initializeVertexArray():
     global vao
     vao = glGenVertexArrays(1)
-    glBindVertexArray(vao)
+    glState.bindVertexArray(vao)
     
     sizeOfFloat = 4 # all our arrays are dtype='float32'
     colorDataOffset = c_void_p(vertexDim * nVertices * sizeOfFloat)
-    glBindBuffer(GL_ARRAY_BUFFER, vertexBufferObject)
-    glEnableVertexAttribArray(0)
-    glEnableVertexAttribArray(1)
+    glState.bindBuffer(GL_ARRAY_BUFFER, vertexBufferObject)
+    glState.enableVertexAttribArray(0)
+    glState.enableVertexAttribArray(1)
     glVertexAttribPointer(0, vertexDim, GL_FLOAT, GL_FALSE, 0, None)
     glVertexAttribPointer(1, colorDim, GL_FLOAT, GL_FALSE, 0, colorDataOffset)
-    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, indexBufferObject)
+    glState.bindBuffer(GL_ELEMENT_ARRAY_BUFFER, indexBufferObject)
+
+# Set up the geometry pool holding the two objects, and leave its vertex array object bound
+def initializeGeometryPool():
+    # the pool interleaves the position and the color of each vertex
+    positions = vertexData[:vertexDim * nVertices].reshape(nVertices, vertexDim)
+    colors = vertexData[vertexDim * nVertices:].reshape(nVertices, colorDim)
+    vertices = np.hstack([positions, colors])
+    
+    global geometryPool, objectMeshes, vao
+    geometryPool = GeometryPool([(0, vertexDim), (1, colorDim)])
+    objectMeshes = [
+        geometryPool.addMesh(vertices[:nVertices//2], indexData),
+        geometryPool.addMesh(vertices[nVertices//2:], indexData)]
+    vao = geometryPool.vao
+
+# Set up the per-draw offsets (in the bound VAO) and the list of the draws display()
+# makes otherwise, with the same offsets
+def initializeDrawList():
+    offsets = np.array([
+        0.0, 0.0, 0.5,
+        0.0, 0.0, -1.0],
+        dtype='float32')
+    offsetBufferObject = glGenBuffers(1)
+    glState.bindBuffer(GL_ARRAY_BUFFER, offsetBufferObject)
+    glBufferData(GL_ARRAY_BUFFER, offsets, GL_STATIC_DRAW)
+    glState.enableVertexAttribArray(2)
+    glVertexAttribPointer(2, 3, GL_FLOAT, GL_FALSE, 0, None)
+    glVertexAttribDivisor(2, 1)
+    
+    global drawList
+    drawList = DrawList(2)
+    if geometryPool is not None:
+        for mesh in objectMeshes:
+            drawList.addDraw(mesh.indexCount, mesh.firstIndex, mesh.baseVertex)
+    else:
+        drawList.addDraw(len(indexData))
+        drawList.addDraw(len(indexData), baseVertex=nVertices//2)
+    drawList.upload()
+
+# Initialize the OpenGL environment
+def init():
+    global multiDraw
+    multiDraw = multiDraw and multiDrawIndirectAvailable()
+    initializeProgram()
+    if useGeometryPool:
+        initializeGeometryPool()
+    else:
+        initializeVertexBuffer()
+        initializeVertexArray()
+    if multiDraw:
+        initializeDrawList()
     
-    glBindVertexArray(0)
+    glState.bindVertexArray(0)
     
-    glEnable(GL_CULL_FACE)
-    glCullFace(GL_BACK)
-    glFrontFace(GL_CW)
+    glState.enable(GL_CULL_FACE)
+    glState.cullFace(GL_BACK)
+    glState.frontFace(GL_CW)
     
-    glEnable(GL_DEPTH_TEST)
-    glDepthMask(GL_TRUE)
-    glDepthFunc(GL_LEQUAL)
-    glDepthRange(0.0, 1.0)
+    glState.enable(GL_DEPTH_TEST)
+    glState.depthMask(GL_TRUE)
+    glState.depthFunc(GL_LEQUAL)
+    glState.depthRange(0.0, 1.0)
    
 # Called to update the display. 
 # Because we are using double-buffering, glutSwapBuffers is called at the end
@@ -265,18 +322,24 @@ def display():
     glClearDepth(1.0)
     glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
     
-    glUseProgram(theProgram)
+    glState.useProgram(theProgram)
     
-    glBindVertexArray(vao)
-    
-    glUniform3f(offsetUniform, 0.0,0.0,0.5)
-    glDrawElements(GL_TRIANGLES, len(indexData), GL_UNSIGNED_SHORT, None)
-
-    glUniform3f(offsetUniform, 0.0,0.0,-1.0)
-    glDrawElementsBaseVertex(GL_TRIANGLES, len(indexData), GL_UNSIGNED_SHORT, None, nVertices/2)
+    glState.bindVertexArray(vao)
     
-    glBindVertexArray(0)
-    glUseProgram(0)
+    if multiDraw:
+        drawList.draw(GL_TRIANGLES, GL_UNSIGNED_SHORT)
+    elif geometryPool is not None:
+        theProgram.setUniform("offset", 0.0, 0.0, 0.5)
+        geometryPool.draw(GL_TRIANGLES, objectMeshes[0])
+        
+        theProgram.setUniform("offset", 0.0, 0.0, -1.0)
+        geometryPool.draw(GL_TRIANGLES, objectMeshes[1])
+    else:
+        theProgram.setUniform("offset", 0.0, 0.0, 0.5)
+        glDrawElements(GL_TRIANGLES, len(indexData), GL_UNSIGNED_SHORT, None)
+
+        theProgram.setUniform("offset", 0.0, 0.0, -1.0)
+        glDrawElementsBaseVertex(GL_TRIANGLES, len(indexData), GL_UNSIGNED_SHORT, None, nVertices/2)
     
     glutSwapBuffers()
 
@@ -291,9 +354,9 @@ def keyboard(key, x, y):
         return
     elif keyval == 32:
         if (bDepthClampingActive):
-            glDisable(GL_DEPTH_CLAMP)
+            glState.disable(GL_DEPTH_CLAMP)
         else:
-            glEnable(GL_DEPTH_CLAMP)
+            glState.enable(GL_DEPTH_CLAMP)
         
         bDepthClampingActive = not bDepthClampingActive
         glutPostRedisplay()
@@ -304,32 +367,19 @@ def reshape(w, h):
     perspectiveMatrix[0] = fFrustumScale / (w / float(h))
     perspectiveMatrix[5] = fFrustumScale
     
-    glUseProgram(theProgram)
-    glUniformMatrix4fv(perspectiveMatrixUnif, 1, GL_FALSE, perspectiveMatrix)
-    glUseProgram(0)
+    cameraBuffer.setMatrix(perspectiveMatrix)
     
     glViewport(0, 0, w, h)
     
 # The main function
 def main():
-    glutInit()
-    displayMode = GLUT_DOUBLE | GLUT_ALPHA | GLUT_DEPTH | GLUT_STENCIL;
-    glutInitDisplayMode (displayMode)
-    
     width = 500;
     height = 500;
-    glutInitWindowSize (width, height)
-    
-    glutInitWindowPosition (300, 200)
-    
-    window = glutCreateWindow("Tutorial Window")
-    
-    init()
-    glutDisplayFunc(display) 
-    glutReshapeFunc(reshape)
-    glutKeyboardFunc(keyboard)
     
-    glutMainLoop();
+    # The context provider opens a GLUT window, or renders offscreen when
+    # PYOPENGL_TUTORIAL_HEADLESS is set (see framework.py)
+    context = createContextProvider(width, height)
+    context.run("Tutorial Window", init, display, reshape, keyboard)
 
 if __name__ == '__main__':
     main()
@@ -160,13 +160,11 @@ vaoObject1, vaoObject2 = None, None
 # Global variable to hold the position index buffer object
 indexBufferObject = None
 
-# Global variables to store the location of the shader's uniform variables
-offsetUniform = None
-perspectiveMatrixUnif = None
-
 # Global display variables
 perspectiveMatrix = None
 fFrustumScale = 1.0
+# the uniform buffer the shaders read perspectiveMatrix from
+cameraBuffer = None
 
 # Set up the list of shaders, and call functions to compile them
 def initializeProgram():
@@ -181,12 +179,6 @@ def initializeProgram():
     for shader in shaderList:
         glDeleteShader(shader)
     
-    global offsetUniform
-    offsetUniform = glGetUniformLocation(theProgram, "offset")
-    
-    global perspectiveMatrixUnif
-    perspectiveMatrixUnif = glGetUniformLocation(theProgram, "perspectiveMatrix")
-    
     fzNear = 1.0
     fzFar = 3.0
     
@@ -198,53 +190,53 @@ def initializeProgram():
     perspectiveMatrix[14] = (2 * fzFar * fzNear) / (fzNear - fzFar)
     perspectiveMatrix[11] = -1.0
     
-    glUseProgram(theProgram)
-    glUniformMatrix4fv(perspectiveMatrixUnif, 1, GL_FALSE, perspectiveMatrix)
-    glUseProgram(0)
+    global cameraBuffer
+    cameraBuffer = CameraBuffer()
+    cameraBuffer.setMatrix(perspectiveMatrix)
 
 # Set up the vertex buffer that will store our vertex coordinates for OpenGL's access
 def initializeVertexBuffer():
     global vertexBufferObject, indexBufferObject
     vertexBufferObject = glGenBuffers(1)
     
-    glBindBuffer(GL_ARRAY_BUFFER, vertexBufferObject)
+    glState.bindBuffer(GL_ARRAY_BUFFER, vertexBufferObject)
     glBufferData( # PyOpenGL allows for the omission of the size parameter
         GL_ARRAY_BUFFER,
         vertexData,
         GL_STATIC_DRAW
     )
-    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    glState.bindBuffer(GL_ARRAY_BUFFER, 0)
     
     indexBufferObject = glGenBuffers(1)
     
-    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, indexBufferObject)
+    glState.bindBuffer(GL_ELEMENT_ARRAY_BUFFER, indexBufferObject)
     glBufferData(
         GL_ELEMENT_ARRAY_BUFFER,
         indexData,
         GL_STATIC_DRAW
     )
-    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+    glState.bindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
     
 # Set up the vertex array objects
 def initializeVertexArrayObjects():
     global vaoObject1, vaoObject2
     sizeOfFloat = 4 # all our arrays are dtype='float32'
     vaoObject1 = glGenVertexArrays(1)
-    glBindVertexArray(vaoObject1)
+    glState.bindVertexArray(vaoObject1)
     
     colorDataOffset = c_void_p(vertexDim * nVertices * sizeOfFloat)
     
-    glBindBuffer(GL_ARRAY_BUFFER, vertexBufferObject)
-    glEnableVertexAttribArray(0)
-    glEnableVertexAttribArray(1)
+    glState.bindBuffer(GL_ARRAY_BUFFER, vertexBufferObject)
+    glState.enableVertexAttribArray(0)
+    glState.enableVertexAttribArray(1)
     glVertexAttribPointer(0, vertexDim, GL_FLOAT, GL_FALSE, 0, None)
     glVertexAttribPointer(1, colorDim, GL_FLOAT, GL_FALSE, 0, colorDataOffset)
-    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, indexBufferObject)
+    glState.bindBuffer(GL_ELEMENT_ARRAY_BUFFER, indexBufferObject)
     
-    glBindVertexArray(0)
+    glState.bindVertexArray(0)
     
     vaoObject2 = glGenVertexArrays(1)
-    glBindVertexArray(vaoObject2)
+    glState.bindVertexArray(vaoObject2)
     
     posDataOffset = c_void_p(sizeOfFloat * vertexDim * (nVertices/2))
     colorDataOffset = c_void_p(
@@ -252,13 +244,13 @@ def initializeVertexArrayObjects():
         sizeOfFloat * colorDim * (nVertices/2))
     
     # Use the same buffer object previously bound to GL_ARRAY_BUFFER
-    glEnableVertexAttribArray(0)
-    glEnableVertexAttribArray(1)
+    glState.enableVertexAttribArray(0)
+    glState.enableVertexAttribArray(1)
     glVertexAttribPointer(0, vertexDim, GL_FLOAT, GL_FALSE, 0, posDataOffset)
     glVertexAttribPointer(1, colorDim, GL_FLOAT, GL_FALSE, 0, colorDataOffset)
-    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, indexBufferObject)
+    glState.bindBuffer(GL_ELEMENT_ARRAY_BUFFER, indexBufferObject)
     
-    glBindVertexArray(0)
+    glState.bindVertexArray(0)
 
 # Initialize the OpenGL environment
 def init():
@@ -266,9 +258,9 @@ def init():
     initializeVertexBuffer()
     initializeVertexArrayObjects()
     
-    glEnable(GL_CULL_FACE)
-    glCullFace(GL_BACK)
-    glFrontFace(GL_CW)
+    glState.enable(GL_CULL_FACE)
+    glState.cullFace(GL_BACK)
+    glState.frontFace(GL_CW)
    
 # Called to update the display. 
 # Because we are using double-buffering, glutSwapBuffers is called at the end
@@ -277,19 +269,16 @@ def display():
     glClearColor(0.0, 0.0, 0.0, 0.0)
     glClear(GL_COLOR_BUFFER_BIT)
     
-    glUseProgram(theProgram)
+    glState.useProgram(theProgram)
     
-    glBindVertexArray(vaoObject1)
-    glUniform3f(offsetUniform, 0.0,0.0,0.0)
+    glState.bindVertexArray(vaoObject1)
+    theProgram.setUniform("offset", 0.0, 0.0, 0.0)
     glDrawElements(GL_TRIANGLES, len(indexData), GL_UNSIGNED_SHORT, None)
     
-    glBindVertexArray(vaoObject2)
-    glUniform3f(offsetUniform, 0.0,0.0,-1.0)
+    glState.bindVertexArray(vaoObject2)
+    theProgram.setUniform("offset", 0.0, 0.0, -1.0)
     glDrawElements(GL_TRIANGLES, len(indexData), GL_UNSIGNED_SHORT, None)
     
-    glBindVertexArray(0)
-    glUseProgram(0)
-    
     glutSwapBuffers()
 
 # keyboard input handler: exits the program if 'esc' is pressed
@@ -304,32 +293,19 @@ def reshape(w, h):
     perspectiveMatrix[0] = fFrustumScale / (w / float(h))
     perspectiveMatrix[5] = fFrustumScale
     
-    glUseProgram(theProgram)
-    glUniformMatrix4fv(perspectiveMatrixUnif, 1, GL_FALSE, perspectiveMatrix)
-    glUseProgram(0)
+    cameraBuffer.setMatrix(perspectiveMatrix)
     
     glViewport(0, 0, w, h)
     
 # The main function
 def main():
-    glutInit()
-    displayMode = GLUT_DOUBLE | GLUT_ALPHA | GLUT_DEPTH | GLUT_STENCIL;
-    glutInitDisplayMode (displayMode)
-    
     width = 500;
     height = 500;
-    glutInitWindowSize (width, height)
-    
-    glutInitWindowPosition (300, 200)
-    
-    window = glutCreateWindow("Tutorial Window")
-    
-    init()
-    glutDisplayFunc(display) 
-    glutReshapeFunc(reshape)
-    glutKeyboardFunc(keyboard)
     
-    glutMainLoop();
+    # The context provider opens a GLUT window, or renders offscreen when
+    # PYOPENGL_TUTORIAL_HEADLESS is set (see framework.py)
+    context = createContextProvider(width, height)
+    context.run("Tutorial Window", init, display, reshape, keyboard)
 
 if __name__ == '__main__':
     main()
@@ -5,8 +5,17 @@ layout(location = 1) in vec4 color;
 
 smooth out vec4 theColor;
 
+#ifdef MULTI_DRAW
+// one offset per draw, selected by the draw's baseInstance
+layout(location = 2) in vec3 offset;
+#else
 uniform vec3 offset;
-uniform mat4 perspectiveMatrix;
+#endif
+// shared by all programs; see CameraBuffer in framework.py
+layout(std140) uniform Camera
+{
+	mat4 perspectiveMatrix;
+};
 
 void main()
 {
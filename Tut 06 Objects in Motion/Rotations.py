@@ -7,6 +7,7 @@ from OpenGL.GLUT.freeglut import *
 from OpenGL.GLU import *
 from OpenGL.GL import *
 import numpy as np
+import os
 from framework import *
 from math import tan, cos, sin, sqrt
 
@@ -77,19 +78,37 @@ vao = None
 # Global variable to hold the position index buffer object
 indexBufferObject = None
 
-# Global variables to store the location of the shader's uniform variables
-modelToCameraMatrixUnif = None
-cameraToClipMatrixUnif = None
+# Set PYOPENGL_TUTORIAL_INSTANCES to a number of objects to draw them all with one
+# instanced draw call, reading their matrices from a per-instance attribute. Beyond
+# the objects of g_instanceList, the scene is repeated over a grid, instanceSpacing
+# apart. Otherwise each object gets its own uniform upload and draw call.
+# Instances outside the view frustum are culled (see FrustumCuller in framework.py).
+instanceCount = int(os.environ.get('PYOPENGL_TUTORIAL_INSTANCES') or 0)
+instanceSpacing = 20.0
+instanceBuffer = None
+frustumCuller = None
+# Set PYOPENGL_TUTORIAL_SIMULATION_RATE to compute the matrices at that many steps per
+# second, whatever the frame rate, and blend them for each frame (see FixedTimestep in
+# framework.py)
+simulation = None
+# radius of the object's bounding sphere, about its origin
+fObjectRadius = float(np.sqrt((vertexData[:nVertices * vertexDim].reshape(nVertices, vertexDim) ** 2).sum(axis=1)).max())
 
 # Global display variables
 cameraToClipMatrix = np.zeros((4,4), dtype='float32')
+# the model-to-camera matrix of the object being drawn, refilled for each object
+transformMatrix = np.empty((4,4), dtype='float32')
+# the uniform buffer the shaders read cameraToClipMatrix from
+cameraBuffer = None
 fFrustumScale = calcFrustumScale(45.0)
 
 # Set up the list of shaders, and call functions to compile them
 def initializeProgram():
     shaderList = []
     
-    shaderList.append(loadShader(GL_VERTEX_SHADER, "PosColorLocalTransform.vert"))
+    # the INSTANCED variant reads modelToCameraMatrix from an attribute
+    vertexDefines = {"INSTANCED": 1} if instanceCount else None
+    shaderList.append(loadShader(GL_VERTEX_SHADER, "PosColorLocalTransform.vert", vertexDefines))
     shaderList.append(loadShader(GL_FRAGMENT_SHADER, "ColorPassthrough.frag"))
     
     global theProgram 
@@ -98,49 +117,45 @@ def initializeProgram():
     for shader in shaderList:
         glDeleteShader(shader)
     
-    global modelToCameraMatrixUnif, cameraToClipMatrixUnif
-    modelToCameraMatrixUnif = glGetUniformLocation(theProgram, "modelToCameraMatrix")
-    cameraToClipMatrixUnif = glGetUniformLocation(theProgram, "cameraToClipMatrix")
-    
     fzNear = 1.0
     fzFar = 61.0
     
     global cameraToClipMatrix
     # Note that this and the transformation matrix below are both
-    # ROW-MAJOR ordered. Thus, it is necessary to pass a transpose
-    # of the matrix to the glUniform assignment function.
+    # ROW-MAJOR ordered. Thus, they are uploaded with the transpose
+    # argument of the glUniform assignment function set to GL_TRUE.
     cameraToClipMatrix[0][0] = fFrustumScale
     cameraToClipMatrix[1][1] = fFrustumScale
     cameraToClipMatrix[2][2] = (fzFar + fzNear) / (fzNear - fzFar)
     cameraToClipMatrix[2][3] = -1.0
     cameraToClipMatrix[3][2] = (2 * fzFar * fzNear) / (fzNear - fzFar)
     
-    glUseProgram(theProgram)
-    glUniformMatrix4fv(cameraToClipMatrixUnif, 1, GL_FALSE, cameraToClipMatrix.transpose())
-    glUseProgram(0)
+    global cameraBuffer
+    cameraBuffer = CameraBuffer()
+    cameraBuffer.setMatrix(cameraToClipMatrix, GL_TRUE)
 
 # Set up the vertex buffer that will store our vertex coordinates for OpenGL's access
 def initializeVertexBuffer():
     global vertexBufferObject, indexBufferObject
     vertexBufferObject = glGenBuffers(1)
     
-    glBindBuffer(GL_ARRAY_BUFFER, vertexBufferObject)
+    glState.bindBuffer(GL_ARRAY_BUFFER, vertexBufferObject)
     glBufferData( # PyOpenGL allows for the omission of the size parameter
         GL_ARRAY_BUFFER,
         vertexData,
         GL_STATIC_DRAW
     )
-    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    glState.bindBuffer(GL_ARRAY_BUFFER, 0)
     
     indexBufferObject = glGenBuffers(1)
     
-    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, indexBufferObject)
+    glState.bindBuffer(GL_ELEMENT_ARRAY_BUFFER, indexBufferObject)
     glBufferData(
         GL_ELEMENT_ARRAY_BUFFER,
         indexData,
         GL_STATIC_DRAW
     )
-    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+    glState.bindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
     
 # Helper functions to return various types of transformation arrays
 def calcLerpFactor(fElapsedTime, fLoopDuration):
@@ -154,110 +169,166 @@ def computeAngleRad(fElapsedTime, fLoopDuration):
     fCurrTimeThroughLoop = fElapsedTime % fLoopDuration
     return fCurrTimeThroughLoop * fScale
     
-def nullRotation(fElapsedTime):
-    newTransform = np.identity(4, dtype='float32')
+def nullRotation(fElapsedTime, newTransform=None):
+    newTransform = identityMatrix(newTransform)
     # offset 
-    newTransform[0][3] = 0.0
-    newTransform[1][3] = 0.0
-    newTransform[2][3] = -25.0
+    newTransform[0, 3] = 0.0
+    newTransform[1, 3] = 0.0
+    newTransform[2, 3] = -25.0
     return newTransform
     
-def rotateX(fElapsedTime):
+def rotateX(fElapsedTime, newTransform=None):
     fAngRad = computeAngleRad(fElapsedTime, 3.0)
     fCos = cos(fAngRad)
     fSin = sin(fAngRad)
     
-    newTransform = np.identity(4, dtype='float32')
-    newTransform[1][1] = fCos
-    newTransform[2][1] = -fSin
-    newTransform[1][2] = fSin
-    newTransform[2][2] = fCos
+    newTransform = identityMatrix(newTransform)
+    newTransform[1, 1] = fCos
+    newTransform[2, 1] = -fSin
+    newTransform[1, 2] = fSin
+    newTransform[2, 2] = fCos
     # offset 
-    newTransform[0][3] = -5.0
-    newTransform[1][3] = -5.0
-    newTransform[2][3] = -25.0
+    newTransform[0, 3] = -5.0
+    newTransform[1, 3] = -5.0
+    newTransform[2, 3] = -25.0
     return newTransform
         
-def rotateY(fElapsedTime):
+def rotateY(fElapsedTime, newTransform=None):
     fAngRad = computeAngleRad(fElapsedTime, 2.0)
     fCos = cos(fAngRad)
     fSin = sin(fAngRad)
     
-    newTransform = np.identity(4, dtype='float32')
-    newTransform[0][0] = fCos
-    newTransform[2][0] = fSin
-    newTransform[0][2] = -fSin
-    newTransform[2][2] = fCos
+    newTransform = identityMatrix(newTransform)
+    newTransform[0, 0] = fCos
+    newTransform[2, 0] = fSin
+    newTransform[0, 2] = -fSin
+    newTransform[2, 2] = fCos
     # offset 
-    newTransform[0][3] = -5.0
-    newTransform[1][3] = 5.0
-    newTransform[2][3] = -25.0
+    newTransform[0, 3] = -5.0
+    newTransform[1, 3] = 5.0
+    newTransform[2, 3] = -25.0
     return newTransform
 
-def rotateZ(fElapsedTime):
+def rotateZ(fElapsedTime, newTransform=None):
     fAngRad = computeAngleRad(fElapsedTime, 2.0)
     fCos = cos(fAngRad)
     fSin = sin(fAngRad)
     
-    newTransform = np.identity(4, dtype='float32')
-    newTransform[0][0] = fCos
-    newTransform[1][0] = -fSin
-    newTransform[0][1] = fSin
-    newTransform[1][1] = fCos
+    newTransform = identityMatrix(newTransform)
+    newTransform[0, 0] = fCos
+    newTransform[1, 0] = -fSin
+    newTransform[0, 1] = fSin
+    newTransform[1, 1] = fCos
     # offset 
-    newTransform[0][3] = 5.0
-    newTransform[1][3] = 5.0
-    newTransform[2][3] = -25.0
+    newTransform[0, 3] = 5.0
+    newTransform[1, 3] = 5.0
+    newTransform[2, 3] = -25.0
     return newTransform
 
-def rotateAxis(fElapsedTime):
+def rotateAxis(fElapsedTime, newTransform=None):
     fAngRad = computeAngleRad(fElapsedTime, 2.0)
-    fCos = cos(fAngRad)
-    fInvCos = 1.0 - fCos
-    fSin = sin(fAngRad)
-    fInvSin = 1.0 - fSin
-    
-    # get the unit vector in the direction (1,1,1)
-    magnitude = sqrt(3) # 1**2 + 1**2 + 1**2
-    class Axis: # used to keep similar notation to the C++ files
-        x = 0
-        y = 0
-        z = 0
-    axis = Axis()
-    axis.x = 1.0/magnitude
-    axis.y = 1.0/magnitude
-    axis.z = 1.0/magnitude
-    
-    newTransform = np.identity(4, dtype='float32')
-    newTransform[0][0] = (axis.x * axis.x) + ((1 - axis.x * axis.x) * fCos)
-    newTransform[1][0] = axis.x * axis.y * (fInvCos) - (axis.z * fSin)
-    newTransform[2][0] = axis.x * axis.z * (fInvCos) + (axis.y * fSin)
-    
-    newTransform[0][1] = axis.x * axis.y * (fInvCos) + (axis.z * fSin)
-    newTransform[1][1] = (axis.y * axis.y) + ((1 - axis.y * axis.y) * fCos)
-    newTransform[2][1] = axis.y * axis.z * (fInvCos) - (axis.x * fSin)
-    
-    newTransform[0][2] = axis.x * axis.z * (fInvCos) - (axis.y * fSin)
-    newTransform[1][2] = axis.y * axis.z * (fInvCos) + (axis.x * fSin)
-    newTransform[2][2] = (axis.z * axis.z) + ((1 - axis.z * axis.z) * fCos)
+    
+    # rotate about the unit vector in the direction (1,1,1); see rotationAxisMatrix
+    # in framework.py for the terms of the matrix
+    newTransform = rotationAxisMatrix(fAngRad, (1.0, 1.0, 1.0), newTransform)
     
     # offset 
-    newTransform[0][3] = 5.0
-    newTransform[1][3] = -5.0
-    newTransform[2][3] = -25.0
+    newTransform[0, 3] = 5.0
+    newTransform[1, 3] = -5.0
+    newTransform[2, 3] = -25.0
     return newTransform
     
         
 # A list of the helper offset functions.
 # Note that this does not require a structure def in python.
-# Each function is written to return the complete transform matrix.
+# Each function is written to return the complete transform matrix, which
+# it writes into newTransform if given (see identityMatrix in framework.py).
 g_instanceList =[
     nullRotation,
     rotateX,
     rotateY,
     rotateZ,
     rotateAxis]
+
+# Batched versions of the functions above, for animating many objects at once: each
+# takes an array of elapsed times and returns the (N, 4, 4) stack of the matrices the
+# function above returns for each of them, written into out if given (see framework.py)
+def nullRotationBatch(fElapsedTimes, out=None):
+    out = identityMatrices(len(fElapsedTimes), out)
+    out[:, :3, 3] = (0.0, 0.0, -25.0)
+    return out
+
+def rotateXBatch(fElapsedTimes, out=None):
+    out = rotationXMatrices(computeAngleRad(np.asarray(fElapsedTimes), 3.0), out)
+    out[:, :3, 3] = (-5.0, -5.0, -25.0)
+    return out
+
+def rotateYBatch(fElapsedTimes, out=None):
+    out = rotationYMatrices(computeAngleRad(np.asarray(fElapsedTimes), 2.0), out)
+    out[:, :3, 3] = (-5.0, 5.0, -25.0)
+    return out
+
+def rotateZBatch(fElapsedTimes, out=None):
+    out = rotationZMatrices(computeAngleRad(np.asarray(fElapsedTimes), 2.0), out)
+    out[:, :3, 3] = (5.0, 5.0, -25.0)
+    return out
+
+def rotateAxisBatch(fElapsedTimes, out=None):
+    out = rotationAxisMatrices(computeAngleRad(np.asarray(fElapsedTimes), 2.0), (1.0, 1.0, 1.0), out)
+    out[:, :3, 3] = (5.0, -5.0, -25.0)
+    return out
+
+# The batched functions, in the same order as g_instanceList
+g_batchInstanceList = [
+    nullRotationBatch,
+    rotateXBatch,
+    rotateYBatch,
+    rotateZBatch,
+    rotateAxisBatch]
+
+# How long each function of g_instanceList takes to repeat, in seconds, in the same order
+# (any duration will do for the static ones)
+g_loopDurations = [1.0, 3.0, 2.0, 2.0, 2.0]
+
+# Set PYOPENGL_TUTORIAL_ANIMATION_TABLES to a number of samples per loop to bake the
+# functions of g_instanceList into tables once, and compute the matrices from those
+# (see AnimationTable in framework.py). The objects are drawn with these functions.
+objectFuncs = g_instanceList
+batchObjectFuncs = g_batchInstanceList
+animationTables = None
         
+# Set up the per-instance matrix attribute (in the bound VAO) and the arrays the
+# instance matrices are computed in
+def initializeInstances():
+    global instanceBuffer, instanceOffsets, instanceTimeOffsets, instanceMatrices, frustumCuller
+    instanceBuffer = InstanceMatrixBuffer(instanceCount, 2)
+    instanceBuffer.enableAttributes()
+    frustumCuller = FrustumCuller(fObjectRadius)
+    frustumCuller.setMatrix(cameraToClipMatrix)
+    
+    # instance i is a copy of object i % len(g_instanceList), moved to its grid cell;
+    # every copy of the scene runs a quarter second behind the previous one
+    instanceOffsets = tileInstanceOffsets(instanceCount, len(g_instanceList), instanceSpacing)
+    instanceTimeOffsets = (np.arange(instanceCount) // len(g_instanceList)) * 0.25
+    instanceMatrices = np.empty((instanceCount, 4, 4), dtype='float32')
+
+# Returns the matrices of all instances, built with one batched call per object of
+# g_instanceList, each writing every len(g_instanceList)-th matrix
+def computeInstanceMatrices(fElapsedTime, out=None):
+    if out is None:
+        out = instanceMatrices
+    nObjects = len(batchObjectFuncs)
+    for index, batchFunc in enumerate(batchObjectFuncs):
+        batchFunc(fElapsedTime + instanceTimeOffsets[index::nObjects], out[index::nObjects])
+    out[:, :3, 3] += instanceOffsets
+    return out
+
+# Writes the matrices of the objects of g_instanceList at fElapsedTime into out, for
+# the FixedTimestep
+def computeObjectMatrices(fElapsedTime, out):
+    for func, matrix in zip(objectFuncs, out):
+        func(fElapsedTime, matrix)
+
 # Initialize the OpenGL environment
 def init():
     initializeProgram()
@@ -265,27 +336,41 @@ def init():
     
     global vao
     vao = glGenVertexArrays(1)
-    glBindVertexArray(vao)
+    glState.bindVertexArray(vao)
     
     sizeOfFloat = 4 # all our arrays are dtype='float32'
     colorDataOffset = c_void_p(vertexDim * nVertices * sizeOfFloat)
-    glBindBuffer(GL_ARRAY_BUFFER, vertexBufferObject)
-    glEnableVertexAttribArray(0)
-    glEnableVertexAttribArray(1)
+    glState.bindBuffer(GL_ARRAY_BUFFER, vertexBufferObject)
+    glState.enableVertexAttribArray(0)
+    glState.enableVertexAttribArray(1)
     glVertexAttribPointer(0, vertexDim, GL_FLOAT, GL_FALSE, 0, None)
     glVertexAttribPointer(1, colorDim, GL_FLOAT, GL_FALSE, 0, colorDataOffset)
-    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, indexBufferObject)
-    
-    glBindVertexArray(0)
-    
-    glEnable(GL_CULL_FACE)
-    glCullFace(GL_BACK)
-    glFrontFace(GL_CW)
-    
-    glEnable(GL_DEPTH_TEST)
-    glDepthMask(GL_TRUE)
-    glDepthFunc(GL_LEQUAL)
-    glDepthRange(0.0, 1.0)
+    glState.bindBuffer(GL_ELEMENT_ARRAY_BUFFER, indexBufferObject)
+    if instanceCount:
+        initializeInstances()
+    
+    global animationTables, objectFuncs, batchObjectFuncs
+    animationTables = createAnimationTables(g_instanceList, g_loopDurations)
+    if animationTables is not None:
+        objectFuncs = [table.matrix for table in animationTables]
+        batchObjectFuncs = [table.lookup for table in animationTables]
+    
+    global simulation
+    if instanceCount:
+        simulation = createFixedTimestep(computeInstanceMatrices, (instanceCount, 4, 4))
+    else:
+        simulation = createFixedTimestep(computeObjectMatrices, (len(g_instanceList), 4, 4))
+    
+    glState.bindVertexArray(0)
+    
+    glState.enable(GL_CULL_FACE)
+    glState.cullFace(GL_BACK)
+    glState.frontFace(GL_CW)
+    
+    glState.enable(GL_DEPTH_TEST)
+    glState.depthMask(GL_TRUE)
+    glState.depthFunc(GL_LEQUAL)
+    glState.depthRange(0.0, 1.0)
    
 # Called to update the display. 
 # Because we are using double-buffering, glutSwapBuffers is called at the end
@@ -295,19 +380,34 @@ def display():
     glClearDepth(1.0)
     glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
     
-    glUseProgram(theProgram)
+    glState.useProgram(theProgram)
     
-    glBindVertexArray(vao)
+    glState.bindVertexArray(vao)
     
     fElapsedTime = glutGet(GLUT_ELAPSED_TIME) / 1000.0
-    for func in g_instanceList:
-        transformMatrix = func(fElapsedTime)
-        
-        glUniformMatrix4fv(modelToCameraMatrixUnif, 1, GL_FALSE, transformMatrix.transpose())
-        glDrawElements(GL_TRIANGLES, len(indexData), GL_UNSIGNED_SHORT, None)
-    
-    glBindVertexArray(0)
-    glUseProgram(0)
+    # set PYOPENGL_TUTORIAL_GPU_TIMERS to report the time this loop takes on the GPU
+    with gpuTimer.region("instances"):
+        if instanceCount:
+            if simulation is not None:
+                matrices = simulation.update(fElapsedTime)
+            else:
+                matrices = computeInstanceMatrices(fElapsedTime)
+            # only the instances that may be visible are uploaded and drawn
+            visible = frustumCuller.cull(matrices)
+            if len(visible):
+                instanceBuffer.upload(matrices[visible])
+                glDrawElementsInstanced(GL_TRIANGLES, len(indexData), GL_UNSIGNED_SHORT, None, len(visible))
+                instanceBuffer.fence()
+        elif simulation is not None:
+            for matrix in simulation.update(fElapsedTime):
+                theProgram.setUniformMatrix("modelToCameraMatrix", matrix, GL_TRUE)
+                glDrawElements(GL_TRIANGLES, len(indexData), GL_UNSIGNED_SHORT, None)
+        else:
+            for func in objectFuncs:
+                func(fElapsedTime, transformMatrix)
+                
+                theProgram.setUniformMatrix("modelToCameraMatrix", transformMatrix, GL_TRUE)
+                glDrawElements(GL_TRIANGLES, len(indexData), GL_UNSIGNED_SHORT, None)
     
     glutSwapBuffers()
     glutPostRedisplay()
@@ -327,35 +427,21 @@ def reshape(w, h):
     cameraToClipMatrix[0][0] = fFrustumScale * (h / float(w))
     cameraToClipMatrix[1][1] = fFrustumScale
 
-    glUseProgram(theProgram)
-    glUniformMatrix4fv(cameraToClipMatrixUnif, 1, GL_FALSE, cameraToClipMatrix.transpose())
-    glUseProgram(0)
+    cameraBuffer.setMatrix(cameraToClipMatrix, GL_TRUE)
+    if frustumCuller:
+        frustumCuller.setMatrix(cameraToClipMatrix)
     
     glViewport(0, 0, w, h)
     
 # The main function
 def main():
-    glutInit()
-    displayMode = GLUT_DOUBLE | GLUT_ALPHA | GLUT_DEPTH | GLUT_STENCIL;
-    glutInitDisplayMode (displayMode)
-    
-    glutInitContextVersion(3,3)
-    glutInitContextProfile(GLUT_CORE_PROFILE)
-    
     width = 500;
     height = 500;
-    glutInitWindowSize (width, height)
-    
-    glutInitWindowPosition (300, 200)
-    
-    window = glutCreateWindow("Tutorial Window")
-    
-    init()
-    glutDisplayFunc(display) 
-    glutReshapeFunc(reshape)
-    glutKeyboardFunc(keyboard)
     
-    glutMainLoop();
+    # The context provider opens a GLUT window, or renders offscreen when
+    # PYOPENGL_TUTORIAL_HEADLESS is set (see framework.py)
+    context = createContextProvider(width, height, contextVersion=(3, 3), coreProfile=True)
+    context.run("Tutorial Window", init, display, reshape, keyboard)
 
 if __name__ == '__main__':
     main()
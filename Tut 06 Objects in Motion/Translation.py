@@ -7,6 +7,7 @@ from OpenGL.GLUT.freeglut import *
 from OpenGL.GLU import *
 from OpenGL.GL import *
 import numpy as np
+import os
 from framework import *
 from math import tan, cos, sin
 
@@ -77,19 +78,37 @@ vao = None
 # Global variable to hold the position index buffer object
 indexBufferObject = None
 
-# Global variables to store the location of the shader's uniform variables
-modelToCameraMatrixUnif = None
-cameraToClipMatrixUnif = None
+# Set PYOPENGL_TUTORIAL_INSTANCES to a number of objects to draw them all with one
+# instanced draw call, reading their matrices from a per-instance attribute. Beyond
+# the objects of g_instanceList, the scene is repeated over a grid, instanceSpacing
+# apart. Otherwise each object gets its own uniform upload and draw call.
+# Instances outside the view frustum are culled (see FrustumCuller in framework.py).
+instanceCount = int(os.environ.get('PYOPENGL_TUTORIAL_INSTANCES') or 0)
+instanceSpacing = 20.0
+instanceBuffer = None
+frustumCuller = None
+# Set PYOPENGL_TUTORIAL_SIMULATION_RATE to compute the matrices at that many steps per
+# second, whatever the frame rate, and blend them for each frame (see FixedTimestep in
+# framework.py)
+simulation = None
+# radius of the object's bounding sphere, about its origin
+fObjectRadius = float(np.sqrt((vertexData[:nVertices * vertexDim].reshape(nVertices, vertexDim) ** 2).sum(axis=1)).max())
 
 # Global display variables
 cameraToClipMatrix = np.zeros((4,4), dtype='float32')
+# the model-to-camera matrix of the object being drawn, refilled for each object
+transformMatrix = np.empty((4,4), dtype='float32')
+# the uniform buffer the shaders read cameraToClipMatrix from
+cameraBuffer = None
 fFrustumScale = calcFrustumScale(45.0)
 
 # Set up the list of shaders, and call functions to compile them
 def initializeProgram():
     shaderList = []
     
-    shaderList.append(loadShader(GL_VERTEX_SHADER, "PosColorLocalTransform.vert"))
+    # the INSTANCED variant reads modelToCameraMatrix from an attribute
+    vertexDefines = {"INSTANCED": 1} if instanceCount else None
+    shaderList.append(loadShader(GL_VERTEX_SHADER, "PosColorLocalTransform.vert", vertexDefines))
     shaderList.append(loadShader(GL_FRAGMENT_SHADER, "ColorPassthrough.frag"))
     
     global theProgram 
@@ -98,88 +117,166 @@ def initializeProgram():
     for shader in shaderList:
         glDeleteShader(shader)
     
-    global modelToCameraMatrixUnif, cameraToClipMatrixUnif
-    modelToCameraMatrixUnif = glGetUniformLocation(theProgram, "modelToCameraMatrix")
-    cameraToClipMatrixUnif = glGetUniformLocation(theProgram, "cameraToClipMatrix")
-    
     fzNear = 1.0
     fzFar = 45.0
     
     global cameraToClipMatrix
     # Note that this and the transformation matrix below are both
-    # ROW-MAJOR ordered. Thus, it is necessary to pass a transpose
-    # of the matrix to the glUniform assignment function.
+    # ROW-MAJOR ordered. Thus, they are uploaded with the transpose
+    # argument of the glUniform assignment function set to GL_TRUE.
     cameraToClipMatrix[0][0] = fFrustumScale
     cameraToClipMatrix[1][1] = fFrustumScale
     cameraToClipMatrix[2][2] = (fzFar + fzNear) / (fzNear - fzFar)
     cameraToClipMatrix[2][3] = -1.0
     cameraToClipMatrix[3][2] = (2 * fzFar * fzNear) / (fzNear - fzFar)
     
-    glUseProgram(theProgram)
-    glUniformMatrix4fv(cameraToClipMatrixUnif, 1, GL_FALSE, cameraToClipMatrix.transpose())
-    glUseProgram(0)
+    global cameraBuffer
+    cameraBuffer = CameraBuffer()
+    cameraBuffer.setMatrix(cameraToClipMatrix, GL_TRUE)
 
 # Set up the vertex buffer that will store our vertex coordinates for OpenGL's access
 def initializeVertexBuffer():
     global vertexBufferObject, indexBufferObject
     vertexBufferObject = glGenBuffers(1)
     
-    glBindBuffer(GL_ARRAY_BUFFER, vertexBufferObject)
+    glState.bindBuffer(GL_ARRAY_BUFFER, vertexBufferObject)
     glBufferData( # PyOpenGL allows for the omission of the size parameter
         GL_ARRAY_BUFFER,
         vertexData,
         GL_STATIC_DRAW
     )
-    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    glState.bindBuffer(GL_ARRAY_BUFFER, 0)
     
     indexBufferObject = glGenBuffers(1)
     
-    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, indexBufferObject)
+    glState.bindBuffer(GL_ELEMENT_ARRAY_BUFFER, indexBufferObject)
     glBufferData(
         GL_ELEMENT_ARRAY_BUFFER,
         indexData,
         GL_STATIC_DRAW
     )
-    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+    glState.bindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
     
 # Helper functions to return various types of transformation arrays
-def stationaryOffset(fElapsedTime):
-    newTransform = np.identity(4, dtype='float32')
-    newTransform[2][3] = -20
+def stationaryOffset(fElapsedTime, newTransform=None):
+    newTransform = identityMatrix(newTransform)
+    newTransform[2, 3] = -20
     return newTransform
     
-def ovalOffset(fElapsedTime):
+def ovalOffset(fElapsedTime, newTransform=None):
     fLoopDuration = 3.0
     fScale = 3.14159 * 2.0 / fLoopDuration
     
     fCurrTimeThroughLoop = fElapsedTime % fLoopDuration
     
-    newTransform = np.identity(4, dtype='float32')
-    newTransform[0][3] = cos(fCurrTimeThroughLoop * fScale) * 4.0
-    newTransform[1][3] = sin(fCurrTimeThroughLoop * fScale) * 6.0
-    newTransform[2][3] = -20
+    newTransform = identityMatrix(newTransform)
+    newTransform[0, 3] = cos(fCurrTimeThroughLoop * fScale) * 4.0
+    newTransform[1, 3] = sin(fCurrTimeThroughLoop * fScale) * 6.0
+    newTransform[2, 3] = -20
     return newTransform
         
-def bottomCircleOffset(fElapsedTime):
+def bottomCircleOffset(fElapsedTime, newTransform=None):
     fLoopDuration = 12.0
     fScale = 3.14159 * 2.0 / fLoopDuration
     
     fCurrTimeThroughLoop = fElapsedTime % fLoopDuration
     
-    newTransform = np.identity(4, dtype='float32')
-    newTransform[0][3] = cos(fCurrTimeThroughLoop * fScale) * 4.0
-    newTransform[1][3] = -3.5
-    newTransform[2][3] = sin(fCurrTimeThroughLoop * fScale) * 5.0 - 20.0
+    newTransform = identityMatrix(newTransform)
+    newTransform[0, 3] = cos(fCurrTimeThroughLoop * fScale) * 4.0
+    newTransform[1, 3] = -3.5
+    newTransform[2, 3] = sin(fCurrTimeThroughLoop * fScale) * 5.0 - 20.0
     return newTransform
         
 # A list of the helper offset functions.
 # Note that this does not require a structure def in python.
-# Each function is written to return the complete transform matrix.
+# Each function is written to return the complete transform matrix, which
+# it writes into newTransform if given (see identityMatrix in framework.py).
 g_instanceList =[
     stationaryOffset,
     ovalOffset,
     bottomCircleOffset]
+
+# Batched versions of the functions above, for animating many objects at once: each
+# takes an array of elapsed times and returns the (N, 4, 4) stack of the matrices the
+# function above returns for each of them, written into out if given (see framework.py)
+def stationaryOffsetBatch(fElapsedTimes, out=None):
+    out = identityMatrices(len(fElapsedTimes), out)
+    out[:, 2, 3] = -20
+    return out
+
+def ovalOffsetBatch(fElapsedTimes, out=None):
+    fLoopDuration = 3.0
+    fScale = 3.14159 * 2.0 / fLoopDuration
+    
+    fCurrTimeThroughLoop = np.asarray(fElapsedTimes) % fLoopDuration
+    
+    offsets = np.empty((len(fCurrTimeThroughLoop), 3))
+    offsets[:, 0] = np.cos(fCurrTimeThroughLoop * fScale) * 4.0
+    offsets[:, 1] = np.sin(fCurrTimeThroughLoop * fScale) * 6.0
+    offsets[:, 2] = -20
+    return translationMatrices(offsets, out)
+
+def bottomCircleOffsetBatch(fElapsedTimes, out=None):
+    fLoopDuration = 12.0
+    fScale = 3.14159 * 2.0 / fLoopDuration
+    
+    fCurrTimeThroughLoop = np.asarray(fElapsedTimes) % fLoopDuration
+    
+    offsets = np.empty((len(fCurrTimeThroughLoop), 3))
+    offsets[:, 0] = np.cos(fCurrTimeThroughLoop * fScale) * 4.0
+    offsets[:, 1] = -3.5
+    offsets[:, 2] = np.sin(fCurrTimeThroughLoop * fScale) * 5.0 - 20.0
+    return translationMatrices(offsets, out)
+
+# The batched functions, in the same order as g_instanceList
+g_batchInstanceList = [
+    stationaryOffsetBatch,
+    ovalOffsetBatch,
+    bottomCircleOffsetBatch]
+
+# How long each function of g_instanceList takes to repeat, in seconds, in the same order
+# (any duration will do for the static ones)
+g_loopDurations = [1.0, 3.0, 12.0]
+
+# Set PYOPENGL_TUTORIAL_ANIMATION_TABLES to a number of samples per loop to bake the
+# functions of g_instanceList into tables once, and compute the matrices from those
+# (see AnimationTable in framework.py). The objects are drawn with these functions.
+objectFuncs = g_instanceList
+batchObjectFuncs = g_batchInstanceList
+animationTables = None
         
+# Set up the per-instance matrix attribute (in the bound VAO) and the arrays the
+# instance matrices are computed in
+def initializeInstances():
+    global instanceBuffer, instanceOffsets, instanceTimeOffsets, instanceMatrices, frustumCuller
+    instanceBuffer = InstanceMatrixBuffer(instanceCount, 2)
+    instanceBuffer.enableAttributes()
+    frustumCuller = FrustumCuller(fObjectRadius)
+    frustumCuller.setMatrix(cameraToClipMatrix)
+    
+    # instance i is a copy of object i % len(g_instanceList), moved to its grid cell;
+    # every copy of the scene runs a quarter second behind the previous one
+    instanceOffsets = tileInstanceOffsets(instanceCount, len(g_instanceList), instanceSpacing)
+    instanceTimeOffsets = (np.arange(instanceCount) // len(g_instanceList)) * 0.25
+    instanceMatrices = np.empty((instanceCount, 4, 4), dtype='float32')
+
+# Returns the matrices of all instances, built with one batched call per object of
+# g_instanceList, each writing every len(g_instanceList)-th matrix
+def computeInstanceMatrices(fElapsedTime, out=None):
+    if out is None:
+        out = instanceMatrices
+    nObjects = len(batchObjectFuncs)
+    for index, batchFunc in enumerate(batchObjectFuncs):
+        batchFunc(fElapsedTime + instanceTimeOffsets[index::nObjects], out[index::nObjects])
+    out[:, :3, 3] += instanceOffsets
+    return out
+
+# Writes the matrices of the objects of g_instanceList at fElapsedTime into out, for
+# the FixedTimestep
+def computeObjectMatrices(fElapsedTime, out):
+    for func, matrix in zip(objectFuncs, out):
+        func(fElapsedTime, matrix)
+
 # Initialize the OpenGL environment
 def init():
     initializeProgram()
@@ -187,27 +284,41 @@ def init():
     
     global vao
     vao = glGenVertexArrays(1)
-    glBindVertexArray(vao)
+    glState.bindVertexArray(vao)
     
     sizeOfFloat = 4 # all our arrays are dtype='float32'
     colorDataOffset = c_void_p(vertexDim * nVertices * sizeOfFloat)
-    glBindBuffer(GL_ARRAY_BUFFER, vertexBufferObject)
-    glEnableVertexAttribArray(0)
-    glEnableVertexAttribArray(1)
+    glState.bindBuffer(GL_ARRAY_BUFFER, vertexBufferObject)
+    glState.enableVertexAttribArray(0)
+    glState.enableVertexAttribArray(1)
     glVertexAttribPointer(0, vertexDim, GL_FLOAT, GL_FALSE, 0, None)
     glVertexAttribPointer(1, colorDim, GL_FLOAT, GL_FALSE, 0, colorDataOffset)
-    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, indexBufferObject)
-    
-    glBindVertexArray(0)
-    
-    glEnable(GL_CULL_FACE)
-    glCullFace(GL_BACK)
-    glFrontFace(GL_CW)
-    
-    glEnable(GL_DEPTH_TEST)
-    glDepthMask(GL_TRUE)
-    glDepthFunc(GL_LEQUAL)
-    glDepthRange(0.0, 1.0)
+    glState.bindBuffer(GL_ELEMENT_ARRAY_BUFFER, indexBufferObject)
+    if instanceCount:
+        initializeInstances()
+    
+    global animationTables, objectFuncs, batchObjectFuncs
+    animationTables = createAnimationTables(g_instanceList, g_loopDurations)
+    if animationTables is not None:
+        objectFuncs = [table.matrix for table in animationTables]
+        batchObjectFuncs = [table.lookup for table in animationTables]
+    
+    global simulation
+    if instanceCount:
+        simulation = createFixedTimestep(computeInstanceMatrices, (instanceCount, 4, 4))
+    else:
+        simulation = createFixedTimestep(computeObjectMatrices, (len(g_instanceList), 4, 4))
+    
+    glState.bindVertexArray(0)
+    
+    glState.enable(GL_CULL_FACE)
+    glState.cullFace(GL_BACK)
+    glState.frontFace(GL_CW)
+    
+    glState.enable(GL_DEPTH_TEST)
+    glState.depthMask(GL_TRUE)
+    glState.depthFunc(GL_LEQUAL)
+    glState.depthRange(0.0, 1.0)
    
 # Called to update the display. 
 # Because we are using double-buffering, glutSwapBuffers is called at the end
@@ -217,19 +328,34 @@ def display():
     glClearDepth(1.0)
     glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
     
-    glUseProgram(theProgram)
+    glState.useProgram(theProgram)
     
-    glBindVertexArray(vao)
+    glState.bindVertexArray(vao)
     
     fElapsedTime = glutGet(GLUT_ELAPSED_TIME) / 1000.0
-    for func in g_instanceList:
-        transformMatrix = func(fElapsedTime)
-        
-        glUniformMatrix4fv(modelToCameraMatrixUnif, 1, GL_FALSE, transformMatrix.transpose())
-        glDrawElements(GL_TRIANGLES, len(indexData), GL_UNSIGNED_SHORT, None)
-    
-    glBindVertexArray(0)
-    glUseProgram(0)
+    # set PYOPENGL_TUTORIAL_GPU_TIMERS to report the time this loop takes on the GPU
+    with gpuTimer.region("instances"):
+        if instanceCount:
+            if simulation is not None:
+                matrices = simulation.update(fElapsedTime)
+            else:
+                matrices = computeInstanceMatrices(fElapsedTime)
+            # only the instances that may be visible are uploaded and drawn
+            visible = frustumCuller.cull(matrices)
+            if len(visible):
+                instanceBuffer.upload(matrices[visible])
+                glDrawElementsInstanced(GL_TRIANGLES, len(indexData), GL_UNSIGNED_SHORT, None, len(visible))
+                instanceBuffer.fence()
+        elif simulation is not None:
+            for matrix in simulation.update(fElapsedTime):
+                theProgram.setUniformMatrix("modelToCameraMatrix", matrix, GL_TRUE)
+                glDrawElements(GL_TRIANGLES, len(indexData), GL_UNSIGNED_SHORT, None)
+        else:
+            for func in objectFuncs:
+                func(fElapsedTime, transformMatrix)
+                
+                theProgram.setUniformMatrix("modelToCameraMatrix", transformMatrix, GL_TRUE)
+                glDrawElements(GL_TRIANGLES, len(indexData), GL_UNSIGNED_SHORT, None)
     
     glutSwapBuffers()
     glutPostRedisplay()
@@ -249,35 +375,21 @@ def reshape(w, h):
     cameraToClipMatrix[0][0] = fFrustumScale * (h / float(w))
     cameraToClipMatrix[1][1] = fFrustumScale
 
-    glUseProgram(theProgram)
-    glUniformMatrix4fv(cameraToClipMatrixUnif, 1, GL_FALSE, cameraToClipMatrix.transpose())
-    glUseProgram(0)
+    cameraBuffer.setMatrix(cameraToClipMatrix, GL_TRUE)
+    if frustumCuller:
+        frustumCuller.setMatrix(cameraToClipMatrix)
     
     glViewport(0, 0, w, h)
     
 # The main function
 def main():
-    glutInit()
-    displayMode = GLUT_DOUBLE | GLUT_ALPHA | GLUT_DEPTH | GLUT_STENCIL;
-    glutInitDisplayMode (displayMode)
-    
-    glutInitContextVersion(3,3)
-    glutInitContextProfile(GLUT_CORE_PROFILE)
-    
     width = 500;
     height = 500;
-    glutInitWindowSize (width, height)
-    
-    glutInitWindowPosition (300, 200)
-    
-    window = glutCreateWindow("Tutorial Window")
-    
-    init()
-    glutDisplayFunc(display) 
-    glutReshapeFunc(reshape)
-    glutKeyboardFunc(keyboard)
     
-    glutMainLoop();
+    # The context provider opens a GLUT window, or renders offscreen when
+    # PYOPENGL_TUTORIAL_HEADLESS is set (see framework.py)
+    context = createContextProvider(width, height, contextVersion=(3, 3), coreProfile=True)
+    context.run("Tutorial Window", init, display, reshape, keyboard)
 
 if __name__ == '__main__':
     main()
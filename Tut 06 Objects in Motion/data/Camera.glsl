@@ -0,0 +1,5 @@
+// The camera matrices, shared by all programs; see CameraBuffer in framework.py
+layout(std140) uniform Camera
+{
+	mat4 cameraToClipMatrix;
+};
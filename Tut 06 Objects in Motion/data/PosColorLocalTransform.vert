@@ -5,8 +5,14 @@ layout(location = 1) in vec4 color;
 
 smooth out vec4 theColor;
 
-uniform mat4 cameraToClipMatrix;
+#include "Camera.glsl"
+
+#ifdef INSTANCED
+// one matrix per instance, in locations 2 to 5
+layout(location = 2) in mat4 modelToCameraMatrix;
+#else
 uniform mat4 modelToCameraMatrix;
+#endif
 
 void main()
 {
@@ -0,0 +1,75 @@
+# Error and cost of the framework's AnimationTables against the Tut 06 functions they bake.
+# This file is licensed under the MIT License.
+#
+# For each function of the g_instanceList of Rotations.py, Translation.py and Scale.py,
+# and each sample count, bakes an AnimationTable (without the disk cache) and reports:
+#  - bakeMs: the time taken to sample the function and measure the error
+#  - maxError: the error measured halfway between the samples (AnimationTable.maxError)
+#  - randomError: the largest error at --count random times, against the batched function
+#  - lookupMs / batchMs: the time to compute --count matrices with AnimationTable.lookup
+#    and with the batched function
+# as JSON. No GL context is needed. It fails if lookup writes different matrices into
+# a view that cannot be reshaped without a copy than into a new array.
+#
+# Usage:
+#   python benchmarks/animationTables.py [--repeat N] [--count N] [--samples 16,256]
+
+import argparse
+import json
+import os
+import sys
+from timeit import default_timer
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TUTORIAL_DIR = os.path.join(REPO_DIR, 'Tut 06 Objects in Motion')
+
+# Returns the mean milliseconds per call of func()
+def timeCalls(func, repeat):
+    start = default_timer()
+    for i in range(repeat):
+        func()
+    return (default_timer() - start) * 1000.0 / repeat
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure baked animation tables against the functions they bake.')
+    parser.add_argument('--repeat', type=int, default=5, help='number of timed runs per measurement')
+    parser.add_argument('--count', type=int, default=100000, help='number of matrices per lookup')
+    parser.add_argument('--samples', default='16,64,256,1024', help='comma separated samples per loop')
+    args = parser.parse_args()
+
+    sys.path.insert(0, TUTORIAL_DIR)
+    import framework
+    np = framework.np
+
+    fElapsedTimes = np.random.uniform(0.0, 60.0, args.count)
+    results = {}
+    for strModule in ('Rotations', 'Translation', 'Scale'):
+        module = __import__(strModule)
+        for func, batchFunc, fLoopDuration in zip(module.g_instanceList, module.g_batchInstanceList,
+                                                  module.g_loopDurations):
+            exact = batchFunc(fElapsedTimes)
+            out = np.empty((args.count, 4, 4), dtype='float32')
+            batchMs = timeCalls(lambda: batchFunc(fElapsedTimes, out), args.repeat)
+            for sampleCount in [int(strCount) for strCount in args.samples.split(',')]:
+                table = framework.AnimationTable(func, fLoopDuration, sampleCount, cache=False)
+                start = default_timer()
+                table.bake()
+                bakeMs = (default_timer() - start) * 1000.0
+                # every other matrix of a stack whose rows are padded to 5 floats
+                strided = np.zeros((args.count, 4, 5), dtype='float32')[::2, :, :4]
+                table.lookup(fElapsedTimes[::2], strided)
+                if not np.array_equal(strided, table.lookup(fElapsedTimes[::2])):
+                    raise RuntimeError('AnimationTable.lookup did not fill a strided output array')
+                results['%s.%s/%d' % (strModule, func.__name__, sampleCount)] = {
+                    'bakeMs': bakeMs,
+                    'maxError': table.maxError,
+                    'randomError': float(np.abs(table.lookup(fElapsedTimes) - exact).max()),
+                    'lookupMs': timeCalls(lambda: table.lookup(fElapsedTimes, out), args.repeat),
+                    'batchMs': batchMs,
+                }
+
+    print(json.dumps(results, indent=2, sort_keys=True))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
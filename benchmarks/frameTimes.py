@@ -0,0 +1,254 @@
+# Frame-time benchmark for the tutorial programs.
+# This file is licensed under the MIT License.
+#
+# Runs every tutorial (or the ones named on the command line) headlessly for a
+# fixed number of frames and reports, as JSON:
+#  - the time spent in display() per frame (mean/p50/p95/p99, in milliseconds)
+#  - the number of GL calls issued per frame
+#  - the number of bytes uploaded to GL per frame (buffer data and uniforms)
+#  - the state changes per frame that glState issued to GL and that it skipped as redundant
+#  - with --gpu-timers, the CPU and GPU time of each gpuTimer region in the tutorial
+#  - for tutorials that cull with a FrustumCuller, the instances drawn and culled per frame
+#  - for tutorials animated with a FixedTimestep (PYOPENGL_TUTORIAL_SIMULATION_RATE), the
+#    simulation steps run per frame
+#  - for tutorials that set their uniforms through theProgram's setters or a
+#    CameraBuffer, the uniform uploads issued and skipped (equal to the value already
+#    uploaded) per frame, counting those made by reshape()
+# With --fast-gl the tutorials run with the framework's fast GL entry points, so that
+# a baseline saved without it shows the difference.
+#
+# Each tutorial runs in its own process, since PyOpenGL's platform must be chosen
+# before OpenGL is imported and the tutorials keep their state in module globals.
+# The tutorial's own main() is used, with createContextProvider replaced so that it
+# returns a HeadlessContext that times display(). The GL calls are counted with the
+# framework's GLCallTracer, whose wrappers are included in the display() times.
+# See "Running without a display" in README.md for the requirements.
+#
+# Usage:
+#   python benchmarks/frameTimes.py [--frames N] [--gpu-timers] [--fast-gl] [--output results.json]
+#       [--save-baseline baseline.json | --baseline baseline.json [--threshold 0.25]]
+#       [tutorial paths...]
+#
+# With --baseline, the run fails (exit status 1) if any tutorial's mean frame time,
+# GL calls or uploaded bytes per frame exceed the baseline by more than the threshold.
+# A tutorial that fails to run (e.g. one of the tutorials that are still Python 2 code,
+# under Python 3) is left out of the results and reported on stderr with the last line
+# of its error, and the run then also exits with status 1.
+
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+from timeit import default_timer
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Metrics compared against the baseline, as paths into a tutorial's result dict
+BASELINE_METRICS = [
+    ('displayMs', 'mean'),
+    ('glCallsPerFrame',),
+    ('bytesUploadedPerFrame',),
+]
+
+# Returns the paths of all tutorial programs, relative to the repository
+def findTutorials():
+    tutorials = []
+    for strPath in sorted(glob.glob(os.path.join(REPO_DIR, 'Tut *', '*.py'))):
+        if os.path.basename(strPath) != 'framework.py':
+            tutorials.append(os.path.relpath(strPath, REPO_DIR))
+    return tutorials
+
+# Returns the given percentile of a sorted list
+def percentile(sortedValues, fraction):
+    index = int(round(fraction * (len(sortedValues) - 1)))
+    return sortedValues[index]
+
+# Runs one tutorial in this process and returns its result dict
+def benchmarkTutorial(strPath, frameCount, gpuTimers=False, fastGL=False):
+    strDir, strFile = os.path.split(os.path.join(REPO_DIR, strPath))
+    # the tutorials find their shaders relative to the working directory
+    os.chdir(strDir)
+    sys.path.insert(0, strDir)
+
+    import framework
+    module = __import__(os.path.splitext(strFile)[0])
+
+    framework.gpuTimer.enabled = gpuTimers
+    tracer = framework.GLCallTracer()
+    frameTimes = []
+
+    class BenchmarkContext(framework.HeadlessContext):
+        def prepareDisplay(self, display):
+            self.installGlutStandIns(display.__globals__)
+            if fastGL:
+                framework.installFastEntryPoints(display.__globals__)
+            tracedDisplay = tracer.attach(display)
+            if fastGL:
+                tracedDisplay = framework.checkErrorsPerFrame(tracedDisplay)
+
+            def timedDisplay():
+                if not frameTimes:
+                    # only count the state changes made while drawing, not those made by init()
+                    framework.glState.endFrame()
+                start = default_timer()
+                tracedDisplay()
+                frameTimes.append(default_timer() - start)
+            return timedDisplay
+
+        def run(self, strTitle, init, display, reshape, keyboard=None, mouse=None):
+            framework.HeadlessContext.run(self, strTitle, init, display, reshape, keyboard, mouse)
+            # the context is still current, and finished, so every query result is available
+            framework.gpuTimer.collect()
+
+    def createContextProvider(width, height, contextVersion=None, coreProfile=False):
+        return BenchmarkContext(width, height, contextVersion, coreProfile, frameCount)
+
+    module.createContextProvider = createContextProvider
+    module.main()
+
+    frameMs = sorted(t * 1000.0 for t in frameTimes)
+    result = {
+        'frames': len(frameMs),
+        'displayMs': {
+            'mean': sum(frameMs) / len(frameMs),
+            'p50': percentile(frameMs, 0.50),
+            'p95': percentile(frameMs, 0.95),
+            'p99': percentile(frameMs, 0.99),
+        },
+        'glCallsPerFrame': tracer.totalCalls() / float(len(frameMs)),
+        'glCalls': tracer.totalCalls(),
+        'glCallsByFunction': tracer.calls,
+        'bytesUploadedPerFrame': tracer.bytesUploaded / float(len(frameMs)),
+        'bytesUploaded': tracer.bytesUploaded,
+    }
+    issuedCalls, skippedCalls = framework.glState.endFrame()
+    result['stateChanges'] = {
+        'issuedPerFrame': issuedCalls / float(len(frameMs)),
+        'skippedPerFrame': skippedCalls / float(len(frameMs)),
+    }
+    if gpuTimers:
+        result['regions'] = framework.gpuTimer.results()
+    frustumCuller = getattr(module, 'frustumCuller', None)
+    if frustumCuller is not None:
+        drawn, culled = frustumCuller.endFrame()
+        result['culling'] = {
+            'drawnPerFrame': drawn / float(len(frameMs)),
+            'culledPerFrame': culled / float(len(frameMs)),
+        }
+    simulation = getattr(module, 'simulation', None)
+    if simulation is not None:
+        result['simulation'] = {
+            'stepsPerFrame': simulation.stepCount / float(len(frameMs)),
+        }
+    uploads = skippedUploads = 0
+    for owner in (getattr(module, 'theProgram', None), getattr(module, 'cameraBuffer', None)):
+        if isinstance(owner, (framework.Program, framework.CameraBuffer)):
+            ownerUploads, ownerSkippedUploads = owner.endFrame()
+            uploads += ownerUploads
+            skippedUploads += ownerSkippedUploads
+    if uploads or skippedUploads:
+        result['uniforms'] = {
+            'uploadsPerFrame': uploads / float(len(frameMs)),
+            'skippedUploadsPerFrame': skippedUploads / float(len(frameMs)),
+        }
+    return result
+
+# Runs one tutorial in a child process with the EGL platform selected
+def runTutorialProcess(strPath, frameCount, gpuTimers=False, fastGL=False):
+    env = dict(os.environ)
+    env['PYOPENGL_PLATFORM'] = 'egl'
+    # these would write to stdout, which carries the result
+    # and the modes are chosen by the flags alone
+    for strName in ('PYOPENGL_TUTORIAL_OUTPUT', 'PYOPENGL_TUTORIAL_TRACE', 'PYOPENGL_TUTORIAL_GPU_TIMERS',
+                    'PYOPENGL_TUTORIAL_FAST_GL'):
+        env.pop(strName, None)
+    command = [sys.executable, os.path.abspath(__file__), '--child', '--frames', str(frameCount), strPath]
+    if gpuTimers:
+        command.append('--gpu-timers')
+    if fastGL:
+        command.append('--fast-gl')
+    process = subprocess.Popen(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    output, errors = process.communicate()
+    strErrors = errors.decode('utf-8', 'replace')
+    if process.returncode != 0:
+        errorLines = strErrors.strip().splitlines() or ['exit status %d' % process.returncode]
+        raise RuntimeError(errorLines[-1])
+    sys.stderr.write(strErrors)
+    # the tutorials may print (e.g. shader logs), so the result is the last line
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+def lookupMetric(result, metric):
+    for key in metric:
+        result = result[key]
+    return result
+
+# Returns a list of messages describing the metrics that regressed beyond the threshold
+def compareWithBaseline(results, baseline, threshold):
+    regressions = []
+    for strPath in sorted(results):
+        if strPath not in baseline:
+            continue
+        for metric in BASELINE_METRICS:
+            current = lookupMetric(results[strPath], metric)
+            previous = lookupMetric(baseline[strPath], metric)
+            if current > previous * (1.0 + threshold):
+                regressions.append('%s: %s went from %.4g to %.4g' % (strPath, '.'.join(metric), previous, current))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure per-frame cost of the tutorial programs.')
+    parser.add_argument('tutorials', nargs='*', help='tutorial paths relative to the repository (default: all)')
+    parser.add_argument('--frames', type=int, default=300, help='number of frames to render')
+    parser.add_argument('--gpu-timers', action='store_true', help='also report the gpuTimer regions of each tutorial')
+    parser.add_argument('--fast-gl', action='store_true', help='run with the fast GL entry points (PYOPENGL_TUTORIAL_FAST_GL)')
+    parser.add_argument('--output', help='write the JSON results to this file instead of stdout')
+    parser.add_argument('--baseline', help='fail if results regress against this JSON file')
+    parser.add_argument('--save-baseline', help='store the results as a baseline in this JSON file')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed regression, as a fraction (default 0.25)')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(benchmarkTutorial(args.tutorials[0], args.frames, args.gpu_timers, args.fast_gl)))
+        return 0
+
+    results = {}
+    failures = {}
+    for strPath in args.tutorials or findTutorials():
+        try:
+            results[strPath] = runTutorialProcess(strPath, args.frames, args.gpu_timers, args.fast_gl)
+        except RuntimeError as e:
+            failures[strPath] = str(e)
+            sys.stderr.write('Skipped ' + strPath + ': ' + str(e) + '\n')
+
+    strResults = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(strResults + '\n')
+    else:
+        print(strResults)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            f.write(strResults + '\n')
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compareWithBaseline(results, baseline, args.threshold)
+        for strMessage in regressions:
+            sys.stderr.write('Regression: ' + strMessage + '\n')
+        if regressions:
+            return 1
+
+    if failures:
+        sys.stderr.write('%d tutorial(s) failed to run and are not in the results\n' % len(failures))
+        if sys.version_info[0] >= 3:
+            sys.stderr.write('Some tutorials are still Python 2 code; run this benchmark with Python 2 to time them all\n')
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+# Cost of frustum culling a stress scene of many objects.
+# This file is licensed under the MIT License.
+#
+# Scatters N objects (the Tut 06 mesh, randomly rotated and scaled) through a box
+# around the view frustum of the Tut 06 tutorials, and times:
+#  - cullMs: FrustumCuller.cull, testing every bounding sphere in one NumPy pass
+#  - loopMs: the same test one object at a time in Python, up to --max-loop-count objects
+# Reports the milliseconds per frame and the objects drawn and culled as JSON.
+# It fails if the two tests disagree, or if tileInstanceOffsets (which lays out the
+# instanced Tut 06 scenes) moves the first copy of the scene or puts two copies in one
+# grid cell.
+# No GL context is needed. To draw a 100k object scene with culling, run a Tut 06
+# tutorial with PYOPENGL_TUTORIAL_INSTANCES=100000 (see README.md).
+#
+# Usage:
+#   python benchmarks/frustumCulling.py [--repeat N] [--counts 1000,100000]
+
+import argparse
+import json
+import os
+import sys
+from timeit import default_timer
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TUTORIAL_DIR = os.path.join(REPO_DIR, 'Tut 06 Objects in Motion')
+
+# Returns the mean milliseconds per call of func()
+def timeCalls(func, repeat):
+    start = default_timer()
+    for i in range(repeat):
+        func()
+    return (default_timer() - start) * 1000.0 / repeat
+
+# Returns the indices of the visible objects, testing one object at a time
+def loopCull(np, planes, matrices, fRadius):
+    visible = []
+    for index, matrix in enumerate(matrices):
+        fScale = max(np.sqrt((matrix[:3, column] ** 2).sum()) for column in range(3))
+        for plane in planes:
+            if np.dot(plane[:3], matrix[:3, 3]) + plane[3] < -fScale * fRadius:
+                break
+        else:
+            visible.append(index)
+    return visible
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure vectorized frustum culling against object count.')
+    parser.add_argument('--repeat', type=int, default=5, help='number of timed runs per measurement')
+    parser.add_argument('--counts', default='1000,10000,100000', help='comma separated object counts')
+    parser.add_argument('--max-loop-count', type=int, default=10000,
+                        help='largest object count to time the per-object test for')
+    args = parser.parse_args()
+
+    sys.path.insert(0, TUTORIAL_DIR)
+    import framework
+    import Rotations
+    np = framework.np
+
+    # the camera-to-clip matrix Rotations.py builds in initializeProgram
+    fzNear = 1.0
+    fzFar = 61.0
+    cameraToClipMatrix = np.zeros((4, 4), dtype='float32')
+    cameraToClipMatrix[0, 0] = Rotations.fFrustumScale
+    cameraToClipMatrix[1, 1] = Rotations.fFrustumScale
+    cameraToClipMatrix[2, 2] = (fzFar + fzNear) / (fzNear - fzFar)
+    cameraToClipMatrix[2, 3] = -1.0
+    cameraToClipMatrix[3, 2] = (2 * fzFar * fzNear) / (fzNear - fzFar)
+    culler = framework.FrustumCuller(Rotations.fObjectRadius)
+    culler.setMatrix(cameraToClipMatrix)
+
+    results = {}
+    for count in [int(strCount) for strCount in args.counts.split(',')]:
+        patternSize = len(Rotations.g_instanceList)
+        offsets = framework.tileInstanceOffsets(count, patternSize, Rotations.instanceSpacing)
+        if offsets[:patternSize].any():
+            raise RuntimeError('tileInstanceOffsets moved the first copy of the scene')
+        if len(set(map(tuple, offsets[::patternSize]))) != (count + patternSize - 1) // patternSize:
+            raise RuntimeError('tileInstanceOffsets put two copies of the scene in one cell')
+
+        rotations = framework.axisAngleQuaternions(np.random.uniform(-1.0, 1.0, (count, 3)),
+                                                   np.random.uniform(0.0, 2.0 * np.pi, count))
+        matrices = framework.quaternionMatrices(rotations)
+        matrices[:, :3, :3] *= np.random.uniform(0.5, 4.0, (count, 1, 3))
+        matrices[:, 0, 3] = np.random.uniform(-60.0, 60.0, count)
+        matrices[:, 1, 3] = np.random.uniform(-60.0, 60.0, count)
+        matrices[:, 2, 3] = np.random.uniform(-70.0, 5.0, count)
+
+        visible = culler.cull(matrices)
+        culler.endFrame()
+        result = {
+            'cullMs': timeCalls(lambda: culler.cull(matrices), args.repeat),
+            'drawn': len(visible),
+            'culled': count - len(visible),
+        }
+        if count <= args.max_loop_count:
+            if loopCull(np, culler.planes, matrices, culler.radius) != list(visible):
+                raise RuntimeError('The per-object test disagrees with FrustumCuller')
+            result['loopMs'] = timeCalls(lambda: loopCull(np, culler.planes, matrices, culler.radius), args.repeat)
+        results[str(count)] = result
+
+    print(json.dumps(results, indent=2, sort_keys=True))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
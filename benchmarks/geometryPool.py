@@ -0,0 +1,135 @@
+# Cost of drawing many meshes from one GeometryPool against one VAO and buffer pair per
+# mesh, and the behaviour of the pool under churn.
+# This file is licensed under the MIT License.
+#
+# In a headless context, for N meshes of random sizes (interleaved positions and colors,
+# like Tut 05's objects once pooled), times a frame that draws every mesh:
+#  - separateMs: each mesh in its own vertex and index buffers, with its own VAO
+#  - pooledMs: every mesh in one GeometryPool, drawn with its VAO and baseVertex/firstIndex
+# Then replaces a random quarter of the meshes --churn times, and reports the pool's
+# fragmentation and capacity, the bytes its growth copied on the GPU, and the time and
+# bytes of one compact(). Reports everything as JSON.
+#
+# Usage:
+#   PYOPENGL_PLATFORM=egl python benchmarks/geometryPool.py [--frames N] [--counts 100,1000]
+
+import argparse
+import json
+import os
+import sys
+from ctypes import c_void_p
+from timeit import default_timer
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the shaders are found relative to the working directory
+TUTORIAL_DIR = os.path.join(REPO_DIR, 'Tut 05 Objects in Depth')
+
+# Returns the mean milliseconds per frame of drawFrame() over frameCount frames
+def timeFrames(framework, drawFrame, frameCount):
+    drawFrame()
+    framework.glFinish()
+    start = default_timer()
+    for i in range(frameCount):
+        drawFrame()
+        framework.glFinish()
+    return (default_timer() - start) * 1000.0 / frameCount
+
+# Returns random (vertices, indices) for a mesh of 3 to 300 vertices
+def randomMesh(np):
+    vertexCount = np.random.randint(3, 301)
+    vertices = np.random.uniform(-0.1, 0.1, (vertexCount, 7)).astype('float32')
+    vertices[:, 3:] = 1.0
+    indices = np.random.randint(0, vertexCount, 3 * vertexCount).astype('uint16')
+    return vertices, indices
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare pooled and separate mesh buffers.')
+    parser.add_argument('--frames', type=int, default=20, help='number of frames per measurement')
+    parser.add_argument('--counts', default='10,100,1000', help='comma separated mesh counts')
+    parser.add_argument('--churn', type=int, default=20, help='number of times a quarter of the meshes is replaced')
+    args = parser.parse_args()
+
+    os.chdir(TUTORIAL_DIR)
+    sys.path.insert(0, TUTORIAL_DIR)
+    import framework
+    from framework import (GL_ARRAY_BUFFER, GL_COLOR_BUFFER_BIT, GL_ELEMENT_ARRAY_BUFFER, GL_FALSE, GL_FLOAT,
+                           GL_FRAGMENT_SHADER, GL_STATIC_DRAW, GL_TRIANGLES, GL_UNSIGNED_SHORT, GL_VERTEX_SHADER)
+    np = framework.np
+
+    context = framework.HeadlessContext(64, 64)
+    context.createContext()
+    context.createFramebuffer()
+    program = framework.createProgram([
+        framework.loadShader(GL_VERTEX_SHADER, "Standard.vert"),
+        framework.loadShader(GL_FRAGMENT_SHADER, "Standard.frag"),
+    ])
+    cameraBuffer = framework.CameraBuffer()
+    cameraBuffer.setMatrix(np.identity(4, dtype='float32'))
+    framework.glState.useProgram(program)
+
+    results = {}
+    for count in [int(strCount) for strCount in args.counts.split(',')]:
+        meshData = [randomMesh(np) for i in range(count)]
+
+        separate = []
+        for vertices, indices in meshData:
+            vao = framework.glGenVertexArrays(1)
+            framework.glState.bindVertexArray(vao)
+            vertexBuffer, indexBuffer = framework.glGenBuffers(2)
+            framework.glState.bindBuffer(GL_ARRAY_BUFFER, vertexBuffer)
+            framework.glBufferData(GL_ARRAY_BUFFER, vertices, GL_STATIC_DRAW)
+            framework.glState.enableVertexAttribArray(0)
+            framework.glState.enableVertexAttribArray(1)
+            framework.glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 28, None)
+            framework.glVertexAttribPointer(1, 4, GL_FLOAT, GL_FALSE, 28, c_void_p(12))
+            framework.glState.bindBuffer(GL_ELEMENT_ARRAY_BUFFER, indexBuffer)
+            framework.glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices, GL_STATIC_DRAW)
+            separate.append((vao, len(indices)))
+
+        pool = framework.GeometryPool([(0, 3), (1, 4)])
+        meshes = [pool.addMesh(vertices, indices) for vertices, indices in meshData]
+
+        def separateFrame():
+            framework.glClear(GL_COLOR_BUFFER_BIT)
+            for vao, indexCount in separate:
+                framework.glState.bindVertexArray(vao)
+                framework.glDrawElements(GL_TRIANGLES, indexCount, GL_UNSIGNED_SHORT, None)
+
+        def pooledFrame():
+            framework.glClear(GL_COLOR_BUFFER_BIT)
+            framework.glState.bindVertexArray(pool.vao)
+            for mesh in meshes:
+                pool.draw(GL_TRIANGLES, mesh)
+
+        result = {
+            'separateMs': timeFrames(framework, separateFrame, args.frames),
+            'pooledMs': timeFrames(framework, pooledFrame, args.frames),
+        }
+
+        growthBytes = pool.copiedBytes
+        for i in range(args.churn):
+            for index in np.random.choice(count, max(1, count // 4), replace=False):
+                pool.removeMesh(meshes[index])
+                meshes[index] = pool.addMesh(*randomMesh(np))
+        result['churnCopiedBytes'] = pool.copiedBytes - growthBytes
+        result['fragmentation'] = pool.fragmentation()
+        result['vertexCapacity'] = pool.vertexRanges.capacity
+        result['indexCapacity'] = pool.indexRanges.capacity
+
+        copiedBytes = pool.copiedBytes
+        start = default_timer()
+        pool.compact()
+        framework.glFinish()
+        result['compactMs'] = (default_timer() - start) * 1000.0
+        result['compactCopiedBytes'] = pool.copiedBytes - copiedBytes
+        result['pooledAfterCompactMs'] = timeFrames(framework, pooledFrame, args.frames)
+        results[str(count)] = result
+
+    if framework.glGetError() != framework.GL_NO_ERROR:
+        raise RuntimeError('GL error during the benchmark')
+
+    print(json.dumps(results, indent=2, sort_keys=True))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+# Per-call overhead of the GL functions the tutorials call every frame.
+# This file is licensed under the MIT License.
+#
+# Calls each function many times in a headless context, once through PyOpenGL's
+# wrappers and once through the framework's fast entry points (PYOPENGL_TUTORIAL_FAST_GL),
+# and reports the mean time per call in microseconds as JSON. The calls are chosen to
+# do as little work in the driver as possible, so the numbers are mostly Python overhead.
+#
+# Usage:
+#   PYOPENGL_PLATFORM=egl python benchmarks/glCallOverhead.py [--calls N]
+
+import argparse
+import json
+import os
+import sys
+from timeit import default_timer
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the program comes from the Tut 06 shaders, which the framework finds relative to the working directory
+TUTORIAL_DIR = os.path.join(REPO_DIR, 'Tut 06 Objects in Motion')
+
+# Returns the mean time per call of func(*args), in microseconds
+def timeCalls(func, args, callCount):
+    start = default_timer()
+    for i in range(callCount):
+        func(*args)
+    return (default_timer() - start) * 1e6 / callCount
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the per-call overhead of the per-frame GL functions.')
+    parser.add_argument('--calls', type=int, default=20000, help='number of calls per function')
+    args = parser.parse_args()
+
+    os.chdir(TUTORIAL_DIR)
+    sys.path.insert(0, TUTORIAL_DIR)
+    import framework
+    from framework import GL_FALSE, GL_FRAGMENT_SHADER, GL_TRIANGLES, GL_VERTEX_SHADER
+
+    context = framework.HeadlessContext(64, 64)
+    context.createContext()
+    context.createFramebuffer()
+
+    program = framework.createProgram([
+        framework.loadShader(GL_VERTEX_SHADER, "PosColorLocalTransform.vert"),
+        framework.loadShader(GL_FRAGMENT_SHADER, "ColorPassthrough.frag"),
+    ])
+    matrixLocation = framework.glGetUniformLocation(program, "modelToCameraMatrix")
+    vao = framework.glGenVertexArrays(1)
+    framework.glUseProgram(program)
+    framework.glBindVertexArray(vao)
+    matrix = framework.np.identity(4, dtype='float32')
+
+    # name -> arguments; each call leaves the state as it was
+    calls = [
+        ('glUseProgram', (program,)),
+        ('glBindVertexArray', (vao,)),
+        ('glUniform3f', (-1, 0.0, 0.0, 0.0)),
+        ('glUniformMatrix4fv', (matrixLocation, 1, GL_FALSE, matrix)),
+        ('glUniformMatrix4fv (transposed view)', (matrixLocation, 1, GL_FALSE, matrix.transpose())),
+        ('glDrawArrays', (GL_TRIANGLES, 0, 0)),
+        ('glDrawElements', (GL_TRIANGLES, 0, framework.GL_UNSIGNED_SHORT, None)),
+    ]
+
+    wrapped = dict((strName, getattr(framework, strName.split()[0])) for strName, callArgs in calls)
+    framework.installFastEntryPoints({})
+
+    results = {}
+    for strName, callArgs in calls:
+        func = wrapped[strName]
+        fastFunc = framework.fastEntryPoints[strName.split()[0]]
+        results[strName] = {
+            'pyopenglUs': timeCalls(func, callArgs, args.calls),
+            'fastUs': timeCalls(fastFunc, callArgs, args.calls),
+        }
+        results[strName]['speedup'] = results[strName]['pyopenglUs'] / results[strName]['fastUs']
+    framework.glFinish()
+    if framework.glGetError() != framework.GL_NO_ERROR:
+        raise RuntimeError('GL error during the benchmark')
+
+    print(json.dumps(results, indent=2, sort_keys=True))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+# Python heap allocations made by the Tut 06 per-object matrix code, per frame.
+# This file is licensed under the MIT License.
+#
+# For Rotations.py, Translation.py and Scale.py, runs the matrix part of the per-object
+# draw loop (each function of g_instanceList, then the array handed to glUniformMatrix4fv)
+# in two ways, with tracemalloc tracing the Python heap:
+#  - allocating: func(fElapsedTime) returns a new matrix, and it is passed as
+#    matrix.transpose(), which PyOpenGL copies into a contiguous array
+#  - preallocated: func(fElapsedTime, transformMatrix) refills one matrix, which is
+#    passed as it is with transpose=GL_TRUE (what Rotations.py and
+#    Translation.py do; Scale.py now draws from a SceneGraph)
+# and reports, as JSON, the peak bytes allocated while drawing a frame, the bytes
+# still held after all the frames, and the microseconds per frame. Both include the
+# iterator of the loop over g_instanceList, which is the only object the preallocated
+# frames create; the bytes tracemalloc itself keeps are subtracted. The GL call itself
+# is not made (its wrapper allocates regardless; see glCallOverhead.py), so no GL
+# context is needed.
+#
+# tracemalloc needs Python 3.4 (3.9 for the per-frame peaks), with PyOpenGL installed,
+# since the tutorials import it.
+#
+# Usage:
+#   python3 benchmarks/matrixAllocations.py [--frames N]
+
+import argparse
+import json
+import os
+import sys
+from timeit import default_timer
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TUTORIAL_DIR = os.path.join(REPO_DIR, 'Tut 06 Objects in Motion')
+
+# Returns the peak and retained bytes of frame(fElapsedTime) over frameCount frames
+def traceFrames(tracemalloc, frame, frameCount):
+    # the first frames may fill caches (e.g. numpy's), which is not per-frame cost
+    for i in range(10):
+        frame(i * 0.016)
+
+    peakBytes = 0
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    for i in range(frameCount):
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        frame(i * 0.016)
+        peakBytes = max(peakBytes, tracemalloc.get_traced_memory()[1] - before)
+    retainedBytes = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return peakBytes, retainedBytes
+
+# Returns the mean microseconds per call of frame(fElapsedTime) over frameCount frames
+def timeFrames(frame, frameCount):
+    start = default_timer()
+    for i in range(frameCount):
+        frame(i * 0.016)
+    return (default_timer() - start) * 1e6 / frameCount
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure per-frame allocations of the Tut 06 matrix code.')
+    parser.add_argument('--frames', type=int, default=1000, help='number of frames per measurement')
+    args = parser.parse_args()
+
+    try:
+        import tracemalloc
+    except ImportError:
+        sys.stderr.write('tracemalloc is not available; run this benchmark with Python 3.4 or later\n')
+        return 1
+
+    sys.path.insert(0, TUTORIAL_DIR)
+    import numpy as np
+
+    # what tracemalloc holds on to for an empty frame
+    overheadBytes = traceFrames(tracemalloc, lambda fElapsedTime: None, args.frames)[1]
+
+    results = {}
+    for strModule in ('Rotations', 'Translation', 'Scale'):
+        module = __import__(strModule)
+        transformMatrix = np.empty((4, 4), dtype='float32')
+        # the array last handed to glUniformMatrix4fv
+        uploaded = [None]
+
+        def allocatingFrame(fElapsedTime):
+            for func in module.g_instanceList:
+                uploaded[0] = np.ascontiguousarray(func(fElapsedTime).transpose())
+
+        def preallocatedFrame(fElapsedTime):
+            for func in module.g_instanceList:
+                func(fElapsedTime, transformMatrix)
+                uploaded[0] = transformMatrix
+
+        for strMode, frame in (('allocating', allocatingFrame), ('preallocated', preallocatedFrame)):
+            peakBytes, retainedBytes = traceFrames(tracemalloc, frame, args.frames)
+            results['%s/%s' % (strModule, strMode)] = {
+                'peakBytesPerFrame': peakBytes,
+                'retainedBytes': retainedBytes - overheadBytes,
+                'frameUs': timeFrames(frame, args.frames),
+            }
+
+    print(json.dumps(results, indent=2, sort_keys=True))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
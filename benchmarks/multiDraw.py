@@ -0,0 +1,127 @@
+# Cost of submitting many draws of different ranges of one mesh, one GL draw call per
+# object against one glMultiDrawElementsIndirect call for all of them.
+# This file is licensed under the MIT License.
+#
+# Draws N copies of the two objects of Tut 05's BaseVertexOverlap.py, each at its own
+# offset, in a headless context, in two ways:
+#  - loopMs: glUniform3f for the offset, then glDrawElementsBaseVertex, per object
+#  - multiDrawMs: the framework's DrawList, with the offsets in a per-draw attribute
+#    (Standard.vert with MULTI_DRAW defined), drawn with one call
+# Reports the milliseconds per frame, including glFinish, as JSON. The framebuffer is
+# small so that the times are mostly submission. Needs GL 4.3 or ARB_multi_draw_indirect.
+#
+# Usage:
+#   PYOPENGL_PLATFORM=egl python benchmarks/multiDraw.py [--frames N] [--counts 10,1000]
+
+import argparse
+import json
+import os
+import sys
+from ctypes import c_void_p
+from timeit import default_timer
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the shaders are found relative to the working directory
+TUTORIAL_DIR = os.path.join(REPO_DIR, 'Tut 05 Objects in Depth')
+
+# Returns the mean milliseconds per frame of drawFrame() over frameCount frames
+def timeFrames(framework, drawFrame, frameCount):
+    drawFrame()
+    framework.glFinish()
+    start = default_timer()
+    for i in range(frameCount):
+        drawFrame()
+        framework.glFinish()
+    return (default_timer() - start) * 1000.0 / frameCount
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare per-object draw calls with one multi-draw indirect call.')
+    parser.add_argument('--frames', type=int, default=20, help='number of frames per measurement')
+    parser.add_argument('--counts', default='10,100,1000,10000', help='comma separated object counts')
+    args = parser.parse_args()
+
+    os.chdir(TUTORIAL_DIR)
+    sys.path.insert(0, TUTORIAL_DIR)
+    import framework
+    import BaseVertexOverlap as tutorial
+    from framework import (GL_ARRAY_BUFFER, GL_COLOR_BUFFER_BIT, GL_ELEMENT_ARRAY_BUFFER, GL_FALSE, GL_FLOAT,
+                           GL_FRAGMENT_SHADER, GL_STATIC_DRAW, GL_TRIANGLES, GL_UNSIGNED_SHORT, GL_VERTEX_SHADER)
+    np = framework.np
+
+    context = framework.HeadlessContext(64, 64)
+    context.createContext()
+    context.createFramebuffer()
+    if not framework.multiDrawIndirectAvailable():
+        sys.stderr.write('glMultiDrawElementsIndirect is not available in this context\n')
+        return 1
+
+    def makeProgram(defines):
+        return framework.createProgram([
+            framework.loadShader(GL_VERTEX_SHADER, "Standard.vert", defines),
+            framework.loadShader(GL_FRAGMENT_SHADER, "Standard.frag"),
+        ])
+    loopProgram = makeProgram(None)
+    multiDrawProgram = makeProgram({"MULTI_DRAW": 1})
+    offsetUniform = framework.glGetUniformLocation(loopProgram, "offset")
+    cameraBuffer = framework.CameraBuffer()
+    cameraBuffer.setMatrix(np.identity(4, dtype='float32'))
+
+    vertexBufferObject = framework.glGenBuffers(1)
+    framework.glState.bindBuffer(GL_ARRAY_BUFFER, vertexBufferObject)
+    framework.glBufferData(GL_ARRAY_BUFFER, tutorial.vertexData, GL_STATIC_DRAW)
+    indexBufferObject = framework.glGenBuffers(1)
+    offsetBufferObject = framework.glGenBuffers(1)
+    vao = framework.glGenVertexArrays(1)
+    framework.glState.bindVertexArray(vao)
+    framework.glState.enableVertexAttribArray(0)
+    framework.glState.enableVertexAttribArray(1)
+    framework.glVertexAttribPointer(0, tutorial.vertexDim, GL_FLOAT, GL_FALSE, 0, None)
+    framework.glVertexAttribPointer(1, tutorial.colorDim, GL_FLOAT, GL_FALSE, 0,
+                                    c_void_p(tutorial.vertexDim * tutorial.nVertices * 4))
+    framework.glState.bindBuffer(GL_ELEMENT_ARRAY_BUFFER, indexBufferObject)
+    framework.glBufferData(GL_ELEMENT_ARRAY_BUFFER, tutorial.indexData, GL_STATIC_DRAW)
+    framework.glState.bindBuffer(GL_ARRAY_BUFFER, offsetBufferObject)
+    framework.glState.enableVertexAttribArray(2)
+    framework.glVertexAttribPointer(2, 3, GL_FLOAT, GL_FALSE, 0, None)
+    framework.glVertexAttribDivisor(2, 1)
+
+    indexCount = len(tutorial.indexData)
+    results = {}
+    for count in [int(strCount) for strCount in args.counts.split(',')]:
+        offsets = np.random.uniform(-0.5, 0.5, (count, 3)).astype('float32')
+        # every other object is the second one, which starts halfway through the vertices
+        baseVertices = (np.arange(count) % 2) * (tutorial.nVertices // 2)
+        framework.glState.bindBuffer(GL_ARRAY_BUFFER, offsetBufferObject)
+        framework.glBufferData(GL_ARRAY_BUFFER, offsets, GL_STATIC_DRAW)
+        drawList = framework.DrawList(count)
+        for baseVertex in baseVertices:
+            drawList.addDraw(indexCount, baseVertex=int(baseVertex))
+        drawList.upload()
+        drawArgs = [(float(x), float(y), float(z), int(baseVertex))
+                    for (x, y, z), baseVertex in zip(offsets, baseVertices)]
+
+        def loopFrame():
+            framework.glClear(GL_COLOR_BUFFER_BIT)
+            framework.glState.useProgram(loopProgram)
+            for fX, fY, fZ, baseVertex in drawArgs:
+                framework.glUniform3f(offsetUniform, fX, fY, fZ)
+                framework.glDrawElementsBaseVertex(GL_TRIANGLES, indexCount, GL_UNSIGNED_SHORT, None, baseVertex)
+
+        def multiDrawFrame():
+            framework.glClear(GL_COLOR_BUFFER_BIT)
+            framework.glState.useProgram(multiDrawProgram)
+            drawList.draw(GL_TRIANGLES, GL_UNSIGNED_SHORT)
+
+        results[str(count)] = {
+            'loopMs': timeFrames(framework, loopFrame, args.frames),
+            'multiDrawMs': timeFrames(framework, multiDrawFrame, args.frames),
+        }
+
+    if framework.glGetError() != framework.GL_NO_ERROR:
+        raise RuntimeError('GL error during the benchmark')
+
+    print(json.dumps(results, indent=2, sort_keys=True))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+# Cost of animating many rotations with the framework's batched quaternions.
+# This file is licensed under the MIT License.
+#
+# For N objects, each turning about its own axis, times:
+#  - loopMs: Rotations.py's rotateAxis, one matrix per Python call (the per-object
+#    draw loop), up to --max-loop-count objects
+#  - axisMatricesMs: rotationAxisMatrices, rebuilding every matrix from axis and angle
+#  - slerpMs / nlerpMs: interpolating between two orientations per object, then
+#    converting the results with quaternionMatrices
+#  - multiplyMs: composing two rotations per object, then converting the results
+# Reports the milliseconds per N matrices as JSON. No GL context is needed. It fails if
+# the quaternion matrices disagree with rotationAxisMatrices, or if the matrix of a
+# single quaternion differs from the same quaternion's matrix in a stack.
+#
+# Usage:
+#   python benchmarks/quaternions.py [--repeat N] [--counts 100,10000,100000]
+
+import argparse
+import json
+import os
+import sys
+from timeit import default_timer
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TUTORIAL_DIR = os.path.join(REPO_DIR, 'Tut 06 Objects in Motion')
+
+# Returns the mean milliseconds per call of func()
+def timeCalls(func, repeat):
+    start = default_timer()
+    for i in range(repeat):
+        func()
+    return (default_timer() - start) * 1000.0 / repeat
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare matrix and quaternion rotation animation.')
+    parser.add_argument('--repeat', type=int, default=5, help='number of timed runs per measurement')
+    parser.add_argument('--counts', default='100,1000,10000,100000', help='comma separated object counts')
+    parser.add_argument('--max-loop-count', type=int, default=10000,
+                        help='largest object count to time the per-object calls for')
+    args = parser.parse_args()
+
+    sys.path.insert(0, TUTORIAL_DIR)
+    import framework
+    import Rotations
+    np = framework.np
+
+    results = {}
+    for count in [int(strCount) for strCount in args.counts.split(',')]:
+        axes = np.random.uniform(-1.0, 1.0, (count, 3))
+        angles = np.random.uniform(0.0, 2.0 * np.pi, count)
+        fElapsedTimes = np.linspace(0.0, 60.0, count)
+        starts = framework.axisAngleQuaternions(axes, angles)
+        ends = framework.axisAngleQuaternions(axes[::-1], angles[::-1])
+        quaternions = framework.quaternionArray((count,))
+        matrices = np.empty((count, 4, 4), dtype='float32')
+        matrix = np.empty((4, 4), dtype='float32')
+
+        # rotationAxisMatrices turns the other way (see framework.py)
+        axisMatrices = framework.rotationAxisMatrices(angles, axes)
+        if not np.allclose(framework.quaternionMatrices(framework.axisAngleQuaternions(axes, -angles)),
+                           axisMatrices, atol=1e-5):
+            raise RuntimeError('quaternionMatrices disagrees with rotationAxisMatrices')
+        if not np.array_equal(framework.quaternionMatrices(starts[0]), framework.quaternionMatrices(starts)[0]):
+            raise RuntimeError('quaternionMatrices of a single quaternion differs from a stack')
+
+        def interpolate(interpolateFunc):
+            interpolateFunc(starts, ends, 0.25, quaternions)
+            framework.quaternionMatrices(quaternions, matrices)
+
+        def multiply():
+            framework.multiplyQuaternions(starts, ends, quaternions)
+            framework.quaternionMatrices(quaternions, matrices)
+
+        result = {
+            'axisMatricesMs': timeCalls(lambda: framework.rotationAxisMatrices(angles, axes, matrices), args.repeat),
+            'slerpMs': timeCalls(lambda: interpolate(framework.slerpQuaternions), args.repeat),
+            'nlerpMs': timeCalls(lambda: interpolate(framework.nlerpQuaternions), args.repeat),
+            'multiplyMs': timeCalls(multiply, args.repeat),
+        }
+        if count <= args.max_loop_count:
+            result['loopMs'] = timeCalls(lambda: [Rotations.rotateAxis(t, matrix) for t in fElapsedTimes], args.repeat)
+        results[str(count)] = result
+
+    print(json.dumps(results, indent=2, sort_keys=True))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,68 @@
+# Cost of SceneGraph.update against the number of nodes and the fraction that changes.
+# This file is licensed under the MIT License.
+#
+# Builds a scene graph of N nodes (--roots roots, each with a random subtree of up to
+# --depth levels), then times update() when a given fraction of the nodes gets a new
+# translation each frame, up to every node. Reports the milliseconds per update and the
+# number of world matrices recomputed as JSON. No GL context is needed.
+#
+# Usage:
+#   python benchmarks/sceneGraph.py [--frames N] [--counts 1000,100000] [--fractions 0,0.01,1]
+
+import argparse
+import json
+import os
+import sys
+from timeit import default_timer
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TUTORIAL_DIR = os.path.join(REPO_DIR, 'Tut 06 Objects in Motion')
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure scene graph updates against nodes changed.')
+    parser.add_argument('--frames', type=int, default=20, help='number of updates per measurement')
+    parser.add_argument('--counts', default='1000,10000,100000', help='comma separated node counts')
+    parser.add_argument('--fractions', default='0,0.001,0.01,0.1,1', help='comma separated fractions of nodes changed per frame')
+    parser.add_argument('--roots', type=int, default=100, help='number of root nodes')
+    parser.add_argument('--depth', type=int, default=4, help='number of levels below the roots')
+    args = parser.parse_args()
+
+    sys.path.insert(0, TUTORIAL_DIR)
+    import framework
+    np = framework.np
+
+    results = {}
+    for nodeCount in [int(strCount) for strCount in args.counts.split(',')]:
+        graph = framework.SceneGraph(nodeCount)
+        # every level has the same number of nodes, each under a random node of the level above
+        levelSize = max(1, (nodeCount - args.roots) // args.depth)
+        previousLevel = [graph.addNode() for i in range(min(args.roots, nodeCount))]
+        while graph.nodeCount < nodeCount:
+            level = []
+            for i in range(min(levelSize, nodeCount - graph.nodeCount)):
+                parent = previousLevel[np.random.randint(len(previousLevel))]
+                level.append(graph.addNode(parent, np.random.uniform(-1.0, 1.0, 3)))
+            previousLevel = level
+        graph.update()
+
+        for fFraction in [float(strFraction) for strFraction in args.fractions.split(',')]:
+            changedCount = int(round(fFraction * nodeCount))
+            recomputed = 0
+            elapsed = 0.0
+            for frame in range(args.frames):
+                nodes = np.random.choice(nodeCount, changedCount, replace=False)
+                graph.translations[nodes] = np.random.uniform(-1.0, 1.0, (changedCount, 3))
+                graph.dirty[nodes] = True
+                start = default_timer()
+                recomputed += graph.update()
+                elapsed += default_timer() - start
+            results['%d/%g' % (nodeCount, fFraction)] = {
+                'updateMs': elapsed * 1000.0 / args.frames,
+                'matricesPerUpdate': recomputed / float(args.frames),
+            }
+
+    print(json.dumps(results, indent=2, sort_keys=True))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
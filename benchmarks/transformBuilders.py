@@ -0,0 +1,57 @@
+# Cost of building many Tut 06 transform matrices, one Python call per matrix against
+# one batched call per stack.
+# This file is licensed under the MIT License.
+#
+# For each function of the g_instanceList of Rotations.py, Translation.py and Scale.py,
+# times building N matrices with the function itself (as the per-object draw loop
+# does) and with its batched version writing into a preallocated stack. Reports the
+# milliseconds per N matrices as JSON. The per-matrix calls are only timed up to
+# --max-loop-count matrices. No GL context is needed.
+#
+# Usage:
+#   python benchmarks/transformBuilders.py [--repeat N] [--counts 100,10000,100000]
+
+import argparse
+import json
+import os
+import sys
+from timeit import default_timer
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TUTORIAL_DIR = os.path.join(REPO_DIR, 'Tut 06 Objects in Motion')
+
+# Returns the mean milliseconds per call of func()
+def timeCalls(func, repeat):
+    start = default_timer()
+    for i in range(repeat):
+        func()
+    return (default_timer() - start) * 1000.0 / repeat
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare per-matrix and batched transform builders.')
+    parser.add_argument('--repeat', type=int, default=5, help='number of timed runs per measurement')
+    parser.add_argument('--counts', default='100,1000,10000,100000', help='comma separated matrix counts')
+    parser.add_argument('--max-loop-count', type=int, default=10000,
+                        help='largest matrix count to time the per-matrix calls for')
+    args = parser.parse_args()
+
+    sys.path.insert(0, TUTORIAL_DIR)
+    import numpy as np
+
+    results = {}
+    for strModule in ('Rotations', 'Translation', 'Scale'):
+        module = __import__(strModule)
+        for func, batchFunc in zip(module.g_instanceList, module.g_batchInstanceList):
+            for count in [int(strCount) for strCount in args.counts.split(',')]:
+                fElapsedTimes = np.linspace(0.0, 60.0, count)
+                out = np.empty((count, 4, 4), dtype='float32')
+                result = {'batchMs': timeCalls(lambda: batchFunc(fElapsedTimes, out), args.repeat)}
+                if count <= args.max_loop_count:
+                    result['loopMs'] = timeCalls(lambda: [func(t) for t in fElapsedTimes], args.repeat)
+                results['%s.%s/%d' % (strModule, func.__name__, count)] = result
+
+    print(json.dumps(results, indent=2, sort_keys=True))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+# Per-frame cost of CPU vertex animation against the number of vertices.
+# This file is licensed under the MIT License.
+#
+# Times the framework's VertexAnimation.offset (the path cpuPositionOffset.py uses)
+# for a range of vertex counts, next to the per-vertex Python loop it replaced, and
+# the glBufferSubData upload of the result into a buffer of the same size, and the
+# zero-copy path that writes straight into a PersistentBuffer region. Reports
+# the mean milliseconds per frame as JSON. The loop is only timed up to
+# --max-loop-vertices, since it gets slow quickly.
+#
+# Usage:
+#   PYOPENGL_PLATFORM=egl python benchmarks/vertexAnimation.py [--frames N]
+#       [--counts 3,1000,1000000] [--max-loop-vertices N]
+
+import argparse
+import json
+import os
+import sys
+from timeit import default_timer
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TUTORIAL_DIR = os.path.join(REPO_DIR, 'Tut 03 OpenGLs Moving Triangle')
+
+VERTEX_DIM = 4
+
+# The per-frame update cpuPositionOffset.py used before VertexAnimation: a fresh copy
+# of the positions, moved one vertex at a time
+def loopOffset(np, vertexPositions, fXOffset, fYOffset):
+    fNewData = np.array(vertexPositions, copy=True)
+    for i in range(0, len(vertexPositions), VERTEX_DIM):
+        fNewData[i] += fXOffset
+        fNewData[i + 1] += fYOffset
+    return fNewData
+
+# Returns the mean milliseconds per call of func(frame) over frameCount frames
+def timeFrames(func, frameCount):
+    start = default_timer()
+    for frame in range(frameCount):
+        func(frame)
+    return (default_timer() - start) * 1000.0 / frameCount
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure CPU vertex animation cost against vertex count.')
+    parser.add_argument('--frames', type=int, default=50, help='number of frames per vertex count')
+    parser.add_argument('--counts', default='3,1000,10000,100000,1000000,4000000',
+                        help='comma separated vertex counts')
+    parser.add_argument('--max-loop-vertices', type=int, default=10000,
+                        help='largest vertex count to time the Python loop for')
+    args = parser.parse_args()
+
+    sys.path.insert(0, TUTORIAL_DIR)
+    import framework
+    np = framework.np
+
+    context = framework.HeadlessContext(64, 64)
+    context.createContext()
+    buffer = framework.glGenBuffers(1)
+    framework.glBindBuffer(framework.GL_ARRAY_BUFFER, buffer)
+
+    results = {}
+    for vertexCount in [int(strCount) for strCount in args.counts.split(',')]:
+        vertexPositions = np.random.uniform(-1.0, 1.0, vertexCount * VERTEX_DIM).astype('float32')
+        animation = framework.VertexAnimation(vertexPositions, VERTEX_DIM)
+        framework.glBufferData(framework.GL_ARRAY_BUFFER, animation.data.nbytes, None, framework.GL_STREAM_DRAW)
+
+        def offsetFrame(frame):
+            animation.offset(frame * 0.001, frame * -0.001)
+
+        def uploadFrame(frame):
+            data = animation.offset(frame * 0.001, frame * -0.001)
+            framework.glBufferSubData(framework.GL_ARRAY_BUFFER, 0, data.nbytes, data)
+
+        result = {
+            'offsetMs': timeFrames(offsetFrame, args.frames),
+            'offsetAndUploadMs': timeFrames(uploadFrame, args.frames),
+        }
+        framework.glFinish()
+
+        if framework.persistentMappingAvailable():
+            stream = framework.PersistentBuffer(framework.GL_ARRAY_BUFFER, animation.data.shape)
+            for regionData in stream.arrays:
+                regionData[...] = animation.data
+
+            def persistentFrame(frame):
+                animation.offset(frame * 0.001, frame * -0.001, stream.nextArray())
+                stream.fence()
+
+            result['offsetIntoPersistentMs'] = timeFrames(persistentFrame, args.frames)
+            framework.glFinish()
+            framework.glDeleteBuffers(1, [stream.buffer])
+            framework.glBindBuffer(framework.GL_ARRAY_BUFFER, buffer)
+        if vertexCount <= args.max_loop_vertices:
+            result['loopMs'] = timeFrames(lambda frame: loopOffset(np, vertexPositions, frame * 0.001, frame * -0.001),
+                                          args.frames)
+        results[str(vertexCount)] = result
+
+    print(json.dumps(results, indent=2, sort_keys=True))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
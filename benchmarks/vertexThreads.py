@@ -0,0 +1,75 @@
+# Throughput of the multi-threaded CPU vertex animation against thread count and mesh size.
+# This file is licensed under the MIT License.
+#
+# Times VertexAnimation.offset for every combination of the given thread counts and
+# vertex counts, writing into a PersistentBuffer region when the context supports
+# it (as cpuPositionOffset.py does), and into the animation's own scratch array
+# otherwise. Reports milliseconds per frame and millions of vertices per second as JSON.
+#
+# Usage:
+#   PYOPENGL_PLATFORM=egl python benchmarks/vertexThreads.py [--frames N]
+#       [--threads 1,2,4,8] [--counts 100000,1000000,4000000] [--chunk-size N]
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+from timeit import default_timer
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TUTORIAL_DIR = os.path.join(REPO_DIR, 'Tut 03 OpenGLs Moving Triangle')
+
+VERTEX_DIM = 4
+
+def main():
+    parser = argparse.ArgumentParser(description='Sweep thread counts and mesh sizes for CPU vertex animation.')
+    parser.add_argument('--frames', type=int, default=30, help='number of frames per combination')
+    parser.add_argument('--threads', default='1,2,4,8', help='comma separated thread counts')
+    parser.add_argument('--counts', default='100000,1000000,4000000', help='comma separated vertex counts')
+    parser.add_argument('--chunk-size', type=int, default=65536, help='vertices per chunk')
+    args = parser.parse_args()
+
+    sys.path.insert(0, TUTORIAL_DIR)
+    import framework
+    np = framework.np
+
+    context = framework.HeadlessContext(64, 64)
+    context.createContext()
+    persistent = framework.persistentMappingAvailable()
+
+    results = {'cpuCount': multiprocessing.cpu_count(), 'persistent': persistent, 'runs': []}
+    for vertexCount in [int(strCount) for strCount in args.counts.split(',')]:
+        vertexPositions = np.random.uniform(-1.0, 1.0, vertexCount * VERTEX_DIM).astype('float32')
+        stream = None
+        if persistent:
+            stream = framework.PersistentBuffer(framework.GL_ARRAY_BUFFER, (vertexCount, VERTEX_DIM))
+            for regionData in stream.arrays:
+                regionData[...] = vertexPositions.reshape(vertexCount, VERTEX_DIM)
+
+        for threadCount in [int(strCount) for strCount in args.threads.split(',')]:
+            animation = framework.VertexAnimation(vertexPositions, VERTEX_DIM, threadCount, args.chunk_size)
+            start = default_timer()
+            for frame in range(args.frames):
+                if stream is not None:
+                    animation.offset(frame * 0.001, frame * -0.001, stream.nextArray())
+                    stream.fence()
+                else:
+                    animation.offset(frame * 0.001, frame * -0.001)
+            frameMs = (default_timer() - start) * 1000.0 / args.frames
+            results['runs'].append({
+                'vertices': vertexCount,
+                'threads': threadCount,
+                'frameMs': frameMs,
+                'mVerticesPerSecond': vertexCount / frameMs / 1000.0,
+            })
+
+        if stream is not None:
+            framework.glFinish()
+            framework.glDeleteBuffers(1, [stream.buffer])
+
+    print(json.dumps(results, indent=2, sort_keys=True))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())